@@ -0,0 +1,246 @@
+# PyGuardian v3 - Compact Event Model
+# Slotted events with integer IPs and interned enrichment for large correlation windows
+
+from __future__ import annotations
+
+import ipaddress
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple, Union
+
+from algorithms.correlation_algorithm import Event
+
+# IPv4 addresses are stored in the IPv4-mapped IPv6 range (::ffff:0:0/96) so
+# that IPv4 and IPv6 integers never collide
+_IPV4_MAPPED_PREFIX = 0xFFFF << 32
+
+
+def ip_to_int(address: str) -> int:
+    """Convert an IPv4/IPv6 address string to a single integer space"""
+    parsed = ipaddress.ip_address(address)
+    if parsed.version == 4:
+        return _IPV4_MAPPED_PREFIX | int(parsed)
+    return int(parsed)
+
+
+def int_to_ip(value: int) -> Union[ipaddress.IPv4Address, ipaddress.IPv6Address]:
+    """Convert an integer produced by ip_to_int back to an address"""
+    if value >> 32 == 0xFFFF:
+        return ipaddress.IPv4Address(value & 0xFFFFFFFF)
+    return ipaddress.IPv6Address(value)
+
+
+# Enrichment parts are shared between events, so they are immutable
+
+@dataclass(slots=True, frozen=True)
+class CompactAssetInfo:
+    hostname: Optional[str]
+    criticality: Optional[str]
+
+@dataclass(slots=True, frozen=True)
+class CompactGeoInfo:
+    country: Optional[str]
+
+@dataclass(slots=True, frozen=True)
+class CompactGeolocationInfo:
+    source: CompactGeoInfo
+    dest: CompactGeoInfo
+
+@dataclass(slots=True, frozen=True)
+class CompactReputationInfo:
+    score: int
+
+@dataclass(slots=True, frozen=True)
+class CompactThreatIntelInfo:
+    source_reputation: Optional[CompactReputationInfo]
+    dest_reputation: Optional[CompactReputationInfo]
+
+@dataclass(slots=True, frozen=True)
+class CompactEnrichmentData:
+    source_asset: CompactAssetInfo
+    dest_asset: CompactAssetInfo
+    geolocation: CompactGeolocationInfo
+    threat_intel: CompactThreatIntelInfo
+
+@dataclass(slots=True)
+class CompactEvent:
+    """
+    Drop-in replacement for Event with a smaller memory footprint
+
+    Exposes the same attributes as Event, so CorrelationEngine methods work
+    unchanged. source_ip and dest_ip are integers from ip_to_int; use
+    source_address / dest_address for ipaddress objects.
+    """
+    event_id: str
+    timestamp: datetime
+    source_ip: int
+    dest_ip: int
+    source_port: int
+    dest_port: int
+    protocol: int
+    bytes_sent: int
+    bytes_received: int
+    packets_sent: int
+    packets_received: int
+    tcp_flags: int
+    enrichment: CompactEnrichmentData
+
+    @property
+    def source_address(self) -> Union[ipaddress.IPv4Address, ipaddress.IPv6Address]:
+        return int_to_ip(self.source_ip)
+
+    @property
+    def dest_address(self) -> Union[ipaddress.IPv4Address, ipaddress.IPv6Address]:
+        return int_to_ip(self.dest_ip)
+
+
+class CompactEventFactory:
+    """
+    Builds CompactEvents, interning values shared between events
+
+    IP integers, strings and every enrichment part are interned, so events
+    from the same hosts share a single copy. The intern tables grow with the
+    number of distinct hosts and enrichment combinations, not with the number
+    of events; call clear() between unrelated windows if they grow too large.
+    """
+
+    def __init__(self):
+        self._ips: Dict[str, int] = {}
+        self._parts: Dict[Tuple, Any] = {}
+
+    def clear(self) -> None:
+        self._ips.clear()
+        self._parts.clear()
+
+    def ip(self, address: str) -> int:
+        value = self._ips.get(address)
+        if value is None:
+            value = ip_to_int(address)
+            self._ips[address] = value
+        return value
+
+    def _intern(self, cls: type, *values: Any) -> Any:
+        key = (cls, *values)
+        part = self._parts.get(key)
+        if part is None:
+            part = cls(*values)
+            self._parts[key] = part
+        return part
+
+    def _string(self, value: Optional[str]) -> Optional[str]:
+        return sys.intern(value) if value else value
+
+    def asset(self, hostname: Optional[str], criticality: Optional[str]) -> CompactAssetInfo:
+        return self._intern(CompactAssetInfo, self._string(hostname), self._string(criticality))
+
+    def reputation(self, score: Optional[int]) -> Optional[CompactReputationInfo]:
+        if score is None:
+            return None
+        return self._intern(CompactReputationInfo, score)
+
+    def enrichment(self, source_hostname: Optional[str], source_criticality: Optional[str],
+                   dest_hostname: Optional[str], dest_criticality: Optional[str],
+                   source_country: Optional[str], dest_country: Optional[str],
+                   source_score: Optional[int], dest_score: Optional[int]) -> CompactEnrichmentData:
+        """Interned enrichment for the given flattened enrichment values"""
+        key = (CompactEnrichmentData, source_hostname, source_criticality,
+               dest_hostname, dest_criticality, source_country, dest_country,
+               source_score, dest_score)
+        enrichment = self._parts.get(key)
+        if enrichment is None:
+            enrichment = CompactEnrichmentData(
+                source_asset=self.asset(source_hostname, source_criticality),
+                dest_asset=self.asset(dest_hostname, dest_criticality),
+                geolocation=self._intern(
+                    CompactGeolocationInfo,
+                    self._intern(CompactGeoInfo, self._string(source_country)),
+                    self._intern(CompactGeoInfo, self._string(dest_country))
+                ),
+                threat_intel=self._intern(
+                    CompactThreatIntelInfo,
+                    self.reputation(source_score),
+                    self.reputation(dest_score)
+                )
+            )
+            self._parts[key] = enrichment
+        return enrichment
+
+    def from_event(self, event: Event) -> CompactEvent:
+        """Convert a regular Event"""
+        enrichment = event.enrichment
+        threat_intel = enrichment.threat_intel
+        source_reputation = threat_intel.source_reputation
+        dest_reputation = threat_intel.dest_reputation
+
+        return CompactEvent(
+            event.event_id,
+            event.timestamp,
+            self.ip(event.source_ip),
+            self.ip(event.dest_ip),
+            event.source_port,
+            event.dest_port,
+            event.protocol,
+            event.bytes_sent,
+            event.bytes_received,
+            event.packets_sent,
+            event.packets_received,
+            event.tcp_flags,
+            self.enrichment(
+                enrichment.source_asset.hostname,
+                enrichment.source_asset.criticality,
+                enrichment.dest_asset.hostname,
+                enrichment.dest_asset.criticality,
+                enrichment.geolocation.source.country,
+                enrichment.geolocation.dest.country,
+                source_reputation.score if source_reputation else None,
+                dest_reputation.score if dest_reputation else None
+            )
+        )
+
+    def from_record(self, record: Dict[str, Any]) -> CompactEvent:
+        """
+        Convert an enriched_event record (see schemas/events.json)
+
+        Args:
+            record: Parsed enriched_event JSON object
+
+        Returns:
+            CompactEvent sharing interned enrichment with earlier events
+        """
+        enrichment = record.get('enrichment') or {}
+        source_asset = enrichment.get('source_asset') or {}
+        dest_asset = enrichment.get('dest_asset') or {}
+        geolocation = enrichment.get('geolocation') or {}
+        threat_intel = enrichment.get('threat_intel') or {}
+        source_reputation = threat_intel.get('source_reputation') or {}
+        dest_reputation = threat_intel.get('dest_reputation') or {}
+
+        timestamp = record['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+
+        return CompactEvent(
+            record['event_id'],
+            timestamp,
+            self.ip(record['source_ip']),
+            self.ip(record['dest_ip']),
+            record['source_port'],
+            record['dest_port'],
+            record['protocol'],
+            record['bytes_sent'],
+            record['bytes_received'],
+            record['packets_sent'],
+            record['packets_received'],
+            record.get('tcp_flags', 0),
+            self.enrichment(
+                source_asset.get('hostname'),
+                source_asset.get('criticality'),
+                dest_asset.get('hostname'),
+                dest_asset.get('criticality'),
+                (geolocation.get('source') or {}).get('country'),
+                (geolocation.get('dest') or {}).get('country'),
+                source_reputation.get('score'),
+                dest_reputation.get('score')
+            )
+        )
@@ -3,17 +3,32 @@
 
 from __future__ import annotations
 
-from typing import List
+import heapq
+import math
+import os
+import random
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from operator import attrgetter
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from algorithms.event_buffer import TimeOrderedEventBuffer
+from algorithms.instrumentation import DEFAULT_SAMPLE_SIZE, EngineInstrumentation, timed_stage
+from algorithms.mitre_mapping import MitreMappingTable, load_default_mapping
+from algorithms.score_cache import RiskScoreCache, fingerprint_ids
+
+if TYPE_CHECKING:
+    from algorithms.vectorized_scoring import EventBatch
 
 class CorrelationEngine:
     """
     Advanced correlation engine for threat detection and incident scoring
     """
     
-    def __init__(self):
-        self.mitre_attack_db = {}
+    def __init__(self, mitre_mapping: Optional[MitreMappingTable] = None):
         self.threat_intel_sources = {}
         self.asset_criticality_weights = {
             'critical': 1.0,
@@ -22,7 +37,37 @@ class CorrelationEngine:
             'low': 0.4,
             'unknown': 0.2
         }
+        self.default_criticality_weight = 0.2
+        self.country_risk_scores = {
+            'China': 80,
+            'Russia': 75,
+            'North Korea': 90,
+            'Iran': 70,
+            'Unknown': 60
+        }
+        self.default_country_risk = 20
+        self.risk_score_weights = {
+            'threat': 0.25,
+            'asset': 0.20,
+            'temporal': 0.15,
+            'volume': 0.15,
+            'mitre': 0.15,
+            'geo': 0.10
+        }
+        # MITRE ATT&CK technique metadata, severity weights and flow mappings
+        self.mitre_mapping = mitre_mapping or load_default_mapping()
+        # Copies: the default mapping is cached and shared by every engine
+        self.mitre_attack_db = {technique: dict(info) for technique, info in self.mitre_mapping.techniques.items()}
+        self.mitre_technique_weights = dict(self.mitre_mapping.technique_weights)
+        self.default_technique_weight = self.mitre_mapping.default_technique_weight
+        # Occurrences of a technique beyond this cap add no further score
+        self.max_technique_occurrences = 5
+        # Opt-in memoization, see enable_risk_score_cache
+        self.risk_score_cache: Optional[RiskScoreCache] = None
+        # Opt-in per-stage timings, see enable_instrumentation
+        self.instrumentation: Optional[EngineInstrumentation] = None
     
+    @timed_stage
     def compute_risk_score(self, events: List[Event], alerts: List[Alert]) -> float:
         """
         Compute comprehensive risk score (0-100) based on multiple factors
@@ -34,7 +79,73 @@ class CorrelationEngine:
         Returns:
             Risk score between 0-100
         """
+        cache = self.risk_score_cache
+        if cache is None:
+            return self._compute_risk_score(events, alerts)
+        
+        key = self._risk_score_cache_key(events, alerts)
+        score = cache.get(key)
+        if score is None:
+            score = self._compute_risk_score(events, alerts)
+            cache.put(key, score)
+        return score
+    
+    def enable_risk_score_cache(self, maxsize: int = 1024) -> RiskScoreCache:
+        """
+        Memoize compute_risk_score for incidents whose content has not changed
+        
+        Scores are keyed on a fingerprint of the event and alert ID sets and
+        the scoring configuration, with LRU eviction beyond maxsize entries.
+        
+        Returns:
+            The RiskScoreCache, exposing hit/miss counters via stats()
+        """
+        self.risk_score_cache = RiskScoreCache(maxsize)
+        return self.risk_score_cache
+    
+    def disable_risk_score_cache(self) -> None:
+        self.risk_score_cache = None
+    
+    def enable_instrumentation(self, sample_size: int = DEFAULT_SAMPLE_SIZE) -> EngineInstrumentation:
+        """
+        Record call counts, durations and input sizes for each engine stage
         
+        Covers the risk score and its sub-scores, group correlation scoring,
+        correlate_events and MITRE ATT&CK mapping. Pairwise event similarity
+        is not timed individually; it is accounted inside its callers.
+        
+        Returns:
+            The EngineInstrumentation, exportable via to_dict() or to_prometheus()
+        """
+        self.instrumentation = EngineInstrumentation(sample_size)
+        return self.instrumentation
+    
+    def disable_instrumentation(self) -> None:
+        self.instrumentation = None
+    
+    def _risk_score_cache_key(self, events: List[Event], alerts: List[Alert]) -> Tuple:
+        """Fingerprint of incident content and scoring configuration"""
+        return (
+            fingerprint_ids(event.event_id for event in events),
+            fingerprint_ids(alert.alert_id for alert in alerts),
+            self._scoring_config_key()
+        )
+    
+    def _scoring_config_key(self) -> Tuple:
+        """Hashable snapshot of every setting that affects compute_risk_score"""
+        return (
+            frozenset(self.asset_criticality_weights.items()),
+            self.default_criticality_weight,
+            frozenset(self.country_risk_scores.items()),
+            self.default_country_risk,
+            frozenset(self.risk_score_weights.items()),
+            frozenset(self.mitre_technique_weights.items()),
+            self.default_technique_weight,
+            self.max_technique_occurrences
+        )
+    
+    def _compute_risk_score(self, events: List[Event], alerts: List[Alert]) -> float:
+        """Uncached compute_risk_score"""
         # Base score from threat intelligence
         threat_score = self._calculate_threat_intelligence_score(events)
         
@@ -53,15 +164,39 @@ class CorrelationEngine:
         # Geographic risk factor
         geo_score = self._calculate_geographic_risk_score(events)
         
-        # Combine scores with weighted average
-        weights = {
-            'threat': 0.25,
-            'asset': 0.20,
-            'temporal': 0.15,
-            'volume': 0.15,
-            'mitre': 0.15,
-            'geo': 0.10
-        }
+        # Apply confidence factor based on data quality
+        confidence_factor = self._calculate_confidence_factor(events)
+        
+        return self._combine_risk_scores(
+            threat_score, asset_score, temporal_score, volume_score,
+            mitre_score, geo_score, confidence_factor
+        )
+    
+    @timed_stage
+    def compute_risk_score_batch(self, batch: EventBatch, alerts: List[Alert]) -> float:
+        """
+        Compute the same risk score as compute_risk_score over a columnar batch
+        
+        Every event-based sub-score is computed with vectorized NumPy operations
+        in a single pass over the batch columns. Requires numpy.
+        
+        Args:
+            batch: Columnar EventBatch built from the correlated events
+            alerts: List of related alerts
+            
+        Returns:
+            Risk score between 0-100
+        """
+        from algorithms.vectorized_scoring import compute_risk_score_vectorized
+        
+        return compute_risk_score_vectorized(self, batch, alerts)
+    
+    def _combine_risk_scores(self, threat_score: float, asset_score: float,
+                             temporal_score: float, volume_score: float,
+                             mitre_score: float, geo_score: float,
+                             confidence_factor: float) -> float:
+        """Combine sub-scores with weighted average and apply confidence factor"""
+        weights = self.risk_score_weights
         
         risk_score = (
             threat_score * weights['threat'] +
@@ -72,12 +207,11 @@ class CorrelationEngine:
             geo_score * weights['geo']
         )
         
-        # Apply confidence factor based on data quality
-        confidence_factor = self._calculate_confidence_factor(events)
         final_score = risk_score * confidence_factor
         
         return min(100.0, max(0.0, final_score))
     
+    @timed_stage
     def _calculate_threat_intelligence_score(self, events: List[Event]) -> float:
         """Calculate score based on threat intelligence reputation"""
         total_score = 0.0
@@ -101,6 +235,7 @@ class CorrelationEngine:
         
         return total_score / max(1, event_count)
     
+    @timed_stage
     def _calculate_asset_criticality_score(self, events: List[Event]) -> float:
         """Calculate score based on affected asset criticality"""
         max_criticality_score = 0.0
@@ -109,24 +244,28 @@ class CorrelationEngine:
             # Source asset criticality
             source_criticality = event.enrichment.source_asset.criticality
             if source_criticality:
-                source_score = self.asset_criticality_weights.get(source_criticality, 0.2)
+                source_score = self.asset_criticality_weights.get(
+                    source_criticality, self.default_criticality_weight)
                 max_criticality_score = max(max_criticality_score, source_score)
             
             # Destination asset criticality
             dest_criticality = event.enrichment.dest_asset.criticality
             if dest_criticality:
-                dest_score = self.asset_criticality_weights.get(dest_criticality, 0.2)
+                dest_score = self.asset_criticality_weights.get(
+                    dest_criticality, self.default_criticality_weight)
                 max_criticality_score = max(max_criticality_score, dest_score)
         
         return max_criticality_score * 100
     
-    def _calculate_temporal_correlation_score(self, events: List[Event]) -> float:
+    @timed_stage
+    def _calculate_temporal_correlation_score(
+            self, events: Union[List[Event], TimeOrderedEventBuffer]) -> float:
         """Calculate score based on temporal correlation patterns"""
         if len(events) < 2:
             return 0.0
         
         # Sort events by timestamp
-        sorted_events = sorted(events, key=lambda x: x.timestamp)
+        sorted_events = self._sorted_by_timestamp(events)
         
         # Calculate time intervals between events
         intervals = []
@@ -137,21 +276,40 @@ class CorrelationEngine:
         # Analyze burst patterns (short intervals indicate coordinated attack)
         burst_score = 0.0
         for interval in intervals:
-            if interval < 60:  # Less than 1 minute
-                burst_score += 20
-            elif interval < 300:  # Less than 5 minutes
-                burst_score += 10
-            elif interval < 1800:  # Less than 30 minutes
-                burst_score += 5
+            burst_score += self._score_burst_interval(interval)
         
         # Normalize based on number of events
         return min(100.0, burst_score / len(events))
     
+    @staticmethod
+    def _sorted_by_timestamp(events: Union[List[Event], TimeOrderedEventBuffer]
+                             ) -> Union[List[Event], TimeOrderedEventBuffer]:
+        """Events in timestamp order, reusing a TimeOrderedEventBuffer as-is"""
+        if isinstance(events, TimeOrderedEventBuffer):
+            return events
+        return sorted(events, key=lambda x: x.timestamp)
+    
+    @staticmethod
+    def _score_burst_interval(interval: float) -> float:
+        """Burst points for a single inter-event interval in seconds"""
+        if interval < 60:  # Less than 1 minute
+            return 20
+        elif interval < 300:  # Less than 5 minutes
+            return 10
+        elif interval < 1800:  # Less than 30 minutes
+            return 5
+        return 0
+    
+    @timed_stage
     def _calculate_volume_frequency_score(self, events: List[Event]) -> float:
         """Calculate score based on data volume and frequency"""
         total_bytes = sum(event.bytes_sent + event.bytes_received for event in events)
         total_packets = sum(event.packets_sent + event.packets_received for event in events)
         
+        return self._score_volume_frequency(total_bytes, len(events))
+    
+    def _score_volume_frequency(self, total_bytes: int, event_count: int) -> float:
+        """Score data volume and event frequency totals"""
         # Volume-based scoring
         volume_score = 0.0
         if total_bytes > 100 * 1024 * 1024:  # > 100MB
@@ -163,15 +321,16 @@ class CorrelationEngine:
         
         # Frequency-based scoring
         frequency_score = 0.0
-        if len(events) > 1000:
+        if event_count > 1000:
             frequency_score += 30
-        elif len(events) > 100:
+        elif event_count > 100:
             frequency_score += 20
-        elif len(events) > 10:
+        elif event_count > 10:
             frequency_score += 10
         
         return min(100.0, volume_score + frequency_score)
     
+    @timed_stage
     def _calculate_mitre_attack_score(self, alerts: List[Alert]) -> float:
         """Calculate score based on MITRE ATT&CK technique severity"""
         if not alerts:
@@ -179,42 +338,23 @@ class CorrelationEngine:
         
         total_score = 0.0
         technique_counts = {}
+        technique_weights = self.mitre_technique_weights
         
         for alert in alerts:
             for technique in alert.mitre_attack.techniques:
                 technique_counts[technique] = technique_counts.get(technique, 0) + 1
         
-        # MITRE ATT&CK technique severity weights
-        technique_weights = {
-            'T1055': 90,  # Process Injection
-            'T1059': 85,  # Command and Scripting Interpreter
-            'T1071': 80,  # Application Layer Protocol
-            'T1110': 75,  # Brute Force
-            'T1021': 70,  # Remote Services
-            'T1046': 60,  # Network Service Scanning
-            'T1041': 85,  # Exfiltration Over C2 Channel
-            'T1074': 80,  # Data Staged
-            'T1001': 75,  # Data Obfuscation
-            'T1071.004': 70,  # DNS
-            'T1110.001': 75,  # Password Brute Force
-            'T1021.004': 70,  # SSH
-        }
-        
         for technique, count in technique_counts.items():
-            weight = technique_weights.get(technique, 50)  # Default weight
-            total_score += weight * min(count, 5)  # Cap at 5 occurrences
+            weight = technique_weights.get(technique, self.default_technique_weight)
+            total_score += weight * min(count, self.max_technique_occurrences)
         
         return min(100.0, total_score / len(alerts))
     
+    @timed_stage
     def _calculate_geographic_risk_score(self, events: List[Event]) -> float:
         """Calculate score based on geographic risk factors"""
-        high_risk_countries = {
-            'China': 80,
-            'Russia': 75,
-            'North Korea': 90,
-            'Iran': 70,
-            'Unknown': 60
-        }
+        high_risk_countries = self.country_risk_scores
+        default_risk = self.default_country_risk
         
         max_geo_score = 0.0
         
@@ -222,13 +362,14 @@ class CorrelationEngine:
             source_country = event.enrichment.geolocation.source.country
             dest_country = event.enrichment.geolocation.dest.country
             
-            source_score = high_risk_countries.get(source_country, 20)
-            dest_score = high_risk_countries.get(dest_country, 20)
+            source_score = high_risk_countries.get(source_country, default_risk)
+            dest_score = high_risk_countries.get(dest_country, default_risk)
             
             max_geo_score = max(max_geo_score, source_score, dest_score)
         
         return max_geo_score
     
+    @timed_stage
     def _calculate_confidence_factor(self, events: List[Event]) -> float:
         """Calculate confidence factor based on data quality"""
         if not events:
@@ -257,6 +398,7 @@ class CorrelationEngine:
         
         return quality_indicators / max(1, total_indicators)
     
+    @timed_stage
     def map_to_mitre_attack(self, events: List[Event], alerts: List[Alert]) -> MitreAttackMapping:
         """
         Map events and alerts to MITRE ATT&CK framework
@@ -264,8 +406,24 @@ class CorrelationEngine:
         Returns:
             MitreAttackMapping object with tactics, techniques, and sub-techniques
         """
-        tactics = set()
-        techniques = set()
+        return self._build_mitre_mapping(alerts, self.mitre_mapping.map_events(events))
+    
+    @timed_stage
+    def map_to_mitre_attack_batch(self, batch: EventBatch, alerts: List[Alert]) -> MitreAttackMapping:
+        """
+        Map a columnar event batch and alerts to MITRE ATT&CK framework
+        
+        Event patterns are matched with vectorized lookups over the batch
+        columns. Requires numpy.
+        
+        Returns:
+            MitreAttackMapping object with tactics, techniques, and sub-techniques
+        """
+        return self._build_mitre_mapping(alerts, self.mitre_mapping.map_batch(batch))
+    
+    def _build_mitre_mapping(self, alerts: List[Alert], event_mask: int) -> MitreAttackMapping:
+        """Merge alert MITRE data with the tactic/technique pairs matched by events"""
+        tactics, techniques = self.mitre_mapping.decode(event_mask)
         sub_techniques = set()
         
         # Map based on alert MITRE data
@@ -274,42 +432,21 @@ class CorrelationEngine:
             techniques.update(alert.mitre_attack.techniques)
             sub_techniques.update(alert.mitre_attack.sub_techniques)
         
-        # Additional mapping based on event patterns
-        for event in events:
-            # Port-based technique mapping
-            if event.dest_port == 22:
-                techniques.add('T1021.004')  # SSH
-                tactics.add('TA0007')  # Lateral Movement
-            elif event.dest_port == 3389:
-                techniques.add('T1021.001')  # Remote Desktop Protocol
-                tactics.add('TA0007')  # Lateral Movement
-            elif event.dest_port == 53:
-                techniques.add('T1071.004')  # DNS
-                tactics.add('TA0011')  # Command and Control
-            
-            # Protocol-based technique mapping
-            if event.protocol == 6:  # TCP
-                if event.tcp_flags & 0x02:  # SYN flag
-                    techniques.add('T1046')  # Network Service Scanning
-                    tactics.add('TA0043')  # Reconnaissance
-            
-            # Volume-based technique mapping
-            if event.bytes_sent > 10 * 1024 * 1024:  # > 10MB
-                techniques.add('T1041')  # Exfiltration Over C2 Channel
-                tactics.add('TA0010')  # Exfiltration
-        
         return MitreAttackMapping(
             tactics=list(tactics),
             techniques=list(techniques),
             sub_techniques=list(sub_techniques)
         )
     
-    def correlate_events(self, events: List[Event], time_window: int = 3600) -> List[CorrelationGroup]:
+    @timed_stage
+    def correlate_events(self, events: Union[List[Event], TimeOrderedEventBuffer],
+                         time_window: int = 3600) -> List[CorrelationGroup]:
         """
         Correlate events into groups based on similarity and temporal proximity
         
         Args:
-            events: List of events to correlate
+            events: List of events to correlate, or a TimeOrderedEventBuffer
+                    (used without re-sorting)
             time_window: Time window in seconds for correlation
             
         Returns:
@@ -319,48 +456,140 @@ class CorrelationEngine:
             return []
         
         # Sort events by timestamp
-        sorted_events = sorted(events, key=lambda x: x.timestamp)
+        sorted_events = self._sorted_by_timestamp(events)
         
         correlation_groups = []
-        current_group = [sorted_events[0]]
+        builder = _CorrelationGroupBuilder(self, time_window)
         
-        for i in range(1, len(sorted_events)):
-            current_event = sorted_events[i]
-            last_event = sorted_events[i-1]
+        for event in sorted_events:
+            group = builder.add(event)
+            if group:
+                correlation_groups.append(group)
+        
+        # Add final group if it has multiple events
+        group = builder.close()
+        if group:
+            correlation_groups.append(group)
+        
+        return correlation_groups
+    
+    def correlate_events_stream(self, events: Iterable[Event], time_window: int = 3600,
+                                allowed_lateness: float = 0,
+                                on_late_event: Optional[Callable[[Event], None]] = None
+                                ) -> Iterator[CorrelationGroup]:
+        """
+        Correlate a continuous event stream, yielding groups as soon as they close
+        
+        Events may arrive up to allowed_lateness seconds behind the newest
+        event seen so far; they are held in a reorder buffer until the
+        watermark (newest timestamp minus allowed_lateness) passes them.
+        A group is emitted when the next event breaks it on time or
+        similarity, or as soon as the watermark moves more than time_window
+        past its last event. Memory is bounded by the open group and the
+        reorder buffer, not by the stream length. On time-ordered input the
+        groups match correlate_events.
+        
+        Args:
+            events: Iterable of roughly time-ordered events
+            time_window: Time window in seconds for correlation
+            allowed_lateness: How far (seconds) an event may lag the newest event
+            on_late_event: Called with events that arrive behind the watermark;
+                such events are dropped when no callback is given
+            
+        Yields:
+            Correlation groups in time order
+        """
+        builder = _CorrelationGroupBuilder(self, time_window)
+        lateness = timedelta(seconds=allowed_lateness)
+        pending = []
+        sequence = 0
+        watermark = None
+        
+        for event in events:
+            if watermark is not None and event.timestamp < watermark:
+                if on_late_event:
+                    on_late_event(event)
+                continue
+            
+            # Sequence number keeps equal timestamps in arrival order
+            heapq.heappush(pending, (event.timestamp, sequence, event))
+            sequence += 1
             
-            # Check temporal proximity
-            time_diff = (current_event.timestamp - last_event.timestamp).total_seconds()
+            candidate = event.timestamp - lateness
+            if watermark is None or candidate > watermark:
+                watermark = candidate
             
-            if time_diff <= time_window:
-                # Check similarity
-                similarity_score = self._calculate_event_similarity(current_event, last_event)
-                
-                if similarity_score > 0.7:  # 70% similarity threshold
-                    current_group.append(current_event)
-                else:
-                    # Start new group
-                    if len(current_group) > 1:
+            while pending and pending[0][0] <= watermark:
+                group = builder.add(heapq.heappop(pending)[2])
+                if group:
+                    yield group
+            
+            group = builder.expire(watermark)
+            if group:
+                yield group
+        
+        while pending:
+            group = builder.add(heapq.heappop(pending)[2])
+            if group:
+                yield group
+        
+        group = builder.close()
+        if group:
+            yield group
+    
+    @timed_stage
+    def correlate_events_partitioned(self, events: List[Event],
+                                     partition_key: Union[str, Sequence[str]] = 'source_ip',
+                                     time_window: int = 3600,
+                                     max_workers: Optional[int] = None) -> List[CorrelationGroup]:
+        """
+        Correlate events separately within each partition of a key
+        
+        Interleaved traffic from many hosts no longer breaks groups apart,
+        because each event is only compared with its predecessor from the
+        same partition. Partitions are hashed into shards that are
+        correlated in parallel on a process pool.
+        
+        Args:
+            events: List of events to correlate
+            partition_key: Event attribute name, or sequence of names, to partition on
+            time_window: Time window in seconds for correlation
+            max_workers: Worker processes (default: CPU count); 1 runs inline
+            
+        Returns:
+            List of correlation groups ordered by first event timestamp
+        """
+        if isinstance(partition_key, str):
+            partition_key = (partition_key,)
+        get_key = attrgetter(*partition_key)
+        
+        partitions = defaultdict(list)
+        for event in events:
+            partitions[get_key(event)].append(event)
+        
+        workers = max_workers or os.cpu_count() or 1
+        
+        if workers == 1 or len(partitions) < 2:
+            correlation_groups = _correlate_partitions(self, list(partitions.values()), time_window)
+        else:
+            # Several shards per worker keeps the pool balanced on skewed keys
+            shard_count = min(len(partitions), workers * 4)
+            shards = [[] for _ in range(shard_count)]
+            for key, partition in partitions.items():
+                shards[hash(key) % shard_count].append(partition)
+            
+            correlation_groups = []
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                worker = partial(_correlate_partitions_by_position, self, time_window=time_window)
+                for shard, shard_groups in zip(shards, executor.map(worker, shards)):
+                    for partition_index, positions, score in shard_groups:
+                        partition = shard[partition_index]
                         correlation_groups.append(CorrelationGroup(
-                            events=current_group,
-                            correlation_score=self._calculate_group_correlation_score(current_group)
+                            events=[partition[position] for position in positions],
+                            correlation_score=score
                         ))
-                    current_group = [current_event]
-            else:
-                # Time window exceeded, start new group
-                if len(current_group) > 1:
-                    correlation_groups.append(CorrelationGroup(
-                        events=current_group,
-                        correlation_score=self._calculate_group_correlation_score(current_group)
-                    ))
-                current_group = [current_event]
-        
-        # Add final group if it has multiple events
-        if len(current_group) > 1:
-            correlation_groups.append(CorrelationGroup(
-                events=current_group,
-                correlation_score=self._calculate_group_correlation_score(current_group)
-            ))
         
+        correlation_groups.sort(key=lambda group: group.events[0].timestamp)
         return correlation_groups
     
     def _calculate_event_similarity(self, event1: Event, event2: Event) -> float:
@@ -393,21 +622,169 @@ class CorrelationEngine:
         
         return similarity_score / max(1, total_factors)
     
+    @timed_stage
     def _calculate_group_correlation_score(self, events: List[Event]) -> float:
-        """Calculate correlation score for a group of events (0-1)"""
-        if len(events) < 2:
+        """
+        Calculate correlation score for a group of events (0-1)
+        
+        Equal to the mean _calculate_event_similarity over all event pairs.
+        Because similarity is a weighted sum of per-field equality checks, the
+        sum over all pairs is computed from per-field value frequencies in
+        linear time: a value seen c times contributes c * (c - 1) / 2 matching
+        pairs for its field.
+        """
+        event_count = len(events)
+        if event_count < 2:
             return 0.0
         
+        # Field weights mirror _calculate_event_similarity
+        matching_pairs = (
+            0.3 * self._count_matching_pairs(event.source_ip for event in events) +
+            0.3 * self._count_matching_pairs(event.dest_ip for event in events) +
+            0.2 * self._count_matching_pairs(event.dest_port for event in events) +
+            0.1 * self._count_matching_pairs(event.protocol for event in events) +
+            0.1 * self._count_matching_pairs(
+                event.enrichment.source_asset.hostname for event in events)
+        )
+        comparisons = event_count * (event_count - 1) // 2
+        
+        return matching_pairs / comparisons
+    
+    @staticmethod
+    def _count_matching_pairs(values: Iterable) -> int:
+        """Number of unordered pairs of equal values"""
+        return sum(count * (count - 1) // 2 for count in Counter(values).values())
+    
+    @timed_stage
+    def estimate_group_correlation_score(self, events: List[Event], sample_pairs: int = 10000,
+                                         confidence: float = 0.95,
+                                         seed: Optional[int] = None) -> CorrelationScoreEstimate:
+        """
+        Estimate the group correlation score from uniformly sampled event pairs
+        
+        Cost depends only on sample_pairs, not on the group size. Similarity is
+        bounded to [0, 1], so by Hoeffding's inequality the estimate is within
+        error_bound of the exact score with the requested confidence.
+        
+        Args:
+            events: Events in the correlation group
+            sample_pairs: Number of random event pairs to compare
+            confidence: Probability that the exact score lies within the bound
+            seed: Optional random seed for reproducible estimates
+            
+        Returns:
+            CorrelationScoreEstimate with the score and its error bound
+        """
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        if sample_pairs < 1:
+            raise ValueError("sample_pairs must be positive")
+        
+        event_count = len(events)
+        comparisons = event_count * (event_count - 1) // 2
+        if comparisons <= sample_pairs:
+            # Small groups are cheaper to score exactly than to sample
+            return CorrelationScoreEstimate(
+                score=self._calculate_group_correlation_score(events),
+                error_bound=0.0,
+                confidence=1.0,
+                sample_pairs=comparisons
+            )
+        
+        rng = random.Random(seed)
         total_similarity = 0.0
-        comparisons = 0
         
-        for i in range(len(events)):
-            for j in range(i + 1, len(events)):
-                similarity = self._calculate_event_similarity(events[i], events[j])
-                total_similarity += similarity
-                comparisons += 1
+        for _ in range(sample_pairs):
+            # Uniform ordered pair of distinct indices
+            i = rng.randrange(event_count)
+            j = rng.randrange(event_count - 1)
+            if j >= i:
+                j += 1
+            total_similarity += self._calculate_event_similarity(events[i], events[j])
+        
+        return CorrelationScoreEstimate(
+            score=total_similarity / sample_pairs,
+            error_bound=math.sqrt(math.log(2 / (1 - confidence)) / (2 * sample_pairs)),
+            confidence=confidence,
+            sample_pairs=sample_pairs
+        )
+
+
+def _correlate_partitions(engine: CorrelationEngine, partitions: List[List[Event]],
+                          time_window: int) -> List[CorrelationGroup]:
+    """Correlate each partition independently"""
+    correlation_groups = []
+    for partition in partitions:
+        correlation_groups.extend(engine.correlate_events(partition, time_window))
+    return correlation_groups
+
+
+def _correlate_partitions_by_position(engine: CorrelationEngine, partitions: List[List[Event]],
+                                      time_window: int) -> List[Tuple[int, List[int], float]]:
+    """
+    Process pool worker for _correlate_partitions
+    
+    Returns groups as (partition index, event positions, score) so that
+    events are not pickled back to the parent process.
+    """
+    results = []
+    for partition_index, partition in enumerate(partitions):
+        positions = {id(event): position for position, event in enumerate(partition)}
+        for group in engine.correlate_events(partition, time_window):
+            results.append((
+                partition_index,
+                [positions[id(event)] for event in group.events],
+                group.correlation_score
+            ))
+    return results
+
+
+class _CorrelationGroupBuilder:
+    """
+    Tracks the single open group while correlating time-ordered events
+    
+    Each event is compared with its immediate predecessor; a break on time
+    or similarity closes the open group and starts a new one.
+    """
+    
+    def __init__(self, engine: CorrelationEngine, time_window: int):
+        self.engine = engine
+        self.time_window = time_window
+        self.events: List[Event] = []
+    
+    def add(self, event: Event) -> Optional[CorrelationGroup]:
+        """Append an event, returning the group it closed (if any)"""
+        closed = None
         
-        return total_similarity / max(1, comparisons)
+        if self.events:
+            last_event = self.events[-1]
+            
+            # Check temporal proximity, then similarity
+            time_diff = (event.timestamp - last_event.timestamp).total_seconds()
+            if (time_diff > self.time_window or
+                    self.engine._calculate_event_similarity(event, last_event) <= 0.7):
+                closed = self.close()
+        
+        self.events.append(event)
+        return closed
+    
+    def expire(self, watermark: datetime) -> Optional[CorrelationGroup]:
+        """Close the open group if no later event can still fall in its time window"""
+        if self.events and (watermark - self.events[-1].timestamp).total_seconds() > self.time_window:
+            return self.close()
+        return None
+    
+    def close(self) -> Optional[CorrelationGroup]:
+        """Close the open group, returning it if it has multiple events"""
+        events = self.events
+        self.events = []
+        
+        if len(events) > 1:
+            return CorrelationGroup(
+                events=events,
+                correlation_score=self.engine._calculate_group_correlation_score(events)
+            )
+        return None
 
 
 # Data classes for correlation results
@@ -422,6 +799,13 @@ class CorrelationGroup:
     events: List[Event]
     correlation_score: float
 
+@dataclass
+class CorrelationScoreEstimate:
+    score: float
+    error_bound: float
+    confidence: float
+    sample_pairs: int
+
 @dataclass
 class Event:
     event_id: str
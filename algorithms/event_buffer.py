@@ -0,0 +1,157 @@
+# PyGuardian v3 - Time-Ordered Event Buffer
+# Sorted sliding-window container shared by scoring and correlation
+
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from algorithms.correlation_algorithm import Event
+
+
+class TimeOrderedEventBuffer:
+    """
+    Events kept sorted by timestamp for repeated scoring and correlation
+
+    CorrelationEngine methods accept the buffer in place of a list and skip
+    their own sort. Events arriving in time order are appended in O(1);
+    late events go to a heap in O(log k) for k pending late events, and are
+    merged into the sorted lists by the next read in one O(n + k log n)
+    pass, so a batch of late events costs one merge instead of an O(n) list
+    insert each. Eviction of the oldest events only advances a head index
+    (and pops late events from the heap) and is O(1) amortized. Events with
+    equal timestamps keep their insertion order, like a stable sort.
+
+    With max_age set, the buffer is a sliding window: every insertion evicts
+    events more than max_age seconds older than the newest event.
+    """
+
+    # Compact the backing lists once this many evicted slots accumulate
+    _COMPACT_THRESHOLD = 4096
+
+    def __init__(self, events: Iterable[Event] = (), max_age: Optional[float] = None):
+        self.max_age = timedelta(seconds=max_age) if max_age is not None else None
+        self._timestamps: List[datetime] = []
+        self._events: List[Event] = []
+        self._head = 0
+        # Late events not merged yet: (timestamp, insertion sequence, event)
+        self._late: List[Tuple[datetime, int, Event]] = []
+        self._sequence = 0
+
+        for event in sorted(events, key=lambda x: x.timestamp):
+            self.add(event)
+
+    def __len__(self) -> int:
+        return len(self._events) - self._head + len(self._late)
+
+    def __iter__(self) -> Iterator[Event]:
+        self._merge_late()
+        events = self._events
+        for index in range(self._head, len(events)):
+            yield events[index]
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Event, List[Event]]:
+        self._merge_late()
+        if isinstance(index, slice):
+            return self._events[self._head:][index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event buffer index out of range")
+        return self._events[self._head + index]
+
+    @property
+    def oldest(self) -> Optional[datetime]:
+        self._merge_late()
+        return self._timestamps[self._head] if len(self) else None
+
+    @property
+    def newest(self) -> Optional[datetime]:
+        # late events are older than the newest event when they arrive, so it is never among them
+        return self._timestamps[-1] if len(self) else None
+
+    def add(self, event: Event) -> None:
+        """Insert an event at its time-ordered position"""
+        timestamp = event.timestamp
+        timestamps = self._timestamps
+
+        if not len(self) or timestamp >= timestamps[-1]:
+            timestamps.append(timestamp)
+            self._events.append(event)
+        else:
+            heapq.heappush(self._late, (timestamp, self._sequence, event))
+            self._sequence += 1
+
+        if self.max_age is not None:
+            self.evict_before(timestamps[-1] - self.max_age)
+
+    def extend(self, events: Iterable[Event]) -> None:
+        for event in events:
+            self.add(event)
+
+    def evict_before(self, cutoff: datetime) -> int:
+        """
+        Drop events with timestamps strictly before cutoff
+
+        Returns:
+            Number of events evicted
+        """
+        late = self._late
+        evicted = 0
+        while late and late[0][0] < cutoff:
+            heapq.heappop(late)
+            evicted += 1
+
+        if self._head == len(self._timestamps) or self._timestamps[self._head] >= cutoff:
+            return evicted
+
+        new_head = bisect_left(self._timestamps, cutoff, lo=self._head)
+        evicted += new_head - self._head
+        events = self._events
+
+        # Release references so evicted events can be collected
+        for index in range(self._head, new_head):
+            events[index] = None
+        self._head = new_head
+
+        if self._head >= self._COMPACT_THRESHOLD and self._head * 2 >= len(events):
+            del self._timestamps[:self._head]
+            del events[:self._head]
+            self._head = 0
+
+        return evicted
+
+    def clear(self) -> None:
+        self._timestamps.clear()
+        self._events.clear()
+        self._late.clear()
+        self._head = 0
+
+    def _merge_late(self) -> None:
+        """Merge pending late events into the sorted lists, after equal timestamps already there"""
+        if not self._late:
+            return
+        late = sorted(self._late)
+        self._late = []
+        timestamps = self._timestamps[self._head:]
+        events = self._events[self._head:]
+
+        merged_timestamps: List[datetime] = []
+        merged_events: List[Event] = []
+        start = 0
+        for timestamp, _, event in late:
+            stop = bisect_right(timestamps, timestamp, lo=start)
+            merged_timestamps.extend(timestamps[start:stop])
+            merged_events.extend(events[start:stop])
+            merged_timestamps.append(timestamp)
+            merged_events.append(event)
+            start = stop
+        merged_timestamps.extend(timestamps[start:])
+        merged_events.extend(events[start:])
+
+        self._timestamps = merged_timestamps
+        self._events = merged_events
+        self._head = 0
@@ -0,0 +1,193 @@
+# PyGuardian v3 - Incremental Risk Scoring
+# Online accumulators for CorrelationEngine risk scores on long-lived incidents
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable
+
+from algorithms.correlation_algorithm import Alert, CorrelationEngine, Event
+
+
+class IncrementalRiskScorer:
+    """
+    Stateful risk scorer for a single open incident
+
+    Keeps running accumulators for every sub-score of
+    CorrelationEngine.compute_risk_score, so adding an event or alert costs
+    O(1) instead of rescoring the whole incident. The burst score only needs
+    the newest timestamp for in-order events.
+
+    With `max_lateness` set, timestamps of the last `max_lateness` seconds
+    (plus the one before them) are retained, so an event up to that far
+    behind the newest one still splits the right interval and the score
+    stays exact; it costs a binary search and an insert into that bounded
+    window. Events later than that are counted in `inexact_events` and add
+    no burst points, so the temporal score may differ from
+    compute_risk_score once there are any.
+    """
+
+    def __init__(self, engine: CorrelationEngine, max_lateness: float = 0.0):
+        self.engine = engine
+        self.max_lateness = timedelta(seconds=max_lateness)
+
+        # Threat intelligence
+        self.reputation_risk_total = 0.0
+        self.reputation_count = 0
+
+        # Asset criticality
+        self.max_criticality_weight = 0.0
+
+        # Temporal correlation
+        self.burst_score = 0.0
+        self.inexact_events = 0
+        self._timestamps: Deque[datetime] = deque()  # sorted; newest last
+        self._trimmed = False  # whether older timestamps were dropped from the window
+
+        # Volume and frequency
+        self.event_count = 0
+        self.total_bytes = 0
+        self.total_packets = 0
+
+        # MITRE ATT&CK
+        self.alert_count = 0
+        self.technique_counts: Dict[str, int] = {}
+        self.technique_score_total = 0.0
+
+        # Geographic risk
+        self.max_geo_score = 0.0
+
+        # Confidence factor
+        self.quality_indicators = 0
+
+    def add_event(self, event: Event) -> None:
+        """Fold a new event into the running accumulators"""
+        engine = self.engine
+        enrichment = event.enrichment
+        threat_intel = enrichment.threat_intel
+        geolocation = enrichment.geolocation
+
+        source_reputation = threat_intel.source_reputation
+        if source_reputation:
+            self.reputation_risk_total += max(0, (100 - source_reputation.score) / 2)
+            self.reputation_count += 1
+            self.quality_indicators += 1
+
+        dest_reputation = threat_intel.dest_reputation
+        if dest_reputation:
+            self.reputation_risk_total += max(0, (100 - dest_reputation.score) / 2)
+            self.reputation_count += 1
+            self.quality_indicators += 1
+
+        for criticality in (enrichment.source_asset.criticality, enrichment.dest_asset.criticality):
+            if criticality:
+                weight = engine.asset_criticality_weights.get(
+                    criticality, engine.default_criticality_weight)
+                self.max_criticality_weight = max(self.max_criticality_weight, weight)
+
+        self._add_timestamp(event.timestamp)
+
+        self.event_count += 1
+        self.total_bytes += event.bytes_sent + event.bytes_received
+        self.total_packets += event.packets_sent + event.packets_received
+
+        source_country = geolocation.source.country
+        dest_country = geolocation.dest.country
+        self.max_geo_score = max(
+            self.max_geo_score,
+            engine.country_risk_scores.get(source_country, engine.default_country_risk),
+            engine.country_risk_scores.get(dest_country, engine.default_country_risk)
+        )
+        if source_country:
+            self.quality_indicators += 1
+        if dest_country:
+            self.quality_indicators += 1
+
+    def add_alert(self, alert: Alert) -> None:
+        """Fold a new alert into the MITRE ATT&CK accumulators"""
+        engine = self.engine
+        self.alert_count += 1
+
+        for technique in alert.mitre_attack.techniques:
+            count = self.technique_counts.get(technique, 0) + 1
+            self.technique_counts[technique] = count
+            # Only occurrences up to the cap contribute to the score
+            if count <= engine.max_technique_occurrences:
+                self.technique_score_total += engine.mitre_technique_weights.get(
+                    technique, engine.default_technique_weight)
+
+    def add_events(self, events: Iterable[Event]) -> None:
+        for event in events:
+            self.add_event(event)
+
+    def add_alerts(self, alerts: Iterable[Alert]) -> None:
+        for alert in alerts:
+            self.add_alert(alert)
+
+    def _add_timestamp(self, timestamp: datetime) -> None:
+        """Insert a timestamp and update the burst score for the changed intervals"""
+        timestamps = self._timestamps
+        burst = self.engine._score_burst_interval
+
+        if not timestamps or timestamp >= timestamps[-1]:
+            # In-order arrival: one new interval after the previous last event
+            if timestamps:
+                self.burst_score += burst((timestamp - timestamps[-1]).total_seconds())
+            timestamps.append(timestamp)
+            # Keep the window, plus the newest timestamp before it as the left neighbour
+            cutoff = timestamp - self.max_lateness
+            while len(timestamps) > 1 and timestamps[1] <= cutoff:
+                timestamps.popleft()
+                self._trimmed = True
+            return
+
+        if timestamp < timestamps[0] and self._trimmed:
+            # Behind the retained window: its neighbours are no longer known
+            self.inexact_events += 1
+            return
+
+        # Late arrival: the interval it lands in is split in two
+        index = bisect_right(timestamps, timestamp)
+        following = timestamps[index]
+        if index > 0:
+            previous = timestamps[index - 1]
+            self.burst_score -= burst((following - previous).total_seconds())
+            self.burst_score += burst((timestamp - previous).total_seconds())
+        self.burst_score += burst((following - timestamp).total_seconds())
+        timestamps.insert(index, timestamp)
+
+    def score(self) -> float:
+        """
+        Current risk score, identical to compute_risk_score on the same data
+
+        Returns:
+            Risk score between 0-100
+        """
+        engine = self.engine
+
+        threat_score = self.reputation_risk_total / max(1, self.reputation_count)
+        asset_score = self.max_criticality_weight * 100
+
+        if self.event_count < 2:
+            temporal_score = 0.0
+        else:
+            temporal_score = min(100.0, self.burst_score / self.event_count)
+
+        volume_score = engine._score_volume_frequency(self.total_bytes, self.event_count)
+
+        if self.alert_count:
+            mitre_score = min(100.0, self.technique_score_total / self.alert_count)
+        else:
+            mitre_score = 0.0
+
+        if self.event_count:
+            confidence_factor = self.quality_indicators / (4 * self.event_count)
+        else:
+            confidence_factor = 0.0
+
+        return engine._combine_risk_scores(
+            threat_score, asset_score, temporal_score, volume_score,
+            mitre_score, self.max_geo_score, confidence_factor
+        )
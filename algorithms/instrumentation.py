@@ -0,0 +1,127 @@
+# PyGuardian v3 - Correlation Engine Instrumentation
+# Per-stage call counts, durations and input sizes with dict/Prometheus export
+
+from __future__ import annotations
+
+from collections import deque
+from functools import wraps
+from time import perf_counter
+from typing import Any, Callable, Deque, Dict, List, TypeVar
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# Percentiles are computed over this many most recent calls per stage
+DEFAULT_SAMPLE_SIZE = 1024
+
+
+class StageStats:
+    """Accumulated timings for one engine stage"""
+
+    __slots__ = ('calls', 'total_seconds', 'max_seconds', 'input_items', 'max_input_size', 'samples')
+
+    def __init__(self, sample_size: int):
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.input_items = 0
+        self.max_input_size = 0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def record(self, seconds: float, input_size: int) -> None:
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.input_items += input_size
+        self.max_input_size = max(self.max_input_size, input_size)
+        self.samples.append(seconds)
+
+    def percentile(self, quantile: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'total_seconds': self.total_seconds,
+            'mean_seconds': self.total_seconds / self.calls if self.calls else 0.0,
+            'p50_seconds': self.percentile(0.5),
+            'p99_seconds': self.percentile(0.99),
+            'max_seconds': self.max_seconds,
+            'input_items': self.input_items,
+            'max_input_size': self.max_input_size
+        }
+
+
+class EngineInstrumentation:
+    """
+    Timing recorder attached to a CorrelationEngine
+
+    Stages are recorded by methods decorated with timed_stage while the
+    engine's `instrumentation` attribute is set.
+    """
+
+    def __init__(self, sample_size: int = DEFAULT_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.stages: Dict[str, StageStats] = {}
+
+    def record(self, stage: str, seconds: float, input_size: int) -> None:
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats(self.sample_size)
+        stats.record(seconds, input_size)
+
+    def reset(self) -> None:
+        self.stages.clear()
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {stage: stats.to_dict() for stage, stats in sorted(self.stages.items())}
+
+    def to_prometheus(self, prefix: str = 'pyguardian_correlation') -> str:
+        """Render stage metrics in the Prometheus text exposition format"""
+        stages = sorted(self.stages.items())
+        duration = f"{prefix}_stage_duration_seconds"
+        items = f"{prefix}_stage_input_items_total"
+        lines: List[str] = [
+            f"# HELP {duration} Correlation engine stage duration",
+            f"# TYPE {duration} summary",
+        ]
+        for stage, stats in stages:
+            label = f'stage="{stage}"'
+            lines.append(f'{duration}{{{label},quantile="0.5"}} {stats.percentile(0.5):.9f}')
+            lines.append(f'{duration}{{{label},quantile="0.99"}} {stats.percentile(0.99):.9f}')
+            lines.append(f'{duration}_sum{{{label}}} {stats.total_seconds:.9f}')
+            lines.append(f'{duration}_count{{{label}}} {stats.calls}')
+        lines.append(f"# HELP {items} Events or alerts passed to each stage")
+        lines.append(f"# TYPE {items} counter")
+        for stage, stats in stages:
+            lines.append(f'{items}{{stage="{stage}"}} {stats.input_items}')
+        return "\n".join(lines) + "\n"
+
+
+def timed_stage(method: F) -> F:
+    """
+    Record duration and input size of an engine method
+
+    The input size is the length of the first argument (events, alerts or
+    an EventBatch). When the engine has no instrumentation attached the
+    wrapper costs a single attribute check.
+    """
+    stage = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return method(self, *args, **kwargs)
+
+        started = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed = perf_counter() - started
+            items = args[0] if args else next(iter(kwargs.values()), None)
+            instrumentation.record(stage, elapsed, len(items) if hasattr(items, '__len__') else 0)
+
+    return wrapper
@@ -0,0 +1,176 @@
+# PyGuardian v3 - MITRE ATT&CK Mapping Tables
+# Data-driven port, protocol-flag and volume mappings compiled into lookup tables
+
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Set, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from algorithms.correlation_algorithm import Event
+    from algorithms.vectorized_scoring import EventBatch
+
+DEFAULT_MAPPING_PATH = Path(__file__).resolve().parent.parent / "rules" / "mitre_attack_mapping.json"
+
+PORT_COUNT = 65536
+# Flag rules are indexed by (protocol << 8) | (tcp_flags & 0xFF)
+FLAG_INDEX_COUNT = 256 * 256
+VOLUME_FIELDS = ('bytes_sent', 'bytes_received', 'packets_sent', 'packets_received')
+
+_WORD_MASK = (1 << 64) - 1
+
+
+class MitreMappingTable:
+    """
+    Compiled MITRE ATT&CK mapping rules
+
+    Every distinct (tactic, technique) pair produced by a rule gets a bit.
+    Port and protocol-flag rules are compiled into lookup tables holding the
+    bitmask of pairs for every port and every (protocol, flags) value, so
+    mapping an event costs two list lookups no matter how many rules exist.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.techniques: Dict[str, Dict[str, Any]] = dict(config.get('techniques', {}))
+        self.default_technique_weight = config.get('default_technique_weight', 50)
+        self.technique_weights: Dict[str, float] = {
+            technique: info['weight']
+            for technique, info in self.techniques.items()
+            if 'weight' in info
+        }
+
+        self.mappings: List[Tuple[str, str]] = []
+        self._mapping_bits: Dict[Tuple[str, str], int] = {}
+        self.port_masks: List[int] = [0] * PORT_COUNT
+        self.flag_masks: List[int] = [0] * FLAG_INDEX_COUNT
+        self.volume_rules: List[Tuple[str, int, int]] = []
+        self._numpy_tables = None
+
+        for rule in config.get('port_rules', []):
+            port = rule['dest_port']
+            if not 0 <= port < PORT_COUNT:
+                raise ValueError(f"Invalid dest_port in MITRE port rule: {port}")
+            self.port_masks[port] |= self._bit(rule)
+
+        for rule in config.get('flag_rules', []):
+            protocol = rule['protocol']
+            flags_any = rule['tcp_flags_any']
+            if not 0 <= protocol < 256 or not 0 < flags_any < 256:
+                raise ValueError(f"Invalid protocol/tcp_flags_any in MITRE flag rule: {rule}")
+            bit = self._bit(rule)
+            for flags in range(256):
+                if flags & flags_any:
+                    self.flag_masks[(protocol << 8) | flags] |= bit
+
+        for rule in config.get('volume_rules', []):
+            if rule['field'] not in VOLUME_FIELDS:
+                raise ValueError(f"Unsupported field in MITRE volume rule: {rule['field']}")
+            self.volume_rules.append((rule['field'], rule['greater_than'], self._bit(rule)))
+
+    def __reduce__(self):
+        # Ship the small rule config to worker processes, not the compiled tables
+        return (MitreMappingTable, (self.config,))
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_MAPPING_PATH) -> MitreMappingTable:
+        """Load and compile a mapping table from a JSON data file"""
+        with open(path, encoding="utf-8") as handle:
+            return cls(json.load(handle))
+
+    def _bit(self, rule: Dict[str, Any]) -> int:
+        mapping = (rule['tactic'], rule['technique'])
+        bit = self._mapping_bits.get(mapping)
+        if bit is None:
+            bit = 1 << len(self.mappings)
+            self._mapping_bits[mapping] = bit
+            self.mappings.append(mapping)
+        return bit
+
+    def decode(self, mask: int) -> Tuple[Set[str], Set[str]]:
+        """Expand a bitmask of mapping pairs into (tactics, techniques)"""
+        tactics = set()
+        techniques = set()
+        index = 0
+        while mask:
+            if mask & 1:
+                tactic, technique = self.mappings[index]
+                tactics.add(tactic)
+                techniques.add(technique)
+            mask >>= 1
+            index += 1
+        return tactics, techniques
+
+    def map_events(self, events: Sequence[Event]) -> int:
+        """Bitmask of mapping pairs matched by any of the events"""
+        # Look up each distinct port and (protocol, flags) value once
+        ports = {event.dest_port for event in events}
+        flag_indexes = {(event.protocol << 8) | (event.tcp_flags & 0xFF) for event in events}
+
+        mask = 0
+        port_masks = self.port_masks
+        for port in ports:
+            if 0 <= port < PORT_COUNT:
+                mask |= port_masks[port]
+        flag_masks = self.flag_masks
+        for flag_index in flag_indexes:
+            if 0 <= flag_index < FLAG_INDEX_COUNT:
+                mask |= flag_masks[flag_index]
+        for field, threshold, bit in self.volume_rules:
+            if max(map(attrgetter(field), events), default=threshold) > threshold:
+                mask |= bit
+        return mask
+
+    def map_batch(self, batch: EventBatch) -> int:
+        """Vectorized map_events over a columnar EventBatch"""
+        import numpy as np
+
+        port_table, flag_table = self._get_numpy_tables()
+        words = port_table.shape[1]
+        mask_words = np.zeros(words, dtype=np.uint64)
+
+        # Reduce to the distinct ports/flags present before touching the tables
+        ports = batch.dest_ports
+        present = np.zeros(PORT_COUNT, dtype=bool)
+        present[ports[(ports >= 0) & (ports < PORT_COUNT)]] = True
+        mask_words |= np.bitwise_or.reduce(port_table[present], axis=0)
+
+        flag_indexes = (batch.protocols.astype(np.int64) << 8) | (batch.tcp_flags & 0xFF)
+        present = np.zeros(FLAG_INDEX_COUNT, dtype=bool)
+        present[flag_indexes[(flag_indexes >= 0) & (flag_indexes < FLAG_INDEX_COUNT)]] = True
+        mask_words |= np.bitwise_or.reduce(flag_table[present], axis=0)
+
+        mask = 0
+        for word in range(words):
+            mask |= int(mask_words[word]) << (64 * word)
+        for field, threshold, bit in self.volume_rules:
+            if (getattr(batch, field) > threshold).any():
+                mask |= bit
+        return mask
+
+    def _get_numpy_tables(self):
+        """Lookup tables as (rows, words) uint64 arrays, built on first batch use"""
+        if self._numpy_tables is None:
+            import numpy as np
+
+            words = max(1, (len(self.mappings) + 63) // 64)
+
+            def to_array(masks: List[int]):
+                table = np.zeros((len(masks), words), dtype=np.uint64)
+                for row, mask in enumerate(masks):
+                    if mask:
+                        for word in range(words):
+                            table[row, word] = (mask >> (64 * word)) & _WORD_MASK
+                return table
+
+            self._numpy_tables = (to_array(self.port_masks), to_array(self.flag_masks))
+        return self._numpy_tables
+
+
+@lru_cache(maxsize=None)
+def load_default_mapping() -> MitreMappingTable:
+    """Shared mapping table compiled once per process from the default data file"""
+    return MitreMappingTable.load()
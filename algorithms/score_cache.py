@@ -0,0 +1,74 @@
+# PyGuardian v3 - Risk Score Cache
+# Bounded LRU memoization of incident risk scores keyed on content fingerprints
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+
+def fingerprint_ids(ids: Iterable[Hashable]) -> bytes:
+    """
+    Order-independent fingerprint of a set of IDs
+
+    A 128-bit BLAKE2b digest of the sorted, distinct ID reprs. Sums or xors
+    of per-ID hashes collide structurally (for int IDs, {1, 2} and {0, 3}
+    have the same count, sum and xor), and a collision would return another
+    incident's cached score; a cryptographic digest makes that negligible
+    while keeping cache keys small.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for value in sorted(set(map(repr, ids))):
+        digest.update(value.encode('utf-8', 'surrogatepass'))
+        digest.update(b'\x00')  # reprs escape control characters, so this cannot occur inside one
+    return digest.digest()
+
+
+class RiskScoreCache:
+    """
+    LRU cache of risk scores with hit/miss counters
+
+    Keys identify an incident's event and alert ID sets plus the scoring
+    configuration. Events and alerts are assumed immutable once scored;
+    call clear() after re-enriching events in place.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._scores: OrderedDict[Hashable, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def get(self, key: Hashable) -> Optional[float]:
+        score = self._scores.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self._scores.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def put(self, key: Hashable, score: float) -> None:
+        self._scores[key] = score
+        self._scores.move_to_end(key)
+        if len(self._scores) > self.maxsize:
+            self._scores.popitem(last=False)
+
+    def clear(self) -> None:
+        self._scores.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._scores),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -1,12 +1,21 @@
 # PyGuardian v3 - FastAPI Endpoints Specification
 
-from fastapi import APIRouter, Depends, Query, Path, Body, WebSocket
+from fastapi import APIRouter, Depends, Query, Path, Body, WebSocket, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 from enum import Enum
 
+from functools import lru_cache
+
+from detection.backtest import MAX_API_WORKERS, backtest_events, backtest_rule, resolve_archive_paths
+from detection.rule_compiler import RuleCompilationError
+from detection.rule_costs import RuleCostTracker
+from detection.rule_detector import RuleDetector
+from detection.rule_set import RuleRegistry
+
 # Authentication and Authorization
 security = HTTPBearer()
 
@@ -102,6 +111,7 @@ class RuleResponse(BaseModel):
     created_by: str
     created_at: datetime
     updated_at: datetime
+    stats: Optional[Dict[str, Any]] = None
 
 class DashboardKPIs(BaseModel):
     active_alerts: int
@@ -457,6 +467,42 @@ async def get_enrichment_sources(
 
 # RULES ENDPOINTS
 
+@lru_cache(maxsize=None)
+def get_rule_registry() -> RuleRegistry:
+    """Process-wide rule registry; detectors subscribe to its versioned rule sets"""
+    return RuleRegistry.from_file()
+
+@lru_cache(maxsize=None)
+def get_rule_cost_tracker() -> RuleCostTracker:
+    """Per-rule cost accounting, budgets from engine_config.performance"""
+    return RuleCostTracker.from_engine_config(get_rule_registry().current.engine_config)
+
+@lru_cache(maxsize=None)
+def get_rule_detector() -> RuleDetector:
+    """Process-wide detector; accounts to the cost tracker whose stats the rules endpoints report"""
+    return RuleDetector(get_rule_registry(), get_rule_cost_tracker())
+
+def _rule_response(registry: RuleRegistry, rule_id: str) -> Dict[str, Any]:
+    definition = registry.definition(rule_id)
+    created_at, updated_at = registry.timestamps(rule_id)
+    return {
+        'rule_id': rule_id,
+        'name': definition.get('name', rule_id),
+        'description': definition.get('description', ''),
+        'enabled': definition.get('enabled', True),
+        'severity': definition.get('severity', 'medium'),
+        'category': definition.get('category', ''),
+        'conditions': definition.get('conditions') or [],
+        'aggregation': definition.get('aggregation') or {},
+        'mitre_attack': definition.get('mitre_attack') or {},
+        'actions': definition.get('actions') or [],
+        'tags': definition.get('tags') or [],
+        'created_by': definition.get('created_by', 'system'),
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'stats': get_rule_cost_tracker().stats(rule_id)
+    }
+
 @rules_router.get("/", response_model=List[RuleResponse])
 async def get_rules(
     enabled: Optional[bool] = Query(None),
@@ -466,8 +512,21 @@ async def get_rules(
 ):
     """
     Get detection rules
-    """
-    pass
+
+    Each rule includes its evaluation stats: CPU time, events evaluated,
+    match rate, aggregation-state memory and budget status.
+    """
+    registry = get_rule_registry()
+    responses = []
+    for definition in registry.definitions():
+        if enabled is not None and definition.get('enabled', True) != enabled:
+            continue
+        if category is not None and definition.get('category') != category:
+            continue
+        if severity is not None and definition.get('severity') != severity:
+            continue
+        responses.append(_rule_response(registry, definition['id']))
+    return responses
 
 @rules_router.get("/{rule_id}", response_model=RuleResponse)
 async def get_rule(
@@ -477,7 +536,10 @@ async def get_rule(
     """
     Get specific rule by ID
     """
-    pass
+    registry = get_rule_registry()
+    if registry.definition(rule_id) is None:
+        raise HTTPException(status_code=404, detail=f"Rule {rule_id} not found")
+    return _rule_response(registry, rule_id)
 
 @rules_router.post("/", response_model=RuleResponse)
 async def create_rule(
@@ -486,8 +548,18 @@ async def create_rule(
 ):
     """
     Create new detection rule
+
+    The rule is compiled and published to running detectors in a new rule
+    set version; aggregation state of other rules is kept.
     """
-    pass
+    registry = get_rule_registry()
+    try:
+        await run_in_threadpool(registry.create_rule, rule)
+    except RuleCompilationError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except KeyError:
+        raise HTTPException(status_code=409, detail=f"Rule {rule.get('id')} already exists")
+    return _rule_response(registry, rule['id'])
 
 @rules_router.patch("/{rule_id}")
 async def update_rule(
@@ -497,8 +569,20 @@ async def update_rule(
 ):
     """
     Update detection rule
+
+    Only this rule is recompiled. Its aggregation state is kept unless the
+    conditions, aggregation or enabled flag change.
     """
-    pass
+    registry = get_rule_registry()
+    try:
+        result = await run_in_threadpool(registry.update_rule, rule_id, updates)
+    except RuleCompilationError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Rule {rule_id} not found")
+    if updates.get('enabled'):
+        get_rule_cost_tracker().reset(rule_id)  # re-enabling also lifts a budget suspension
+    return {**_rule_response(registry, rule_id), 'version': result.version}
 
 @rules_router.delete("/{rule_id}")
 async def delete_rule(
@@ -508,7 +592,13 @@ async def delete_rule(
     """
     Delete detection rule
     """
-    pass
+    registry = get_rule_registry()
+    try:
+        result = await run_in_threadpool(registry.delete_rule, rule_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Rule {rule_id} not found")
+    get_rule_cost_tracker().forget([rule_id])
+    return {'rule_id': rule_id, 'deleted': True, 'version': result.version}
 
 @rules_router.post("/{rule_id}/test")
 async def test_rule(
@@ -518,8 +608,39 @@ async def test_rule(
 ):
     """
     Test detection rule with sample data
-    """
-    pass
+
+    test_data may be a single event, {"events": [...]}, or a backtest over
+    stored flows: {"paths": ["2024-01-15/*.jsonl"], "max_workers": 8}, with
+    paths relative to the flow archive and max_workers capped at
+    PYGUARDIAN_BACKTEST_MAX_WORKERS (default: CPU count). An edited, unsaved
+    definition can be passed as "rule". Returns match counts, sample alerts
+    and throughput.
+    """
+    test_data = test_data or {}
+    definition = test_data.get('rule') or get_rule_registry().definition(rule_id)
+    if definition is None:
+        raise HTTPException(status_code=404, detail=f"Rule {rule_id} not found")
+    definition = {**definition, 'id': rule_id}
+    sample_alerts = test_data.get('sample_alerts', 10)
+
+    try:
+        if 'paths' in test_data:
+            max_workers = test_data.get('max_workers') or MAX_API_WORKERS
+            if not isinstance(max_workers, int) or max_workers < 1:
+                raise ValueError("max_workers must be a positive integer")
+            result = await run_in_threadpool(
+                backtest_rule, definition, resolve_archive_paths(test_data['paths']),
+                max_workers=min(max_workers, MAX_API_WORKERS), sample_alerts=sample_alerts
+            )
+        else:
+            events = test_data.get('events')
+            if events is None:
+                events = [test_data] if 'timestamp' in test_data else []
+            result = await run_in_threadpool(backtest_events, definition, events, sample_alerts=sample_alerts)
+    except (RuleCompilationError, ValueError) as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+    return result.to_dict()
 
 # DASHBOARD ENDPOINTS
 
@@ -0,0 +1,85 @@
+# PyGuardian v3 - Action Executor Benchmark
+# Detection throughput with rule actions run inline vs. queued to ActionExecutor, as action latency grows
+#
+# Usage: python -m benchmarks.bench_action_executor [--events 10000]
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+from detection.action_executor import (
+    CREATE_ALERT, CREATE_INCIDENT, NOTIFY, RUN_SCRIPT, ActionExecutor, ActionRequest
+)
+from detection.rule_compiler import compile_rules
+from detection.rule_index import RuleIndex
+
+ACTION_LATENCIES_MS = (0, 1, 5)
+
+_ACTIONS = [
+    {'type': CREATE_ALERT, 'severity': 'medium'},
+    {'type': NOTIFY, 'channels': ['slack'], 'recipients': ['security-team@company.com']},
+    {'type': RUN_SCRIPT, 'script': 'log_suspicious_activity.sh',
+     'parameters': {'source_ip': '{{ source_ip }}', 'dest': '{{ dest_ip }}:{{ dest_port }}'}},
+]
+
+
+def benchmark_rules() -> List[Dict[str, Any]]:
+    """A few rules that fire on roughly one flow in a hundred"""
+    return [
+        {'id': f'action_bench_{port}', 'name': 'action bench', 'actions': _ACTIONS,
+         'conditions': [{'field': 'dest_port', 'operator': 'equals', 'value': port},
+                        {'field': 'bytes_sent', 'operator': 'greater_than', 'value': 20_000}]}
+        for port in (22, 445, 3389)
+    ]
+
+
+def _handler(latency: float):
+    def handle(request: ActionRequest) -> None:
+        request.parameters
+        if latency:
+            time.sleep(latency)
+    return handle
+
+
+def run(event_count: int) -> None:
+    events = list(SyntheticFlowGenerator().records(event_count))
+    index = RuleIndex(compile_rules(benchmark_rules()))
+
+    print(f"{'latency':>8} {'fired':>6} {'inline ev/s':>13} {'queued ev/s':>13} "
+          f"{'dropped':>8} {'max depth':>10} {'drain s':>8}")
+    for latency_ms in ACTION_LATENCIES_MS:
+        handle = _handler(latency_ms / 1000)
+        handlers = {action_type: handle for action_type in (CREATE_ALERT, NOTIFY, CREATE_INCIDENT, RUN_SCRIPT)}
+
+        inline = ActionExecutor(handlers)
+        started = time.perf_counter()
+        fired = 0
+        for event in events:
+            for rule in index.match(event):
+                fired += 1
+                for action in inline.actions_for(rule):
+                    handle(ActionRequest(action, event, 0.0))
+        inline_seconds = time.perf_counter() - started
+
+        executor = ActionExecutor(handlers).start()
+        started = time.perf_counter()
+        for event in events:
+            for rule in index.match(event):
+                executor.dispatch(rule, event)
+        queued_seconds = time.perf_counter() - started
+        executor.stop()
+        drain_seconds = time.perf_counter() - started - queued_seconds
+
+        pools = executor.stats()['pools'].values()
+        print(f"{latency_ms:>6}ms {fired:>6} {event_count / inline_seconds:>13,.0f} "
+              f"{event_count / queued_seconds:>13,.0f} {sum(pool['dropped'] for pool in pools):>8} "
+              f"{max(pool['max_queue_depth'] for pool in pools):>10} {drain_seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Action executor benchmark")
+    parser.add_argument("--events", type=int, default=10_000)
+    run(parser.parse_args().events)
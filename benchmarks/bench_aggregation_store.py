@@ -0,0 +1,63 @@
+# PyGuardian v3 - Aggregation Store Benchmark
+# Port-scan traffic through the port-scan rule window in exact and HyperLogLog modes
+#
+# Usage: python -m benchmarks.bench_aggregation_store [--sources 1000] [--ports 2000]
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Optional
+
+from detection.aggregation_store import AggregationSpec, WindowedAggregator
+
+PORT_SCAN = {
+    'group_by': ['source_ip'],
+    'time_window': '10m',
+    'threshold': {'unique_dest_ports': 20, 'operator': 'greater_than'}
+}
+
+
+def run(sources: int, ports: int, memory_limit: Optional[int], seed: int = 42) -> None:
+    rng = random.Random(seed)
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(sources)]
+    events = [{'source_ip': rng.choice(ips), 'dest_port': rng.randint(1, 65535)}
+              for _ in range(sources * ports)]
+    step = 300.0 / len(events)  # whole scan inside one window
+
+    print(f"{len(events):,} events from {sources:,} sources")
+    print(f"{'mode':>6} {'events/s':>12} {'keys':>8} {'accounted MB':>13} {'traced MB':>10} "
+          f"{'evicted':>8}")
+    for mode in ('exact', 'hll'):
+        def replay() -> WindowedAggregator:
+            aggregator = WindowedAggregator(AggregationSpec.from_rule(PORT_SCAN),
+                                            memory_limit=memory_limit, distinct_mode=mode)
+            for i, event in enumerate(events):
+                aggregator.add(event, timestamp=i * step)
+            return aggregator
+
+        started = time.perf_counter()
+        aggregator = replay()
+        seconds = time.perf_counter() - started
+
+        tracemalloc.start()
+        traced_aggregator = replay()
+        traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del traced_aggregator
+
+        print(f"{mode:>6} {len(events) / seconds:>12,.0f} {len(aggregator):>8,} "
+              f"{aggregator.memory_bytes / 2**20:>13.1f} {traced / 2**20:>10.1f} "
+              f"{aggregator.evicted_keys:>8,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregation store benchmark")
+    parser.add_argument("--sources", type=int, default=1_000)
+    parser.add_argument("--ports", type=int, default=2_000)
+    parser.add_argument("--memory-limit-mb", type=int, default=None)
+    args = parser.parse_args()
+    limit = args.memory_limit_mb * 2**20 if args.memory_limit_mb else None
+    run(args.sources, args.ports, limit)
@@ -0,0 +1,62 @@
+# PyGuardian v3 - Backtest Benchmark
+# Replays synthetic flow archives (JSON lines and columnar) through a rule with 1..N workers
+#
+# Usage: python -m benchmarks.bench_backtest [--events 1000000] [--rule rule-data-exfiltration]
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+from detection.backtest import backtest_rule, write_columnar
+from detection.rule_compiler import load_rule_file
+
+FILES = 8  # e.g. one file per three hours of a day
+
+
+def write_archive(directory: Path, event_count: int) -> None:
+    rules, _ = load_rule_file()
+    fields = sorted({condition['field'] for rule in rules for condition in rule['conditions']} |
+                    {'source_ip', 'dest_ip', 'dest_port', 'bytes_sent'})
+    records = SyntheticFlowGenerator().records(event_count)
+    per_file = -(-event_count // FILES)
+    for index in range(FILES):
+        chunk = [record for _, record in zip(range(per_file), records)]
+        with open(directory / f"flows-{index:02d}.jsonl", 'w', encoding='utf-8') as handle:
+            handle.writelines(json.dumps(record) + '\n' for record in chunk)
+        write_columnar(directory / f"flows-{index:02d}.npz", chunk, fields)
+
+
+def run(event_count: int, rule_id: str, max_workers: int) -> None:
+    rules, _ = load_rule_file()
+    definition = next(rule for rule in rules if rule['id'] == rule_id)
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        started = time.perf_counter()
+        write_archive(directory, event_count)
+        print(f"wrote {event_count:,} events in {FILES} files ({time.perf_counter() - started:.1f}s)")
+
+        for label, pattern in (('jsonl', '*.jsonl'), ('columnar', '*.npz')):
+            paths = sorted(directory.glob(pattern))
+            workers = 1
+            while workers <= max_workers:
+                result = backtest_rule(definition, paths, max_workers=workers, shard_bytes=16 * 2**20)
+                print(f"{f'{label}/{workers}':>12} {result.events_per_second:>14,.0f} events/s "
+                      f"{result.elapsed_seconds:>8.2f}s {result.events_matched:>8} matched "
+                      f"{result.alerts:>6} alerts")
+                workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule backtest benchmark")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--rule", default="rule-data-exfiltration")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    run(args.events, args.rule, args.max_workers)
@@ -0,0 +1,58 @@
+# PyGuardian v3 - Batch Rule Evaluator Benchmark
+# Per-event compiled rule evaluation vs. columnar batch evaluation at several batch sizes,
+# with and without the cost of extracting columns from event dicts
+#
+# Usage: python -m benchmarks.bench_batch_evaluator [--events 200000]
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+from detection.batch_evaluator import BatchRuleEvaluator
+from detection.rule_compiler import compile_rules, load_rule_file
+
+BATCH_SIZES = (1_000, 10_000, 100_000)
+
+
+def run(event_count: int) -> None:
+    rules, engine_config = load_rule_file()
+    events = list(SyntheticFlowGenerator().records(event_count))
+    compiled = compile_rules(rules, sample_events=events[:1000])
+    evaluator = BatchRuleEvaluator(compiled)
+
+    started = time.perf_counter()
+    expected = {rule.rule_id: np.fromiter(map(rule.matches, events), dtype=bool, count=len(events))
+                for rule in compiled}
+    per_event_seconds = time.perf_counter() - started
+    print(f"{len(compiled)} rules, {event_count} events "
+          f"(configured batch_size {engine_config.get('processing', {}).get('batch_size')})")
+    print(f"{'per-event':>14} {event_count / per_event_seconds:>14,.0f} events/s")
+
+    print(f"{'batch':>14} {'from dicts':>14} {'':>8} {'columns only':>14}")
+    for batch_size in BATCH_SIZES:
+        slices = [events[offset:offset + batch_size] for offset in range(0, len(events), batch_size)]
+
+        started = time.perf_counter()
+        batches = [evaluator.columns(batch) for batch in slices]
+        convert_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = [evaluator.evaluate_columns(batch) for batch in batches]
+        evaluate_seconds = time.perf_counter() - started
+
+        for rule_id, mask in expected.items():
+            if not np.array_equal(np.concatenate([result[rule_id] for result in results]), mask):
+                raise AssertionError(f"batch evaluation disagrees with per-event matching for {rule_id}")
+
+        end_to_end = convert_seconds + evaluate_seconds
+        print(f"{batch_size:>14,} {event_count / end_to_end:>14,.0f} {per_event_seconds / end_to_end:>7.1f}x "
+              f"{event_count / evaluate_seconds:>14,.0f} {per_event_seconds / evaluate_seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch rule evaluator benchmark")
+    parser.add_argument("--events", type=int, default=200_000)
+    run(parser.parse_args().events)
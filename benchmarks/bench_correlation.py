@@ -0,0 +1,124 @@
+# PyGuardian v3 - Correlation Engine Benchmark Suite
+# Times scoring, correlation and MITRE mapping across input sizes and saves JSON results
+#
+# Usage:
+#   python -m benchmarks.bench_correlation --output results.json
+#   python -m benchmarks.bench_correlation --output new.json --compare results.json
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from algorithms.correlation_algorithm import CorrelationEngine
+from benchmarks.synthetic_flows import FlowProfile, SyntheticFlowGenerator
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def time_call(function: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Run function `repeat` times and summarize wall-clock durations"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return {
+        'median_seconds': statistics.median(durations),
+        'min_seconds': min(durations),
+        'max_seconds': max(durations),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes: List[int], profile: FlowProfile, seed: int, repeat: int) -> Dict[str, Any]:
+    engine = CorrelationEngine()
+    generator = SyntheticFlowGenerator(profile, seed=seed)
+    alerts = generator.alerts()
+
+    cases: Dict[str, Callable[[List[Any]], Callable[[], Any]]] = {
+        'compute_risk_score': lambda events: lambda: engine.compute_risk_score(events, alerts),
+        'correlate_events': lambda events: lambda: engine.correlate_events(events),
+        'group_correlation_score': lambda events: lambda: engine._calculate_group_correlation_score(events),
+        'map_to_mitre_attack': lambda events: lambda: engine.map_to_mitre_attack(events, alerts),
+    }
+
+    results = []
+    for size in sizes:
+        events = generator.events(size)
+        for name, make_case in cases.items():
+            timing = time_call(make_case(events), repeat)
+            timing['events_per_second'] = size / timing['median_seconds'] if timing['median_seconds'] else 0.0
+            results.append({'benchmark': name, 'events': size, **timing})
+            print(f"{name:>26} {size:>9} {timing['median_seconds']:>10.4f}s "
+                  f"{timing['events_per_second']:>14,.0f} ev/s")
+
+    return {
+        'metadata': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+            'profile': vars(profile),
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the median duration ratio of each benchmark against a baseline run"""
+    baseline_index = {
+        (result['benchmark'], result['events']): result for result in baseline['results']
+    }
+    print(f"\n{'benchmark':>26} {'events':>9} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for result in current['results']:
+        previous = baseline_index.get((result['benchmark'], result['events']))
+        if previous is None:
+            continue
+        ratio = result['median_seconds'] / previous['median_seconds']
+        print(f"{result['benchmark']:>26} {result['events']:>9} {previous['median_seconds']:>9.4f}s "
+              f"{result['median_seconds']:>9.4f}s {ratio:>6.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Correlation engine benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--hosts", type=int, default=FlowProfile.hosts)
+    parser.add_argument("--burstiness", type=float, default=FlowProfile.burstiness)
+    parser.add_argument("--enrichment-coverage", type=float, default=FlowProfile.enrichment_coverage)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    args = parser.parse_args()
+
+    profile = FlowProfile(hosts=args.hosts, burstiness=args.burstiness,
+                          enrichment_coverage=args.enrichment_coverage)
+    results = run_suite(args.sizes, profile, args.seed, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            compare(results, json.load(handle))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# PyGuardian v3 - Event Memory Benchmark
+# Measures bytes per event for the dataclass Event model and CompactEvent
+#
+# Usage: python -m benchmarks.bench_event_memory [--events 200000]
+
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from algorithms.compact_event import CompactEventFactory
+from benchmarks.synthetic_flows import FlowProfile, SyntheticFlowGenerator, event_from_record
+
+
+def measure(records: List[Dict[str, Any]], build: Callable[[Dict[str, Any]], Any]) -> float:
+    """Bytes allocated per event while holding all built events"""
+    gc.collect()
+    tracemalloc.start()
+    events = [build(record) for record in records]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del events
+    return allocated / len(records)
+
+
+def run(event_count: int) -> None:
+    generator = SyntheticFlowGenerator(FlowProfile(hosts=2000))
+    records = list(generator.records(event_count))
+
+    dataclass_bytes = measure(records, event_from_record)
+    compact_bytes = measure(records, CompactEventFactory().from_record)
+
+    print(f"{'model':>12} {'bytes/event':>12}")
+    print(f"{'Event':>12} {dataclass_bytes:>12.0f}")
+    print(f"{'CompactEvent':>12} {compact_bytes:>12.0f}")
+    print(f"{'reduction':>12} {dataclass_bytes / compact_bytes:>11.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event memory benchmark")
+    parser.add_argument("--events", type=int, default=200_000)
+    run(parser.parse_args().events)
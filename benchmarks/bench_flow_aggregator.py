@@ -0,0 +1,127 @@
+# PyGuardian v3 - Flow Pre-Aggregation Benchmark
+# Throughput and reduction ratio of FlowPreAggregator vs. a per-flow dict merge, with exactness checks
+#
+# Usage: python -m benchmarks.bench_flow_aggregator [--flows 1000000] [--tuples 20000] [--batch 10000]
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from pipeline.flow_aggregator import SUMMED_FIELDS, FlowPreAggregator
+from pipeline.flow_batch import FlowBatch, set_ipv4
+
+SPAN_SECONDS = 600.0
+SAMPLING_RATES = (1, 100, 1000)
+
+
+def generate_batches(flow_count: int, tuple_count: int, batch_size: int, seed: int = 42) -> List[FlowBatch]:
+    """Flows over `tuple_count` 5-tuples with Zipf-like popularity, in time order"""
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, 256, size=(tuple_count, 4), dtype=np.uint8)
+    sources[:, 0] = 10
+    destinations = rng.integers(0, 256, size=(tuple_count, 4), dtype=np.uint8)
+    source_ports = rng.integers(1024, 65536, size=tuple_count).astype(np.uint16)
+    dest_ports = rng.choice(np.array([22, 53, 80, 443, 3389], dtype=np.uint16), size=tuple_count)
+    protocols = rng.choice(np.array([6, 17], dtype=np.uint8), size=tuple_count)
+    popularity = 1.0 / np.arange(1, tuple_count + 1)
+    popularity /= popularity.sum()
+
+    batches = []
+    started_at = 1_705_312_200.0
+    for start in range(0, flow_count, batch_size):
+        size = min(batch_size, flow_count - start)
+        picks = rng.choice(tuple_count, size=size, p=popularity)
+        batch = FlowBatch(size)
+        arrays = batch.arrays
+        set_ipv4(arrays['source_ip'], sources[picks])
+        set_ipv4(arrays['dest_ip'], destinations[picks])
+        arrays['source_port'][:] = source_ports[picks]
+        arrays['dest_port'][:] = dest_ports[picks]
+        arrays['protocol'][:] = protocols[picks]
+        arrays['bytes_sent'][:] = rng.integers(40, 1_500_000, size=size)
+        arrays['bytes_received'][:] = rng.integers(40, 1_500_000, size=size)
+        arrays['packets_sent'][:] = rng.integers(1, 1000, size=size)
+        arrays['packets_received'][:] = rng.integers(1, 1000, size=size)
+        arrays['tcp_flags'][:] = rng.integers(0, 64, size=size)
+        arrays['duration'][:] = rng.integers(0, 30, size=size)
+        arrays['timestamp'][:] = started_at + SPAN_SECONDS * (start + np.arange(size)) / flow_count
+        arrays['raw_data.sampling_rate'][:] = rng.choice(np.array(SAMPLING_RATES, dtype=np.uint32), size=size)
+        batch.size = size
+        batches.append(batch)
+    return batches
+
+
+def naive_aggregate(batches: List[FlowBatch], interval: float) -> Dict[Tuple, List[int]]:
+    """Per-flow baseline: a dict of [bytes, packets, flags, flows] per 5-tuple and interval"""
+    table: Dict[Tuple, List[int]] = {}
+    for batch in batches:
+        columns = batch.columns()
+        rows = zip(map(bytes, columns['source_ip']), map(bytes, columns['dest_ip']),
+                   columns['source_port'].tolist(), columns['dest_port'].tolist(), columns['protocol'].tolist(),
+                   columns['timestamp'].tolist(), columns['bytes_sent'].tolist(), columns['packets_sent'].tolist(),
+                   columns['tcp_flags'].tolist(), columns['raw_data.sampling_rate'].tolist())
+        for source, dest, source_port, dest_port, protocol, timestamp, sent, packets, flags, rate in rows:
+            key = (source, dest, source_port, dest_port, protocol, int(timestamp // interval))
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = [0, 0, 0, 0]
+            entry[0] += sent * rate
+            entry[1] += packets * rate
+            entry[2] |= flags
+            entry[3] += 1
+    return table
+
+
+def _scaled_totals(batches: List[FlowBatch]) -> Dict[str, int]:
+    totals = {}
+    for name in SUMMED_FIELDS:
+        totals[name] = sum(int((batch.columns()[name].astype(np.uint64)
+                                * batch.columns()['raw_data.sampling_rate'].astype(np.uint64)).sum())
+                           for batch in batches)
+    return totals
+
+
+def run(flow_count: int, tuple_count: int, batch_size: int) -> None:
+    batches = generate_batches(flow_count, tuple_count, batch_size)
+    expected = _scaled_totals(batches)
+
+    started = time.perf_counter()
+    naive = naive_aggregate(batches, 60.0)
+    naive_seconds = time.perf_counter() - started
+    print(f"{flow_count:,} flows over {tuple_count:,} 5-tuples; per-flow dict merge: "
+          f"{flow_count / naive_seconds:,.0f} flows/s, {len(naive):,} merged flows")
+
+    print(f"{'interval':>9} {'table':>8} {'flows/s':>12} {'speedup':>8} {'emitted':>9} {'reduction':>10} "
+          f"{'size flushes':>13} {'exact':>6}")
+    for interval, max_flows in ((10.0, 100_000), (60.0, 10_000), (60.0, 100_000)):
+        aggregator = FlowPreAggregator(interval=interval, max_flows=max_flows)
+        emitted = []
+        started = time.perf_counter()
+        for batch in batches:
+            emitted.extend(aggregator.add(batch))
+        final = aggregator.flush()
+        seconds = time.perf_counter() - started
+        if final is not None:
+            emitted.append(final)
+
+        totals = {name: sum(int(output.flows.columns()[name].sum()) for output in emitted) for name in SUMMED_FIELDS}
+        counted = sum(int(output.flow_counts.sum()) for output in emitted)
+        exact = totals == expected and counted == flow_count
+        if interval == 60.0 and max_flows >= len(naive):
+            exact = exact and aggregator.stats.flows_out == len(naive)
+        print(f"{interval:>8g}s {max_flows:>8,} {flow_count / seconds:>12,.0f} {naive_seconds / seconds:>7.1f}x "
+              f"{aggregator.stats.flows_out:>9,} {aggregator.stats.reduction_ratio:>9.1f}x "
+              f"{aggregator.stats.flushes_on_size:>13,} {'yes' if exact else 'NO':>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flow pre-aggregation benchmark")
+    parser.add_argument("--flows", type=int, default=1_000_000)
+    parser.add_argument("--tuples", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    args = parser.parse_args()
+    run(args.flows, args.tuples, args.batch)
@@ -0,0 +1,124 @@
+# PyGuardian v3 - JSON-Lines Ingest Benchmark
+# Records per second of JsonLinesIngest vs. per-record parsing, typing and validation
+#
+# Usage: python -m benchmarks.bench_jsonl_ingest [--records 200000] [--invalid 0.01]
+
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import json
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+from pipeline.jsonl_ingest import JsonLinesIngest, load_schema
+
+_INTEGER_FIELDS = ('source_port', 'dest_port', 'protocol', 'bytes_sent', 'bytes_received', 'packets_sent',
+                   'packets_received', 'duration', 'tcp_flags', 'tos')
+
+
+def write_records(path: Path, count: int, invalid_share: float, enriched: bool, seed: int = 42) -> int:
+    """JSON lines of synthetic flows with a share of broken records; returns how many are broken"""
+    rng = random.Random(seed)
+    broken = 0
+    with open(path, 'w', encoding='utf-8') as handle:
+        for record in SyntheticFlowGenerator(seed=seed).records(count):
+            if not enriched:
+                del record['enrichment']
+            line = json.dumps(record)
+            if rng.random() < invalid_share:
+                broken += 1
+                damage = rng.randrange(4)
+                if damage == 0:
+                    line = line[:len(line) // 2]
+                elif damage == 1:
+                    line = json.dumps({**record, 'dest_port': str(record['dest_port'])})
+                elif damage == 2:
+                    line = json.dumps({**record, 'source_ip': '10.0.0.300'})
+                else:
+                    line = json.dumps({**record, 'dest_port': 70000})
+            handle.write(line)
+            handle.write('\n')
+    return broken
+
+
+def generic_check(value: Any, descriptor: Any) -> bool:
+    """Interpret a schema descriptor against one value, as a generic model validates each field"""
+    if isinstance(descriptor, dict):
+        return isinstance(value, dict) and all(value.get(key) is None or generic_check(value[key], item)
+                                               for key, item in descriptor.items())
+    if isinstance(descriptor, list):
+        return isinstance(value, list) and all(generic_check(item, descriptor[0]) for item in value)
+    kind = descriptor.split('(', 1)[0].strip()
+    if kind == 'integer':
+        return type(value) is int
+    if kind == 'number':
+        return type(value) in (int, float)
+    if kind == 'string':
+        return type(value) is str
+    return isinstance(value, dict)
+
+
+def per_record(line: str, schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Baseline: decode, validate, type and check one record at a time, as a generic model would"""
+    try:
+        record = json.loads(line)
+        for key, descriptor in schema.items():
+            value = record.get(key)
+            if value is None:
+                if isinstance(descriptor, str) and not descriptor.startswith('object'):
+                    return None
+            elif not generic_check(value, descriptor):
+                return None
+        typed = dict(record)
+        typed['timestamp'] = datetime.fromisoformat(record['timestamp'].replace('Z', '+00:00'))
+        typed['source_ip'] = ipaddress.ip_address(record['source_ip'])
+        typed['dest_ip'] = ipaddress.ip_address(record['dest_ip'])
+        for name in _INTEGER_FIELDS:
+            if type(record[name]) is not int:
+                return None
+        if not 0 <= record['source_port'] <= 65535 or not 0 <= record['dest_port'] <= 65535:
+            return None
+        return typed
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def run(record_count: int, invalid_share: float) -> None:
+    print(f"{'schema':>15} {'records':>9} {'invalid':>8} {'per-record rec/s':>17} "
+          f"{'ingest rec/s':>13} {'MB/s':>6} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for schema in ('raw_flow_event', 'enriched_event'):
+            path = Path(directory) / f"{schema}.jsonl"
+            broken = write_records(path, record_count, invalid_share, enriched=schema == 'enriched_event')
+            descriptors = load_schema(schema)
+
+            started = time.perf_counter()
+            with open(path, 'r', encoding='utf-8') as handle:
+                baseline_valid = sum(per_record(line, descriptors) is not None for line in handle)
+            baseline_seconds = time.perf_counter() - started
+
+            ingest = JsonLinesIngest(schema, dead_letter=Path(directory) / f"{schema}.dead.jsonl")
+            started = time.perf_counter()
+            valid = sum(len(batch) for batch in ingest.read(path))
+            seconds = time.perf_counter() - started
+
+            if ingest.stats.invalid != broken or valid != baseline_valid:
+                raise AssertionError(f"{schema}: {ingest.stats.invalid} rejected, {broken} broken; "
+                                     f"{valid} valid vs. {baseline_valid} per record")
+            print(f"{schema:>15} {record_count:>9,} {broken:>8,} {record_count / baseline_seconds:>17,.0f} "
+                  f"{record_count / seconds:>13,.0f} {ingest.stats.bytes / seconds / 2**20:>6.1f} "
+                  f"{baseline_seconds / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON-lines ingest benchmark")
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--invalid", type=float, default=0.01, help="share of broken records")
+    args = parser.parse_args()
+    run(args.records, args.invalid)
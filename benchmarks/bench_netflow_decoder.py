@@ -0,0 +1,164 @@
+# PyGuardian v3 - NetFlow Decoder Benchmark
+# Flows per second of NetFlowDecoder vs. a per-record struct-to-dict decoder on v9 and IPFIX datagrams
+#
+# Usage: python -m benchmarks.bench_netflow_decoder [--flows 500000] [--record FILE] [--datagrams FILE]
+#
+# --record writes the generated datagrams to FILE; --datagrams replays datagrams
+# recorded in that format (4-byte big-endian length, then the UDP payload).
+
+from __future__ import annotations
+
+import argparse
+import random
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pipeline.netflow_decoder import IPFIX, NETFLOW_V9, NetFlowDecoder
+
+RECORDS_PER_DATAGRAM = 30
+TEMPLATE_EVERY = 20  # datagrams between template refreshes, as exporters resend them periodically
+
+# Typical Cisco v9 template: src, dst, in bytes/pkts, ports, protocol, flags, tos, interfaces, switched times
+V9_TEMPLATE = [(8, 4), (12, 4), (1, 4), (2, 4), (7, 2), (11, 2), (4, 1), (6, 1), (5, 1),
+               (10, 2), (14, 2), (22, 4), (21, 4)]
+# IPFIX template with 64-bit counters, absolute millisecond times and an enterprise field
+IPFIX_TEMPLATE = [(8, 4), (12, 4), (1, 8), (2, 8), (7, 2), (11, 2), (4, 1), (6, 1), (5, 1),
+                  (10, 4), (14, 4), (152, 8), (153, 8)]
+
+_LENGTH_PREFIX = struct.Struct('!I')
+
+
+def _record_format(template: List[Tuple[int, int]]) -> struct.Struct:
+    codes = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+    return struct.Struct('!' + ''.join('4s' if element in (8, 12) else codes[length]
+                                       for element, length in template))
+
+
+def _template_set(set_id: int, template_id: int, template: List[Tuple[int, int]]) -> bytes:
+    fields = b''.join(struct.pack('!HH', element, length) for element, length in template)
+    body = struct.pack('!HH', template_id, len(template)) + fields
+    return struct.pack('!HH', set_id, 4 + len(body)) + body
+
+
+def _data_set(template_id: int, records: List[bytes]) -> bytes:
+    body = b''.join(records)
+    padding = -len(body) % 4
+    return struct.pack('!HH', template_id, 4 + len(body) + padding) + body + b'\0' * padding
+
+
+def generate_datagrams(version: int, flow_count: int, seed: int = 42) -> Iterator[bytes]:
+    """Export datagrams of `flow_count` flows from a few exporters, templates first"""
+    rng = random.Random(seed)
+    template = V9_TEMPLATE if version == NETFLOW_V9 else IPFIX_TEMPLATE
+    record = _record_format(template)
+    export_time = 1_705_312_245
+    uptime = 86_400_000
+    sequence = 0
+
+    while flow_count > 0:
+        count = min(RECORDS_PER_DATAGRAM, flow_count)
+        records = []
+        for _ in range(count):
+            first = uptime - rng.randrange(60_000)
+            values = [bytes((10, 0, rng.randrange(4), rng.randrange(1, 255))),
+                      bytes((203, 0, 113, rng.randrange(1, 255))),
+                      rng.randrange(64, 1_500_000), rng.randrange(1, 1000),
+                      rng.randrange(1024, 65536), rng.choice((22, 53, 80, 443, 3389)),
+                      rng.choice((6, 17)), rng.randrange(64), 0, rng.randrange(1, 9), rng.randrange(1, 9)]
+            if version == NETFLOW_V9:
+                values += [first, uptime - rng.randrange(first - (uptime - 60_000) + 1)]
+            else:
+                end = export_time * 1000 - rng.randrange(30_000)
+                values += [end - rng.randrange(60_000), end]
+            records.append(record.pack(*values))
+
+        sets = _data_set(256, records)
+        if sequence % TEMPLATE_EVERY == 0:
+            sets = _template_set(0 if version == NETFLOW_V9 else 2, 256, template) + sets
+        if version == NETFLOW_V9:
+            header = struct.pack('!HHIIII', NETFLOW_V9, count, uptime, export_time, sequence, 1)
+        else:
+            header = struct.pack('!HHIII', IPFIX, 16 + len(sets), export_time, sequence, 1)
+        yield header + sets
+
+        sequence += 1
+        flow_count -= count
+        uptime += 100
+        export_time += sequence % 10 == 0
+
+
+def naive_decode(datagram: bytes, templates: Dict[int, Tuple[struct.Struct, List[int]]]) -> List[Dict[str, Any]]:
+    """Per-record baseline: struct.unpack each record into a dict"""
+    version = int.from_bytes(datagram[:2], 'big')
+    offset = 20 if version == NETFLOW_V9 else 16
+    flows = []
+    while offset + 4 <= len(datagram):
+        set_id, length = struct.unpack_from('!HH', datagram, offset)
+        if set_id in (0, 2):
+            template_id, count = struct.unpack_from('!HH', datagram, offset + 4)
+            fields = [struct.unpack_from('!HH', datagram, offset + 8 + 4 * i) for i in range(count)]
+            templates[template_id] = (_record_format(fields), [element for element, _ in fields])
+        elif set_id >= 256 and set_id in templates:
+            record, elements = templates[set_id]
+            position = offset + 4
+            while position + record.size <= offset + length:
+                flows.append(dict(zip(elements, record.unpack_from(datagram, position))))
+                position += record.size
+        offset += length
+    return flows
+
+
+def _load(path: Path) -> List[bytes]:
+    data = path.read_bytes()
+    datagrams, offset = [], 0
+    while offset < len(data):
+        length, = _LENGTH_PREFIX.unpack_from(data, offset)
+        datagrams.append(data[offset + 4:offset + 4 + length])
+        offset += 4 + length
+    return datagrams
+
+
+def _measure(name: str, datagrams: List[bytes]) -> None:
+    decoder = NetFlowDecoder()
+    started = time.perf_counter()
+    for datagram in datagrams:
+        decoder.decode(datagram, exporter='192.0.2.1')
+    batches = decoder.drain()
+    seconds = time.perf_counter() - started
+    flows = sum(len(batch) for batch in batches)
+
+    templates: Dict[int, Tuple[struct.Struct, List[int]]] = {}
+    started = time.perf_counter()
+    naive = sum(len(naive_decode(datagram, templates)) for datagram in datagrams)
+    naive_seconds = time.perf_counter() - started
+    if naive != flows:
+        raise AssertionError(f"{name}: decoder produced {flows} flows, baseline {naive}")
+
+    print(f"{name:>10} {len(datagrams):>10,} {flows:>10,} {naive / naive_seconds:>14,.0f} "
+          f"{flows / seconds:>14,.0f} {naive_seconds / seconds:>7.1f}x")
+
+
+def run(flow_count: int, record: Path = None, recorded: Path = None) -> None:
+    print(f"{'source':>10} {'datagrams':>10} {'flows':>10} {'dicts fl/s':>14} {'columns fl/s':>14} {'speedup':>8}")
+    if recorded is not None:
+        _measure(recorded.name, _load(recorded))
+        return
+
+    captured = []
+    for version, name in ((NETFLOW_V9, 'v9'), (IPFIX, 'ipfix')):
+        datagrams = list(generate_datagrams(version, flow_count))
+        captured.extend(datagrams)
+        _measure(name, datagrams)
+    if record is not None:
+        record.write_bytes(b''.join(_LENGTH_PREFIX.pack(len(datagram)) + datagram for datagram in captured))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NetFlow v9 / IPFIX decoder benchmark")
+    parser.add_argument("--flows", type=int, default=500_000)
+    parser.add_argument("--record", type=Path, help="write the generated datagrams to this file")
+    parser.add_argument("--datagrams", type=Path, help="benchmark datagrams recorded in this file")
+    args = parser.parse_args()
+    run(args.flows, args.record, args.datagrams)
@@ -0,0 +1,68 @@
+# PyGuardian v3 - Partitioned Correlation Benchmark
+# Compares correlate_events with key-partitioned correlation across worker counts
+#
+# Usage: python -m benchmarks.bench_partitioned_correlation [--events 200000] [--hosts 500]
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import List
+
+from algorithms.correlation_algorithm import CorrelationEngine, CorrelationGroup, Event
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+
+
+def generate_interleaved_sessions(count: int, hosts: int, seed: int = 42) -> List[Event]:
+    """Interleave per-host sessions that repeatedly hit the same destination"""
+    rng = random.Random(seed)
+    events = SyntheticFlowGenerator(seed=seed).events(count)
+    sessions = [
+        (f"10.1.{host // 250}.{host % 250 + 1}", f"198.51.100.{rng.randint(1, 254)}",
+         rng.choice([22, 53, 443, 3389]))
+        for host in range(hosts)
+    ]
+    start = datetime(2024, 1, 15, 10, 0, 0)
+    interleaved = []
+    for i, event in enumerate(events):
+        source_ip, dest_ip, dest_port = rng.choice(sessions)
+        interleaved.append(replace(
+            event, source_ip=source_ip, dest_ip=dest_ip, dest_port=dest_port, protocol=6,
+            timestamp=start + timedelta(milliseconds=i * 50)
+        ))
+    return interleaved
+
+
+def describe(groups: List[CorrelationGroup]) -> str:
+    grouped = sum(len(group.events) for group in groups)
+    return f"{len(groups):>7} groups {grouped:>8} events grouped"
+
+
+def run(event_count: int, hosts: int, max_workers: int) -> None:
+    engine = CorrelationEngine()
+    events = generate_interleaved_sessions(event_count, hosts)
+
+    started = time.perf_counter()
+    groups = engine.correlate_events(events)
+    print(f"{'serial':>14} {time.perf_counter() - started:>8.3f}s  {describe(groups)}")
+
+    workers = 1
+    while workers <= max_workers:
+        started = time.perf_counter()
+        groups = engine.correlate_events_partitioned(
+            events, partition_key=('source_ip', 'dest_ip'), max_workers=workers)
+        print(f"{f'partitioned/{workers}':>14} {time.perf_counter() - started:>8.3f}s  {describe(groups)}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partitioned correlation benchmark")
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--hosts", type=int, default=500)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    run(args.events, args.hosts, args.max_workers)
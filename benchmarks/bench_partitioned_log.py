@@ -0,0 +1,119 @@
+# PyGuardian v3 - Partitioned Log Benchmark
+# Produce / consume throughput, fsync batching and end-to-end latency of the embedded PartitionedLog
+#
+# Usage: python -m benchmarks.bench_partitioned_log [--events 200000] [--partitions 4] [--batch 500]
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import tempfile
+import threading
+import time
+from typing import List, Tuple
+
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+from pipeline.partitioned_log import PartitionedLog
+
+TOPIC = 'raw-flows'
+FSYNC_EACH_EVENTS = 2_000  # one fsync per event is slow; measure it on a small sample
+
+
+def make_events(count: int) -> Tuple[List[bytes], List[bytes]]:
+    """JSON-encoded raw flows and their source-IP keys"""
+    values, keys = [], []
+    for record in SyntheticFlowGenerator(seed=42).records(count):
+        del record['enrichment']
+        values.append(json.dumps(record).encode())
+        keys.append(record['source_ip'].encode())
+    return values, keys
+
+
+def _produce(values: List[bytes], keys: List[bytes], partitions: int, batch: int, flush_interval: float) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        with PartitionedLog(directory, partitions=partitions, flush_interval=flush_interval) as log:
+            started = time.perf_counter()
+            for start in range(0, len(values), batch):
+                log.produce_batch(TOPIC, values[start:start + batch], keys[start:start + batch])
+            log.flush()
+            seconds = time.perf_counter() - started
+            stats = log.stats()
+        mode = 'fsync each' if flush_interval == 0 else f"group {flush_interval * 1e3:g}ms"
+        print(f"{mode:>14} {batch:>7,} {len(values):>9,} {len(values) / seconds:>12,.0f} "
+              f"{stats['bytes'] / seconds / 2**20:>7.1f} {stats['records_per_fsync']:>12,.0f}")
+
+
+def _consume(values: List[bytes], keys: List[bytes], partitions: int, batch: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        with PartitionedLog(directory, partitions=partitions) as log:
+            for start in range(0, len(values), batch):
+                log.produce_batch(TOPIC, values[start:start + batch], keys[start:start + batch])
+            log.flush()
+            consumer = log.consumer('bench', [TOPIC], auto_commit_interval=None)
+            started = time.perf_counter()
+            consumed = 0
+            while consumed < len(values):
+                consumed += len(consumer.poll(max_records=batch))
+            seconds = time.perf_counter() - started
+            consumer.commit()
+        print(f"consume {consumed:,} events: {consumed / seconds:,.0f} events/s")
+
+
+def _latency(values: List[bytes], rate: int, batch: int) -> None:
+    """Produce `rate` events/s in batches from one thread while another consumes with blocking polls"""
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory() as directory:
+        with PartitionedLog(directory, partitions=1) as log:
+            consumer = log.consumer('bench', [TOPIC], auto_commit_interval=None)
+            sent = {}
+            batches = len(values) // batch
+
+            def consume() -> None:
+                received = 0
+                while received < batches * batch:
+                    for record in consumer.poll(max_records=batch * 4, timeout=1.0):
+                        received += 1
+                        if record.offset in sent:
+                            latencies.append(time.perf_counter() - sent[record.offset])
+
+            reader = threading.Thread(target=consume)
+            reader.start()
+            interval = batch / rate
+            next_send = time.perf_counter()
+            for index in range(batches):
+                now = time.perf_counter()
+                if now < next_send:
+                    time.sleep(next_send - now)
+                sent[index * batch] = time.perf_counter()
+                log.produce_batch(TOPIC, values[index * batch:(index + 1) * batch], partition=0)
+                next_send += interval
+            reader.join()
+
+    latencies.sort()
+    if latencies:
+        p50 = latencies[len(latencies) // 2] * 1e3
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3
+        print(f"end-to-end at {rate:,} events/s: p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+
+
+def run(event_count: int, partitions: int, batch: int) -> None:
+    values, keys = make_events(event_count)
+    print(f"{len(values):,} events, {sum(map(len, values)) / len(values):.0f} bytes each, {partitions} partitions")
+    print(f"{'commit':>14} {'batch':>7} {'events':>9} {'events/s':>12} {'MB/s':>7} {'events/fsync':>12}")
+    small = min(FSYNC_EACH_EVENTS, event_count)
+    _produce(values[:small], keys[:small], partitions, 1, flush_interval=0)
+    _produce(values[:small], keys[:small], partitions, 1, flush_interval=0.005)
+    _produce(values, keys, partitions, batch, flush_interval=0.005)
+    _consume(values, keys, partitions, batch)
+    _latency(values[:min(event_count, 50_000)], rate=20_000, batch=100)
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedded partitioned log benchmark")
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--partitions", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=500, help="events per produce_batch / poll")
+    args = parser.parse_args()
+    run(args.events, args.partitions, args.batch)
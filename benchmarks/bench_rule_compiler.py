@@ -0,0 +1,85 @@
+# PyGuardian v3 - Rule Compiler Benchmark
+# Compares compiled rule predicates with a naive per-event condition interpreter
+#
+# Usage: python -m benchmarks.bench_rule_compiler [--events 200000]
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+from detection.rule_compiler import compile_rules, load_rule_file
+
+
+def naive_field(event: Dict[str, Any], path: str) -> Any:
+    value = event
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def naive_condition(event: Dict[str, Any], condition: Dict[str, Any]) -> bool:
+    """Interpret one condition by walking the event dict and dispatching on operator"""
+    actual = naive_field(event, condition['field'])
+    operator = condition['operator']
+    expected = condition['value']
+    if operator == 'equals':
+        return actual == expected
+    if operator == 'not_equals':
+        return actual != expected
+    if operator == 'in':
+        return actual in expected
+    if operator == 'not_in':
+        return actual not in expected
+    if operator == 'contains_any':
+        return bool(actual) and any(value in actual for value in expected)
+    if actual is None:
+        return False
+    if operator == 'less_than':
+        return actual < expected
+    if operator == 'less_than_or_equal':
+        return actual <= expected
+    if operator == 'greater_than':
+        return actual > expected
+    if operator == 'greater_than_or_equal':
+        return actual >= expected
+    raise ValueError(operator)
+
+
+def naive_matches(event: Dict[str, Any], rules: List[Dict[str, Any]]) -> List[str]:
+    return [rule['id'] for rule in rules
+            if all(naive_condition(event, condition) for condition in rule['conditions'])]
+
+
+def run(event_count: int) -> None:
+    rules, _ = load_rule_file()
+    rules = [rule for rule in rules if rule.get('enabled', True)]
+    events = list(SyntheticFlowGenerator().records(event_count))
+    compiled = compile_rules(rules, sample_events=events[:1000])
+
+    started = time.perf_counter()
+    naive_result = [naive_matches(event, rules) for event in events]
+    naive_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compiled_result = [[rule.rule_id for rule in compiled if rule.matches(event)] for event in events]
+    compiled_seconds = time.perf_counter() - started
+
+    if naive_result != compiled_result:
+        raise AssertionError("compiled rules disagree with the naive interpreter")
+
+    matched = sum(1 for result in compiled_result if result)
+    print(f"{len(rules)} rules, {event_count} events, {matched} events matched")
+    print(f"{'naive':>10} {event_count / naive_seconds:>14,.0f} events/s")
+    print(f"{'compiled':>10} {event_count / compiled_seconds:>14,.0f} events/s")
+    print(f"{'speedup':>10} {naive_seconds / compiled_seconds:>13.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule compiler benchmark")
+    parser.add_argument("--events", type=int, default=200_000)
+    run(parser.parse_args().events)
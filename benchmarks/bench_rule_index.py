@@ -0,0 +1,70 @@
+# PyGuardian v3 - Rule Index Benchmark
+# Per-event cost of scanning every rule vs. dispatching through RuleIndex as the rule count grows
+#
+# Usage: python -m benchmarks.bench_rule_index [--events 50000]
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+from detection.rule_compiler import compile_rules, load_rule_file
+from detection.rule_index import RuleIndex
+
+RULE_COUNTS = (5, 50, 200, 800)
+
+_PORTS = [21, 22, 23, 25, 53, 80, 123, 135, 139, 443, 445, 1433, 3306, 3389, 5900, 8080, 8443]
+
+
+def generate_rules(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Port and protocol pinned rules, with a few that only test volumes or reputation"""
+    rng = random.Random(seed)
+    rules, _ = load_rule_file()
+    rules = [rule for rule in rules if rule.get('enabled', True)][:count]
+
+    while len(rules) < count:
+        conditions = [{'field': 'bytes_sent', 'operator': 'greater_than',
+                       'value': rng.choice([1_000, 100_000, 1_000_000])}]
+        kind = rng.random()
+        if kind < 0.7:
+            conditions.append({'field': 'dest_port', 'operator': 'equals',
+                               'value': rng.choice(_PORTS + [rng.randint(1024, 65535)])})
+        elif kind < 0.95:
+            conditions.append({'field': 'protocol', 'operator': 'in', 'value': [rng.choice([1, 17])]})
+        else:
+            conditions.append({'field': 'enrichment.reputation.categories', 'operator': 'contains_any',
+                               'value': ['malware', 'botnet']})
+        rules.append({'id': f'synthetic_{len(rules):04d}', 'name': 'synthetic', 'conditions': conditions})
+    return rules
+
+
+def run(event_count: int) -> None:
+    events = list(SyntheticFlowGenerator().records(event_count))
+
+    print(f"{'rules':>6} {'scan ev/s':>14} {'index ev/s':>14} {'speedup':>8} {'candidates':>11}")
+    for rule_count in RULE_COUNTS:
+        compiled = compile_rules(generate_rules(rule_count), sample_events=events[:1000])
+        index = RuleIndex(compiled)
+
+        started = time.perf_counter()
+        scanned = [{rule.rule_id for rule in compiled if rule.matches(event)} for event in events]
+        scan_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        indexed = [{rule.rule_id for rule in index.match(event)} for event in events]
+        index_seconds = time.perf_counter() - started
+
+        if scanned != indexed:
+            raise AssertionError("indexed dispatch disagrees with scanning every rule")
+
+        print(f"{rule_count:>6} {event_count / scan_seconds:>14,.0f} {event_count / index_seconds:>14,.0f} "
+              f"{scan_seconds / index_seconds:>7.1f}x {index.stats()['mean_candidates']:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule index benchmark")
+    parser.add_argument("--events", type=int, default=50_000)
+    run(parser.parse_args().events)
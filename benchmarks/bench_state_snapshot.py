@@ -0,0 +1,71 @@
+# PyGuardian v3 - State Snapshot Benchmark
+# Detector-thread capture cost, snapshot size and restore time of aggregation state
+#
+# Usage: python -m benchmarks.bench_state_snapshot [--keys 200000] [--changed 0.01]
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+
+from detection.aggregation_store import AggregationStore
+from detection.alert_suppression import AlertSuppressor
+from detection.rule_compiler import compile_rule
+from detection.state_snapshot import StateSnapshotter
+
+EXFILTRATION_RULE = {
+    'id': 'rule-data-exfiltration',
+    'conditions': [{'field': 'direction', 'operator': 'equals', 'value': 'outbound'}],
+    'aggregation': {'group_by': ['source_ip', 'dest_ip'], 'time_window': '1h',
+                    'threshold': {'total_bytes': 104857600, 'operator': 'greater_than'}},
+}
+
+
+def run(key_count: int, changed_share: float) -> None:
+    rule = compile_rule(EXFILTRATION_RULE)
+    rng = random.Random(42)
+    keys = [(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", f"203.0.113.{rng.randrange(256)}")
+            for i in range(key_count)]
+
+    store = AggregationStore()
+    aggregator = store.aggregator_for(rule)
+    started_at = 1_700_000_000.0
+    for position, key in enumerate(keys):
+        aggregator.add_value(key, rng.randrange(10**6), started_at + 3000 * position / key_count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshotter = StateSnapshotter(directory, store, AlertSuppressor())
+
+        snapshotter.snapshot({0: key_count})
+        snapshotter.wait()
+        base = snapshotter.stats()
+
+        for key in rng.sample(keys, int(key_count * changed_share)):
+            aggregator.add_value(key, rng.randrange(10**6), started_at + 3100)
+        snapshotter.snapshot({0: key_count * 2})
+        snapshotter.wait()
+        delta = snapshotter.stats()
+
+        print(f"{'snapshot':>9} {'keys':>9} {'capture ms':>11} {'write ms':>9} {'bytes':>12}")
+        print(f"{'base':>9} {key_count:>9,} {base['last_capture_ms']:>11.1f} {base['last_write_ms']:>9.1f} "
+              f"{base['bytes_written']:>12,}")
+        print(f"{'delta':>9} {int(key_count * changed_share):>9,} {delta['last_capture_ms']:>11.1f} "
+              f"{delta['last_write_ms']:>9.1f} {delta['bytes_written'] - base['bytes_written']:>12,}")
+
+        restored = AggregationStore()
+        started = time.perf_counter()
+        offsets = StateSnapshotter(directory, restored).restore([rule])
+        seconds = time.perf_counter() - started
+        if len(restored.aggregators[rule.rule_id]) != len(aggregator) or offsets != {0: key_count * 2}:
+            raise AssertionError("restored state differs from the snapshotted state")
+        print(f"restore: {len(aggregator):,} keys in {seconds:.2f}s, resume at offsets {offsets}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="State snapshot benchmark")
+    parser.add_argument("--keys", type=int, default=200_000)
+    parser.add_argument("--changed", type=float, default=0.01, help="share of keys updated between snapshots")
+    args = parser.parse_args()
+    run(args.keys, args.changed)
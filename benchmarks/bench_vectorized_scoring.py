@@ -0,0 +1,50 @@
+# PyGuardian v3 - Vectorized Risk Scoring Benchmark
+# Compares per-object and columnar compute_risk_score at increasing batch sizes
+#
+# Usage: python -m benchmarks.bench_vectorized_scoring [--sizes 1000 100000 1000000]
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List
+
+from algorithms.correlation_algorithm import CorrelationEngine
+from algorithms.vectorized_scoring import EventBatch
+from benchmarks.synthetic_flows import SyntheticFlowGenerator
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+
+def run(sizes: List[int]) -> None:
+    engine = CorrelationEngine()
+    generator = SyntheticFlowGenerator()
+    alerts = generator.alerts()
+
+    print(f"{'events':>10} {'per-object':>12} {'to-batch':>10} {'vectorized':>12} {'speedup':>9}")
+    for size in sizes:
+        events = generator.events(size)
+
+        started = time.perf_counter()
+        expected = engine.compute_risk_score(events, alerts)
+        object_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batch = EventBatch.from_events(events)
+        convert_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = engine.compute_risk_score_batch(batch, alerts)
+        vector_seconds = time.perf_counter() - started
+
+        if abs(expected - actual) > 1e-9:
+            raise AssertionError(f"score mismatch at {size}: {expected} != {actual}")
+
+        print(f"{size:>10} {object_seconds:>11.4f}s {convert_seconds:>9.4f}s "
+              f"{vector_seconds:>11.4f}s {object_seconds / vector_seconds:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized risk scoring benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    run(parser.parse_args().sizes)
@@ -0,0 +1,207 @@
+# PyGuardian v3 - Synthetic Flow Generator
+# Seeded enriched_event generator for benchmarks (see schemas/events.json)
+
+from __future__ import annotations
+
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from algorithms.correlation_algorithm import (
+    Alert, AssetInfo, EnrichmentData, Event, GeoInfo, GeolocationInfo,
+    MitreAttackMapping, ReputationInfo, ThreatIntelInfo
+)
+
+COUNTRIES = ['United States', 'Germany', 'United Kingdom', 'China', 'Russia', 'Iran',
+             'North Korea', 'Brazil', 'Unknown']
+CRITICALITIES = ['low', 'medium', 'high', 'critical', 'unknown']
+SERVICE_PORTS = [22, 53, 80, 443, 445, 3389, 8080]
+BAD_CATEGORIES = ['malware', 'botnet', 'c2', 'phishing']
+
+
+@dataclass
+class FlowProfile:
+    """
+    Shape of the generated traffic
+
+    hosts: Number of internal source hosts
+    destinations: Number of external destinations
+    burstiness: Probability (0-1) that a flow continues the previous host's
+        session within a second instead of arriving after an idle gap
+    enrichment_coverage: Probability (0-1) that each enrichment lookup
+        (asset, geolocation, reputation) produced a result
+    mean_gap_seconds: Mean idle gap between sessions
+    malicious_ratio: Share of destinations with bad reputation
+    """
+    hosts: int = 200
+    destinations: int = 2000
+    burstiness: float = 0.6
+    enrichment_coverage: float = 0.8
+    mean_gap_seconds: float = 5.0
+    malicious_ratio: float = 0.05
+
+
+class SyntheticFlowGenerator:
+    """Deterministic generator of enriched flow records for a given seed"""
+
+    def __init__(self, profile: Optional[FlowProfile] = None, seed: int = 42,
+                 start: datetime = datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc)):
+        self.profile = profile or FlowProfile()
+        self.seed = seed
+        self.start = start
+
+    def records(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Yield enriched_event records in timestamp order"""
+        profile = self.profile
+        rng = random.Random(self.seed)
+        coverage = profile.enrichment_coverage
+
+        hosts = [self._host(rng, index) for index in range(profile.hosts)]
+        destinations = [self._destination(rng, index) for index in range(profile.destinations)]
+
+        timestamp = self.start
+        host = rng.choice(hosts)
+        destination = rng.choice(destinations)
+        dest_port = rng.choice(SERVICE_PORTS)
+
+        for _ in range(count):
+            if rng.random() < profile.burstiness:
+                timestamp += timedelta(seconds=rng.expovariate(2.0))
+            else:
+                timestamp += timedelta(seconds=rng.expovariate(1.0 / profile.mean_gap_seconds))
+                host = rng.choice(hosts)
+                destination = rng.choice(destinations)
+                dest_port = rng.choice(SERVICE_PORTS)
+
+            protocol = 17 if dest_port == 53 else 6
+            exfiltration = destination['malicious'] and rng.random() < 0.05
+            bytes_sent = rng.randint(20_000_000, 80_000_000) if exfiltration else int(rng.lognormvariate(7, 1.5))
+
+            yield {
+                'event_id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                'timestamp': timestamp.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+                'collector_id': f"netflow-collector-{host['index'] % 4 + 1:02d}",
+                'source_ip': host['ip'],
+                'dest_ip': destination['ip'],
+                'source_port': rng.randint(1024, 65535),
+                'dest_port': dest_port,
+                'protocol': protocol,
+                'bytes_sent': bytes_sent,
+                'bytes_received': int(rng.lognormvariate(8, 1.5)),
+                'packets_sent': max(1, bytes_sent // 1200),
+                'packets_received': rng.randint(1, 200),
+                'duration': rng.randint(0, 120),
+                'tcp_flags': rng.choice([2, 16, 18, 24, 17]) if protocol == 6 else 0,
+                'tos': 0,
+                'enrichment': {
+                    'source_asset': host['asset'] if rng.random() < coverage else self._empty_asset(),
+                    'dest_asset': self._empty_asset('unknown'),
+                    'geolocation': {
+                        'source': host['geo'] if rng.random() < coverage else self._empty_geo(),
+                        'dest': destination['geo'] if rng.random() < coverage else self._empty_geo(),
+                    },
+                    'threat_intel': {
+                        'source_reputation': host['reputation'] if rng.random() < coverage else None,
+                        'dest_reputation': destination['reputation'] if rng.random() < coverage else None,
+                    }
+                },
+                'raw_data': {'netflow_version': 9, 'sampling_rate': 1, 'interface': 'eth0'}
+            }
+
+    def events(self, count: int) -> List[Event]:
+        """Generate records and convert them to Event objects"""
+        return [event_from_record(record) for record in self.records(count)]
+
+    def alerts(self, count: int = 3) -> List[Alert]:
+        rng = random.Random(self.seed)
+        techniques = ['T1110', 'T1021', 'T1046', 'T1071', 'T1041', 'T1071.004']
+        return [
+            Alert(f"alert-{index}", self.start + timedelta(minutes=index), MitreAttackMapping(
+                tactics=['TA0006'], techniques=rng.sample(techniques, 2), sub_techniques=[]))
+            for index in range(count)
+        ]
+
+    @staticmethod
+    def _host(rng: random.Random, index: int) -> Dict[str, Any]:
+        return {
+            'index': index,
+            'ip': f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}",
+            'asset': {
+                'hostname': f"workstation-{index:04d}",
+                'os': rng.choice(['Windows 11', 'Ubuntu 22.04', 'macOS 14']),
+                'owner': f"user{index}@company.com",
+                'department': rng.choice(['Engineering', 'Finance', 'Sales', 'IT']),
+                'criticality': rng.choice(CRITICALITIES),
+            },
+            'geo': {'country': 'United States', 'region': 'California', 'city': 'San Francisco',
+                    'latitude': 37.7749, 'longitude': -122.4194, 'asn': 'AS15169',
+                    'organization': 'Company LLC'},
+            'reputation': {'score': rng.randint(60, 100), 'categories': ['legitimate'],
+                           'sources': ['internal_cmdb'], 'last_updated': '2024-01-15T09:00:00Z'},
+        }
+
+    def _destination(self, rng: random.Random, index: int) -> Dict[str, Any]:
+        malicious = rng.random() < self.profile.malicious_ratio
+        if malicious:
+            reputation = {'score': rng.randint(-100, -20),
+                          'categories': rng.sample(BAD_CATEGORIES, rng.randint(1, 2)),
+                          'sources': ['abuse_ch', 'virustotal'], 'last_updated': '2024-01-15T08:30:00Z'}
+        else:
+            reputation = {'score': rng.randint(0, 100), 'categories': ['legitimate'],
+                          'sources': ['virustotal'], 'last_updated': '2024-01-15T08:30:00Z'}
+        return {
+            'ip': f"203.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}",
+            'malicious': malicious,
+            'geo': {'country': rng.choice(COUNTRIES), 'region': None, 'city': None,
+                    'latitude': None, 'longitude': None, 'asn': f"AS{rng.randint(1000, 65000)}",
+                    'organization': None},
+            'reputation': reputation,
+        }
+
+    @staticmethod
+    def _empty_asset(criticality: Optional[str] = None) -> Dict[str, Any]:
+        return {'hostname': None, 'os': None, 'owner': None, 'department': None,
+                'criticality': criticality}
+
+    @staticmethod
+    def _empty_geo() -> Dict[str, Any]:
+        return {'country': None, 'region': None, 'city': None, 'latitude': None,
+                'longitude': None, 'asn': None, 'organization': None}
+
+
+def event_from_record(record: Dict[str, Any]) -> Event:
+    """Build a dataclass Event from an enriched_event record"""
+    enrichment = record['enrichment']
+    geolocation = enrichment['geolocation']
+    threat_intel = enrichment['threat_intel']
+    source_reputation = threat_intel.get('source_reputation')
+    dest_reputation = threat_intel.get('dest_reputation')
+
+    return Event(
+        event_id=record['event_id'],
+        timestamp=datetime.fromisoformat(record['timestamp'].replace('Z', '+00:00')),
+        source_ip=record['source_ip'],
+        dest_ip=record['dest_ip'],
+        source_port=record['source_port'],
+        dest_port=record['dest_port'],
+        protocol=record['protocol'],
+        bytes_sent=record['bytes_sent'],
+        bytes_received=record['bytes_received'],
+        packets_sent=record['packets_sent'],
+        packets_received=record['packets_received'],
+        tcp_flags=record['tcp_flags'],
+        enrichment=EnrichmentData(
+            source_asset=AssetInfo(enrichment['source_asset']['hostname'],
+                                   enrichment['source_asset']['criticality']),
+            dest_asset=AssetInfo(enrichment['dest_asset']['hostname'],
+                                 enrichment['dest_asset']['criticality']),
+            geolocation=GeolocationInfo(GeoInfo(geolocation['source']['country']),
+                                        GeoInfo(geolocation['dest']['country'])),
+            threat_intel=ThreatIntelInfo(
+                ReputationInfo(source_reputation['score']) if source_reputation else None,
+                ReputationInfo(dest_reputation['score']) if dest_reputation else None
+            )
+        )
+    )
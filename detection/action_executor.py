@@ -0,0 +1,503 @@
+# PyGuardian v3 - Rule Action Executor
+# Runs rule actions off the detection path in bounded per-type worker pools
+
+from __future__ import annotations
+
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from detection.rule_compiler import CompiledRule, make_accessor
+from detection.units import parse_duration
+
+CREATE_ALERT = 'create_alert'
+NOTIFY = 'notify'
+CREATE_INCIDENT = 'create_incident'
+RUN_SCRIPT = 'run_script'
+
+# Directory that run_script actions may execute scripts from
+DEFAULT_SCRIPTS_DIR = Path(os.environ.get('PYGUARDIAN_SCRIPTS_DIR', 'scripts'))
+
+DEFAULT_SCRIPT_TIMEOUT = 30.0
+DEFAULT_SCRIPT_CONCURRENCY = 2
+DEFAULT_RETRY_ATTEMPTS = 0
+DEFAULT_RETRY_DELAY = 5.0
+LATENCY_SAMPLES = 1024
+
+_TEMPLATE_PATTERN = re.compile(r'{{\s*([A-Za-z_][\w.]*)\s*}}')
+_OPTION_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][\w-]*$')
+_STOP_POLL_INTERVAL = 0.1  # seconds between stop-signal retries while a queue is full
+
+Template = Callable[[Dict[str, Any]], Any]
+Handler = Callable[['ActionRequest'], Any]
+
+
+def compile_template(value: Any) -> Template:
+    """
+    Compile a parameter value containing `{{ field }}` placeholders
+
+    Placeholders are dotted field paths resolved against the alert context
+    (the triggering event plus the aggregation group). The string is split
+    once at compile time; a value that is exactly one placeholder renders to
+    the field's value unchanged, other strings render by concatenation, and
+    values without placeholders are returned as-is. Missing fields render as
+    an empty string.
+    """
+    if isinstance(value, dict):
+        items = [(key, compile_template(item)) for key, item in value.items()]
+        return lambda context: {key: render(context) for key, render in items}
+    if isinstance(value, list):
+        renders = [compile_template(item) for item in value]
+        return lambda context: [render(context) for render in renders]
+    if not isinstance(value, str) or '{{' not in value:
+        return lambda context: value
+
+    parts = _TEMPLATE_PATTERN.split(value)
+    literals = parts[0::2]
+    accessors = [make_accessor(path) for path in parts[1::2]]
+
+    if len(accessors) == 1 and literals == ['', '']:
+        get_field = accessors[0]
+
+        def render_field(context):
+            result = get_field(context)
+            return '' if result is None else result
+        return render_field
+
+    def render(context):
+        pieces = [literals[0]]
+        for get_field, literal in zip(accessors, literals[1:]):
+            result = get_field(context)
+            pieces.append('' if result is None else str(result))
+            pieces.append(literal)
+        return ''.join(pieces)
+    return render
+
+
+@dataclass(frozen=True)
+class CompiledAction:
+    """One rule action with its parameters compiled to a template"""
+    rule_id: str
+    type: str
+    spec: Dict[str, Any]
+    render: Template
+
+    @classmethod
+    def compile(cls, rule_id: str, action: Dict[str, Any]) -> 'CompiledAction':
+        spec = {key: value for key, value in action.items() if key != 'type'}
+        return cls(rule_id, action.get('type', ''), spec, compile_template(spec))
+
+
+def compile_actions(rule: CompiledRule) -> Tuple[CompiledAction, ...]:
+    return tuple(CompiledAction.compile(rule.rule_id, action) for action in rule.actions)
+
+
+@dataclass
+class ActionRequest:
+    """A queued action; `parameters` is the action spec rendered for one alert"""
+    action: CompiledAction
+    context: Dict[str, Any]
+    enqueued_at: float
+    attempts: int = 0
+    _parameters: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    @property
+    def rule_id(self) -> str:
+        return self.action.rule_id
+
+    @property
+    def type(self) -> str:
+        return self.action.type
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        if self._parameters is None:
+            self._parameters = self.action.render(self.context)
+        return self._parameters
+
+
+@dataclass
+class PoolConfig:
+    workers: int
+    queue_size: int
+
+
+DEFAULT_POOLS = {
+    CREATE_ALERT: PoolConfig(workers=2, queue_size=10_000),
+    NOTIFY: PoolConfig(workers=4, queue_size=1_000),
+    CREATE_INCIDENT: PoolConfig(workers=1, queue_size=1_000),
+    RUN_SCRIPT: PoolConfig(workers=4, queue_size=256),
+}
+
+
+class ActionTimeout(Exception):
+    """Raised by a handler when an action exceeded its time limit"""
+
+
+class _LatencyStats:
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.samples.append(seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+        return {
+            'count': self.count,
+            'mean_ms': self.total * 1e3 / self.count if self.count else 0.0,
+            'p50_ms': percentile(0.5) * 1e3,
+            'p99_ms': percentile(0.99) * 1e3,
+            'max_ms': self.max * 1e3,
+        }
+
+
+class _ActionPool:
+    """Bounded queue plus worker threads for one action type"""
+
+    def __init__(self, action_type: str, handler: Handler, config: PoolConfig):
+        self.action_type = action_type
+        self.handler = handler
+        self.config = config
+        self.queue: 'queue.Queue[Optional[ActionRequest]]' = queue.Queue(maxsize=config.queue_size)
+        self.threads: List[threading.Thread] = []
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.max_queue_depth = 0
+        self.queue_wait = _LatencyStats()
+        self.run_time = _LatencyStats()
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'workers': len(self.threads),
+                'queue_size': self.config.queue_size,
+                'queue_depth': self.queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'retries': self.retries,
+                'queue_wait': self.queue_wait.to_dict(),
+                'run_time': self.run_time.to_dict(),
+                'last_error': self.last_error,
+            }
+
+
+class ActionExecutor:
+    """
+    Executes rule actions asynchronously to detection
+
+    Every action type has its own bounded queue and worker threads, so a
+    slow notification channel or script cannot delay alert creation or each
+    other. `dispatch()` never blocks: when a type's queue is full the action
+    is dropped and counted. Failed actions are retried `retry_attempts`
+    times, `retry_delay` seconds apart, on the same worker.
+
+    Handlers receive an ActionRequest whose `parameters` are the action's
+    precompiled templates rendered against the alert context; rendering
+    happens on the worker, not the detection thread. run_script is handled
+    by a ScriptRunner unless another handler is given.
+    """
+
+    def __init__(self, handlers: Optional[Dict[str, Handler]] = None,
+                 pools: Optional[Dict[str, PoolConfig]] = None,
+                 script_runner: Optional['ScriptRunner'] = None,
+                 retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+                 retry_delay: float = DEFAULT_RETRY_DELAY,
+                 clock: Callable[[], float] = time.monotonic):
+        handlers = dict(handlers or {})
+        if RUN_SCRIPT not in handlers:
+            handlers[RUN_SCRIPT] = script_runner or ScriptRunner()
+        pools = {**DEFAULT_POOLS, **(pools or {})}
+
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.unhandled = 0
+        self._stopping = threading.Event()
+        self._compiled: Dict[str, Tuple[List[Dict[str, Any]], Tuple[CompiledAction, ...]]] = {}
+        self._pools = {
+            action_type: _ActionPool(action_type, handler,
+                                     pools.get(action_type) or PoolConfig(workers=1, queue_size=1_000))
+            for action_type, handler in handlers.items()
+        }
+
+    @classmethod
+    def from_engine_config(cls, engine_config: Dict[str, Any],
+                           handlers: Optional[Dict[str, Handler]] = None,
+                           **kwargs: Any) -> 'ActionExecutor':
+        """Build with retries and script timeout from the `processing` block of engine_config"""
+        processing = engine_config.get('processing') or {}
+        kwargs.setdefault('retry_attempts', int(processing.get('retry_attempts', DEFAULT_RETRY_ATTEMPTS)))
+        kwargs.setdefault('retry_delay', parse_duration(processing.get('retry_delay', DEFAULT_RETRY_DELAY)))
+        if 'script_runner' not in kwargs and not (handlers and RUN_SCRIPT in handlers):
+            timeout = processing.get('max_processing_time', DEFAULT_SCRIPT_TIMEOUT)
+            kwargs['script_runner'] = ScriptRunner(timeout=parse_duration(timeout))
+        return cls(handlers, **kwargs)
+
+    def start(self) -> 'ActionExecutor':
+        self._stopping.clear()
+        for pool in self._pools.values():
+            while len(pool.threads) < pool.config.workers:
+                thread = threading.Thread(target=self._work, args=(pool,), daemon=True,
+                                          name=f"action-{pool.action_type}-{len(pool.threads)}")
+                pool.threads.append(thread)
+                thread.start()
+        return self
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers
+
+        Args:
+            drain: Run the actions still queued before stopping; otherwise
+                they are discarded and counted as dropped
+            timeout: Seconds to wait for each worker to finish, and at most
+                that long in total to hand the workers their stop signal
+        """
+        if not drain:
+            self._stopping.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for pool in self._pools.values():
+            for _ in pool.threads:
+                if not self._signal_stop(pool, deadline):
+                    break
+        for pool in self._pools.values():
+            for thread in pool.threads:
+                thread.join(timeout)
+            pool.threads = [thread for thread in pool.threads if thread.is_alive()]
+
+    def _signal_stop(self, pool: _ActionPool, deadline: Optional[float]) -> bool:
+        """
+        Queue one stop sentinel for a pool's workers
+
+        While the queue is full, waits for live workers to free a slot; the
+        sentinel is given up on once no worker is alive (never started, or
+        died) or the deadline passes, so stop() cannot block forever on it.
+        """
+        try:
+            pool.queue.put_nowait(None)
+            return True
+        except queue.Full:
+            pass
+        while any(thread.is_alive() for thread in pool.threads):
+            wait = _STOP_POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return False
+            try:
+                pool.queue.put(None, timeout=wait)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __enter__(self) -> 'ActionExecutor':
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def actions_for(self, rule: CompiledRule) -> Tuple[CompiledAction, ...]:
+        """Compiled actions of a rule, recompiled only when its actions change"""
+        cached = self._compiled.get(rule.rule_id)
+        if cached is None or cached[0] is not rule.actions:
+            cached = self._compiled[rule.rule_id] = (rule.actions, compile_actions(rule))
+        return cached[1]
+
+    def dispatch(self, rule: CompiledRule, context: Dict[str, Any]) -> int:
+        """
+        Queue all actions of a fired rule without blocking
+
+        Args:
+            rule: Rule that fired
+            context: Alert context the templates are rendered against, e.g.
+                the triggering event merged with the aggregation group
+
+        Returns:
+            Number of actions queued (the rest were dropped or unhandled)
+        """
+        queued = 0
+        for action in self.actions_for(rule):
+            queued += self.submit(action, context)
+        return queued
+
+    def submit(self, action: CompiledAction, context: Dict[str, Any]) -> bool:
+        pool = self._pools.get(action.type)
+        if pool is None:
+            self.unhandled += 1
+            return False
+        try:
+            pool.queue.put_nowait(ActionRequest(action, context, self.clock()))
+        except queue.Full:
+            with pool.lock:
+                pool.dropped += 1
+            return False
+        depth = pool.queue.qsize()
+        with pool.lock:
+            pool.submitted += 1
+            if depth > pool.max_queue_depth:
+                pool.max_queue_depth = depth
+        return True
+
+    def forget(self, rule_ids: Sequence[str]) -> None:
+        """Drop compiled actions of removed rules"""
+        for rule_id in rule_ids:
+            self._compiled.pop(rule_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'unhandled': self.unhandled,
+            'pools': {action_type: pool.stats() for action_type, pool in self._pools.items()}
+        }
+
+    def _work(self, pool: _ActionPool) -> None:
+        while True:
+            request = pool.queue.get()
+            if request is None:
+                return
+            if self._stopping.is_set():
+                with pool.lock:
+                    pool.dropped += 1
+                continue
+
+            started = self.clock()
+            with pool.lock:
+                pool.queue_wait.add(started - request.enqueued_at)
+            self._run(pool, request)
+            with pool.lock:
+                pool.run_time.add(self.clock() - started)
+
+    def _run(self, pool: _ActionPool, request: ActionRequest) -> None:
+        while True:
+            request.attempts += 1
+            try:
+                pool.handler(request)
+            except Exception as exc:
+                with pool.lock:
+                    if isinstance(exc, ActionTimeout):
+                        pool.timeouts += 1
+                    pool.last_error = f"{request.rule_id}: {type(exc).__name__}: {exc}"
+                    if request.attempts > self.retry_attempts or self._stopping.is_set():
+                        pool.failed += 1
+                        return
+                    pool.retries += 1
+                if self._stopping.wait(self.retry_delay):
+                    with pool.lock:
+                        pool.failed += 1
+                    return
+            else:
+                with pool.lock:
+                    pool.completed += 1
+                return
+
+
+class ScriptRunner:
+    """
+    run_script handler: runs a script from the scripts directory
+
+    Scripts are executed directly (no shell) with each rendered parameter
+    passed as a single `--name=value` argument, so a value that starts with
+    `--` cannot be taken for an option. Every script has its own concurrency limit,
+    so for example a burst of capture_network_traffic.sh runs cannot take
+    all run_script workers from block_source_ip.sh; a run that cannot start
+    within the script's timeout, or does not finish within it, is killed
+    and raises ActionTimeout.
+    """
+
+    def __init__(self, scripts_dir: Union[str, Path] = DEFAULT_SCRIPTS_DIR,
+                 timeout: float = DEFAULT_SCRIPT_TIMEOUT,
+                 concurrency: int = DEFAULT_SCRIPT_CONCURRENCY,
+                 limits: Optional[Dict[str, Tuple[int, float]]] = None):
+        """
+        Args:
+            scripts_dir: Directory scripts are resolved in
+            timeout: Default seconds a script may wait for a slot and run
+            concurrency: Default concurrent runs per script
+            limits: Per-script (concurrency, timeout) overrides by script name
+        """
+        self.scripts_dir = Path(scripts_dir).resolve()
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.limits = dict(limits or {})
+        self._lock = threading.Lock()
+        self._slots: Dict[str, Tuple[threading.BoundedSemaphore, float]] = {}
+
+    def __call__(self, request: ActionRequest) -> subprocess.CompletedProcess:
+        name = request.action.spec.get('script')
+        if not name:
+            raise ValueError("run_script action has no 'script'")
+        path = self.resolve(name)
+        semaphore, timeout = self._slot(name)
+
+        deadline = time.monotonic() + timeout
+        if not semaphore.acquire(timeout=timeout):
+            raise ActionTimeout(f"{name} waited {timeout:.1f}s for a free slot")
+        try:
+            remaining = max(0.0, deadline - time.monotonic())
+            try:
+                result = subprocess.run([str(path), *self.arguments(request.parameters.get('parameters'))],
+                                        capture_output=True, timeout=remaining)
+            except subprocess.TimeoutExpired:
+                raise ActionTimeout(f"{name} exceeded {timeout:.1f}s") from None
+        finally:
+            semaphore.release()
+        if result.returncode != 0:
+            stderr = result.stderr.decode('utf-8', 'replace').strip()
+            raise RuntimeError(f"{name} exited with {result.returncode}: {stderr[:200]}")
+        return result
+
+    def resolve(self, name: str) -> Path:
+        """Path of a script, refusing anything outside the scripts directory"""
+        path = (self.scripts_dir / name).resolve()
+        if path.parent != self.scripts_dir:
+            raise ValueError(f"Script {name!r} is outside {self.scripts_dir}")
+        return path
+
+    @staticmethod
+    def arguments(parameters: Optional[Dict[str, Any]]) -> List[str]:
+        argv = []
+        for key, value in (parameters or {}).items():
+            if not _OPTION_NAME_PATTERN.match(str(key)):
+                raise ValueError(f"Invalid script parameter name: {key!r}")
+            argv.append(f"--{key}={value}")
+        return argv
+
+    def _slot(self, name: str) -> Tuple[threading.BoundedSemaphore, float]:
+        slot = self._slots.get(name)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.get(name)
+                if slot is None:
+                    concurrency, timeout = self.limits.get(name, (self.concurrency, self.timeout))
+                    slot = self._slots[name] = (threading.BoundedSemaphore(concurrency), timeout)
+        return slot
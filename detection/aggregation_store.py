@@ -0,0 +1,602 @@
+# PyGuardian v3 - Aggregation Store
+# Sliding-window counts, sums and distinct counts per rule group key
+
+from __future__ import annotations
+
+import math
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from hashlib import blake2b
+from operator import eq, ge, gt, le, lt
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from detection.rule_compiler import CompiledRule, RuleCompilationError, make_accessor
+from detection.units import parse_duration
+
+# Threshold name -> event field it aggregates (None: event count)
+THRESHOLD_METRICS = {
+    'count': None,
+    'total_bytes': 'bytes_sent',
+    'unique_dest_ports': 'dest_port',
+    'unique_queries': 'raw_data.dns_query',
+}
+
+_DISTINCT_METRICS = frozenset({'unique_dest_ports', 'unique_queries'})
+
+_THRESHOLD_OPERATORS = {
+    'greater_than': gt,
+    'greater_than_or_equal': ge,
+    'less_than': lt,
+    'less_than_or_equal': le,
+    'equals': eq,
+}
+
+DISTINCT_MODES = ('exact', 'hll')
+
+# Approximate CPython footprint of the state objects, for memory accounting
+_KEY_STATE_BYTES = 320
+_BUCKET_BYTES = 120
+_DISTINCT_VALUE_BYTES = 60
+_HLL_OVERHEAD_BYTES = 60
+
+_HASH_BITS = 64
+
+
+def event_timestamp(event: Dict[str, Any]) -> float:
+    """Event time in epoch seconds from an ISO-8601 string, datetime or number"""
+    value = event.get('timestamp')
+    if isinstance(value, str):
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        return datetime.fromisoformat(value).timestamp()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if value is None:
+        raise ValueError("Event has no timestamp")
+    return float(value)
+
+
+def _hash64(value: Any) -> int:
+    """Process-independent 64-bit hash, so sketches survive restarts"""
+    return int.from_bytes(blake2b(repr(value).encode(), digest_size=8).digest(), 'big')
+
+
+def hll_register(value: Any, precision: int) -> Tuple[int, int]:
+    """(register index, rank) a value updates in a sketch of the given precision"""
+    hashed = _hash64(value)
+    remaining_bits = _HASH_BITS - precision
+    index = hashed >> remaining_bits
+    rank = remaining_bits - (hashed & ((1 << remaining_bits) - 1)).bit_length() + 1
+    return index, rank
+
+
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(_HASH_BITS + 2)]
+
+
+class HyperLogLog:
+    """
+    Fixed-size distinct-count sketch
+
+    2**precision one-byte registers; the standard error is roughly
+    1.04 / sqrt(2**precision), e.g. 6.5% at precision 8 (256 bytes).
+    """
+
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision: int = 8, registers: Optional[bytearray] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, value: Any) -> bool:
+        """Add a value; returns True if a register changed"""
+        index, rank = hll_register(value, self.precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> float:
+        return hll_estimate(self.registers)
+
+
+def hll_estimate(registers: bytearray) -> float:
+    m = len(registers)
+    if m >= 128:
+        alpha = 0.7213 / (1 + 1.079 / m)
+    else:
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+
+    estimate = alpha * m * m / sum(map(_INVERSE_POWERS.__getitem__, registers))
+    if estimate <= 2.5 * m:
+        zeros = registers.count(0)
+        if zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+    return estimate
+
+
+@dataclass(frozen=True)
+class AggregationSpec:
+    """Parsed `aggregation` block of a rule"""
+    group_by: Tuple[str, ...]
+    window: float
+    metric: str
+    field: Optional[str]
+    threshold: float
+    operator: str
+
+    @classmethod
+    def from_rule(cls, aggregation: Dict[str, Any]) -> 'AggregationSpec':
+        """
+        Parse an aggregation block such as
+        {group_by: [source_ip], time_window: 10m, threshold: {unique_dest_ports: 20, operator: greater_than}}
+
+        An optional `field` overrides the event field a metric aggregates.
+        """
+        threshold = dict(aggregation.get('threshold') or {})
+        operator = threshold.pop('operator', 'greater_than')
+        if operator not in _THRESHOLD_OPERATORS:
+            raise RuleCompilationError(f"Unsupported threshold operator: {operator}")
+        if len(threshold) != 1:
+            raise RuleCompilationError(f"Aggregation needs exactly one threshold: {aggregation}")
+
+        (metric, limit), = threshold.items()
+        if metric not in THRESHOLD_METRICS:
+            raise RuleCompilationError(f"Unsupported threshold metric: {metric}")
+
+        try:
+            window = parse_duration(aggregation.get('time_window', '5m'))
+            limit = float(limit)
+        except (TypeError, ValueError) as error:
+            raise RuleCompilationError(f"Invalid aggregation {aggregation}: {error}") from None
+
+        return cls(
+            group_by=tuple(aggregation.get('group_by') or ()),
+            window=window,
+            metric=metric,
+            field=aggregation.get('field', THRESHOLD_METRICS[metric]),
+            threshold=limit,
+            operator=operator
+        )
+
+
+@dataclass
+class AggregationResult:
+    """Windowed metric of one group key that satisfied the rule threshold"""
+    group: Dict[str, Any]
+    metric: str
+    value: float
+    threshold: float
+    event_count: int
+    window_start: float
+    window_end: float
+
+
+class _WindowState:
+    """Per group key ring of buckets: [index, count, sum, distinct payload]"""
+
+    __slots__ = ('buckets', 'count', 'total', 'seen', 'window_registers', 'estimate')
+
+    def __init__(self):
+        self.buckets: deque = deque()
+        self.count = 0
+        self.total = 0
+        self.seen: Optional[Dict[Any, int]] = None  # exact: value -> last bucket index
+        self.window_registers: Optional[bytearray] = None  # hll: max over live buckets
+        self.estimate: Optional[float] = None  # hll: cached window estimate
+
+
+class WindowedAggregator:
+    """
+    Sliding-window state of one rule, keyed by its group_by fields
+
+    The window is split into `bucket_count` time buckets; each group key keeps
+    only the buckets it touched, and buckets leaving the window are subtracted
+    from running totals. Distinct values are tracked exactly (value -> last
+    bucket seen) or, in "hll" mode, as one HyperLogLog sketch per bucket so
+    per-key memory is fixed regardless of cardinality. Keys idle for a whole
+    window are dropped; beyond `max_keys` or `memory_limit` the least recently
+    updated keys are evicted.
+    """
+
+    def __init__(self, spec: AggregationSpec, bucket_count: int = 12,
+                 max_keys: Optional[int] = None, memory_limit: Optional[int] = None,
+                 distinct_mode: str = 'exact', hll_precision: int = 8):
+        if distinct_mode not in DISTINCT_MODES:
+            raise ValueError(f"distinct_mode must be one of {DISTINCT_MODES}")
+
+        self.spec = spec
+        self.bucket_count = bucket_count
+        self.bucket_width = spec.window / bucket_count
+        self.max_keys = max_keys
+        self.memory_limit = memory_limit
+        self.distinct_mode = distinct_mode
+        self.hll_precision = hll_precision
+
+        self._key_getters = [make_accessor(path) for path in spec.group_by]
+        self._get_value = make_accessor(spec.field) if spec.field else None
+        self._sums = spec.metric == 'total_bytes'
+        self._distinct = spec.metric in _DISTINCT_METRICS
+        self._hll = self._distinct and distinct_mode == 'hll'
+        self._compare = _THRESHOLD_OPERATORS[spec.operator]
+
+        self._states: 'OrderedDict[Hashable, _WindowState]' = OrderedDict()
+        self.current_index: Optional[int] = None
+        self.memory_bytes = 0
+        self.late_events = 0
+        self.expired_keys = 0
+        self.evicted_keys = 0
+        self._changed: Optional[set] = None  # keys updated since drain_changes(), when tracking
+        self._removed: Optional[set] = None
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def group_key(self, event: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(get_field(event) for get_field in self._key_getters)
+
+    def add(self, event: Dict[str, Any], timestamp: Optional[float] = None) -> Optional[AggregationResult]:
+        """
+        Fold an event that matched the rule conditions into its group's window
+
+        Args:
+            event: Enriched event dict
+            timestamp: Event time in epoch seconds; read from the event if omitted
+
+        Returns:
+            AggregationResult while the group's windowed metric satisfies the
+            threshold, otherwise None
+        """
+        if timestamp is None:
+            timestamp = event_timestamp(event)
+        return self.add_value(self.group_key(event), self.metric_value(event), timestamp)
+
+    def metric_value(self, event: Dict[str, Any]) -> Any:
+        """The event field this aggregation sums or counts distinct values of"""
+        return self._get_value(event) if self._get_value is not None else None
+
+    def add_value(self, key: Tuple[Any, ...], value: Any, timestamp: float,
+                  count: int = 1) -> Optional[AggregationResult]:
+        """
+        Same as add() for an already extracted group key and metric field value
+
+        Args:
+            key: Group key, the group_by field values in order
+            value: Metric field value (ignored for count thresholds)
+            timestamp: Event time in epoch seconds
+            count: Events the value stands for, e.g. the flows merged into
+                one pre-aggregated flow (see FlowPreAggregator)
+        """
+        index = int(timestamp // self.bucket_width)
+
+        if self.current_index is None or index > self.current_index:
+            advanced = self.current_index is not None
+            self.current_index = index
+            if advanced:
+                self.expire()
+
+        oldest = self.current_index - self.bucket_count + 1
+        if index < oldest:
+            self.late_events += 1
+            return None
+
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _WindowState()
+            if self._distinct:
+                if self._hll:
+                    state.window_registers = bytearray(1 << self.hll_precision)
+                else:
+                    state.seen = {}
+            before = 0
+        else:
+            self._states.move_to_end(key)
+            before = self._state_bytes(state)
+        if self._changed is not None:
+            self._changed.add(key)
+
+        self._roll(state, oldest)
+        bucket = self._bucket(state, index)
+
+        bucket[1] += count
+        state.count += count
+        if self._sums:
+            amount = value or 0
+            bucket[2] += amount
+            state.total += amount
+        elif self._distinct:
+            if value is not None:
+                self._add_distinct(state, bucket, value)
+
+        self.memory_bytes += self._state_bytes(state) - before
+        self._enforce_limits()
+
+        metric_value = self._metric_value(state)
+        if not self._compare(metric_value, self.spec.threshold):
+            return None
+
+        return AggregationResult(
+            group=dict(zip(self.spec.group_by, key)),
+            metric=self.spec.metric,
+            value=metric_value,
+            threshold=self.spec.threshold,
+            event_count=state.count,
+            window_start=oldest * self.bucket_width,
+            window_end=(self.current_index + 1) * self.bucket_width
+        )
+
+    def value(self, key: Tuple[Any, ...]) -> float:
+        """Current windowed metric of a group key (0 if untracked)"""
+        state = self._states.get(key)
+        if state is None:
+            return 0
+        before = self._state_bytes(state)
+        self._roll(state, self.current_index - self.bucket_count + 1)
+        self.memory_bytes += self._state_bytes(state) - before
+        return self._metric_value(state)
+
+    def expire(self) -> int:
+        """Drop keys with no bucket left in the window; returns how many"""
+        if self.current_index is None:
+            return 0
+        oldest = self.current_index - self.bucket_count + 1
+        expired = 0
+        while self._states:
+            key, state = next(iter(self._states.items()))
+            if state.buckets and state.buckets[-1][0] >= oldest:
+                break  # keys are ordered by last update
+            self._drop(key)
+            expired += 1
+        self.expired_keys += expired
+        return expired
+
+    def clear(self) -> None:
+        if self._changed is not None:
+            self._removed.update(self._states)
+            self._changed.clear()
+        self._states.clear()
+        self.current_index = None
+        self.memory_bytes = 0
+
+    def items(self) -> Iterator[Tuple[Tuple[Any, ...], _WindowState]]:
+        return iter(self._states.items())
+
+    def track_changes(self) -> None:
+        """Start recording updated and removed keys; every current key counts as updated"""
+        self._changed = set(self._states)
+        self._removed = set()
+
+    def drain_changes(self) -> Tuple[List[Hashable], List[Hashable]]:
+        """
+        Keys updated and keys removed since the previous call
+
+        Updated keys are ordered by their latest bucket, oldest first, which
+        is the order they must be re-inserted in to keep expiry ordering.
+        Updated keys whose buckets all rolled out of the window (but that
+        expire() has not reached yet) are reported as removed.
+        """
+        if self._changed is None:
+            raise RuntimeError("track_changes() has not been called")
+        states = self._states
+        every_key = len(self._changed) == len(states)
+        changed = list(states) if every_key else list(self._changed)
+        removed = list(self._removed)
+        if not all(states[key].buckets for key in changed):
+            removed.extend(key for key in changed if not states[key].buckets)
+            changed = [key for key in changed if states[key].buckets]
+        if not every_key:  # list(states) is already in update order
+            changed.sort(key=lambda key: states[key].buckets[-1][0])
+        self._changed = set()
+        self._removed = set()
+        return changed, removed
+
+    def export_state(self, key: Hashable) -> List[Tuple[Any, ...]]:
+        """
+        Copy of a key's buckets as (index, count, sum, distinct payload) tuples
+
+        The payload is the list of values first seen in the bucket (exact
+        mode), the bucket's HyperLogLog registers as bytes (hll mode), or None.
+        Running totals and window sketches are derived from the buckets.
+        """
+        if self._hll:
+            copy = bytes
+        elif self._distinct:
+            copy = list
+        else:
+            copy = None
+        return [(index, count, total, payload if copy is None else copy(payload))
+                for index, count, total, payload in self._states[key].buckets]
+
+    def load_state(self, key: Hashable, buckets: List[Tuple[Any, ...]]) -> None:
+        """Install a key's state from export_state() output as the most recently updated key"""
+        if key in self._states:
+            self._drop(key)
+        state = self._states[key] = _WindowState()
+        if self._distinct:
+            if self._hll:
+                state.window_registers = bytearray(1 << self.hll_precision)
+            else:
+                state.seen = {}
+        for index, count, total, payload in buckets:
+            if self._hll:
+                payload = bytearray(payload)
+                state.window_registers = bytearray(map(max, state.window_registers, payload))
+            elif state.seen is not None:
+                payload = list(payload)
+                for value in payload:
+                    state.seen[value] = index
+            state.buckets.append([index, count, total, payload])
+            state.count += count
+            state.total += total
+        self.memory_bytes += self._state_bytes(state)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'metric': self.spec.metric,
+            'window_seconds': self.spec.window,
+            'keys': len(self._states),
+            'memory_bytes': self.memory_bytes,
+            'distinct_mode': self.distinct_mode if self._distinct else None,
+            'late_events': self.late_events,
+            'expired_keys': self.expired_keys,
+            'evicted_keys': self.evicted_keys
+        }
+
+    def _bucket(self, state: _WindowState, index: int) -> List[Any]:
+        buckets = state.buckets
+        if buckets and buckets[-1][0] == index:
+            return buckets[-1]
+
+        position = len(buckets)
+        if buckets and buckets[-1][0] > index:  # out-of-order event
+            while position and buckets[position - 1][0] > index:
+                position -= 1
+            if position and buckets[position - 1][0] == index:
+                return buckets[position - 1]
+
+        if not self._distinct:
+            payload = None
+        elif self._hll:
+            payload = bytearray(1 << self.hll_precision)
+        else:
+            payload = []
+        bucket = [index, 0, 0, payload]
+        buckets.insert(position, bucket)
+        return bucket
+
+    def _add_distinct(self, state: _WindowState, bucket: List[Any], value: Any) -> None:
+        index = bucket[0]
+        if self._hll:
+            register, rank = hll_register(value, self.hll_precision)
+            if rank > bucket[3][register]:
+                bucket[3][register] = rank
+                if rank > state.window_registers[register]:
+                    state.window_registers[register] = rank
+                    state.estimate = None
+            return
+
+        last_index = state.seen.get(value)
+        if last_index is None or last_index < index:
+            state.seen[value] = index
+            bucket[3].append(value)
+
+    def _roll(self, state: _WindowState, oldest: int) -> None:
+        """Subtract buckets that left the window from the running totals"""
+        buckets = state.buckets
+        rolled = False
+        while buckets and buckets[0][0] < oldest:
+            index, count, total, payload = buckets.popleft()
+            state.count -= count
+            state.total -= total
+            if state.seen is not None:
+                seen = state.seen
+                for value in payload:
+                    if seen.get(value) == index:
+                        del seen[value]
+            rolled = True
+
+        if rolled and self._hll:
+            window = bytearray(1 << self.hll_precision)
+            for bucket in buckets:
+                window = bytearray(map(max, window, bucket[3]))
+            state.window_registers = window
+            state.estimate = None
+
+    def _metric_value(self, state: _WindowState) -> float:
+        if self._sums:
+            return state.total
+        if not self._distinct:
+            return state.count
+        if self._hll:
+            if state.estimate is None:
+                state.estimate = hll_estimate(state.window_registers)
+            return state.estimate
+        return len(state.seen)
+
+    def _state_bytes(self, state: _WindowState) -> int:
+        size = _KEY_STATE_BYTES + _BUCKET_BYTES * len(state.buckets)
+        if self._hll:
+            size += (len(state.buckets) + 1) * ((1 << self.hll_precision) + _HLL_OVERHEAD_BYTES)
+        elif state.seen is not None:
+            size += _DISTINCT_VALUE_BYTES * len(state.seen)
+        return size
+
+    def _drop(self, key: Hashable) -> None:
+        state = self._states.pop(key)
+        self.memory_bytes -= self._state_bytes(state)
+        if self._changed is not None:
+            self._changed.discard(key)
+            self._removed.add(key)
+
+    def _enforce_limits(self) -> None:
+        while len(self._states) > 1 and (
+                (self.max_keys is not None and len(self._states) > self.max_keys) or
+                (self.memory_limit is not None and self.memory_bytes > self.memory_limit)):
+            self._drop(next(iter(self._states)))
+            self.evicted_keys += 1
+
+
+class AggregationStore:
+    """
+    Windowed aggregation state for every rule that declares an `aggregation`
+
+    Aggregators are created on first use and keyed by rule id. Limits passed
+    here apply to each rule's aggregator.
+    """
+
+    def __init__(self, bucket_count: int = 12, max_keys_per_rule: Optional[int] = None,
+                 memory_limit_per_rule: Optional[int] = None,
+                 distinct_mode: str = 'exact', hll_precision: int = 8):
+        if distinct_mode not in DISTINCT_MODES:
+            raise ValueError(f"distinct_mode must be one of {DISTINCT_MODES}")
+        self.bucket_count = bucket_count
+        self.max_keys_per_rule = max_keys_per_rule
+        self.memory_limit_per_rule = memory_limit_per_rule
+        self.distinct_mode = distinct_mode
+        self.hll_precision = hll_precision
+        self.aggregators: Dict[str, WindowedAggregator] = {}
+
+    def aggregator_for(self, rule: CompiledRule) -> Optional[WindowedAggregator]:
+        """The rule's aggregator, created on first use; None without an aggregation block"""
+        aggregator = self.aggregators.get(rule.rule_id)
+        if aggregator is None and rule.aggregation:
+            aggregator = self.aggregators[rule.rule_id] = WindowedAggregator(
+                AggregationSpec.from_rule(rule.aggregation),
+                bucket_count=self.bucket_count,
+                max_keys=self.max_keys_per_rule,
+                memory_limit=self.memory_limit_per_rule,
+                distinct_mode=self.distinct_mode,
+                hll_precision=self.hll_precision
+            )
+        return aggregator
+
+    def update(self, rule: CompiledRule, event: Dict[str, Any],
+               timestamp: Optional[float] = None) -> Optional[AggregationResult]:
+        """
+        Record an event that matched the rule's conditions
+
+        Returns:
+            AggregationResult when the rule's threshold is met for the event's
+            group; None otherwise, and for rules without aggregation
+        """
+        aggregator = self.aggregator_for(rule)
+        if aggregator is None:
+            return None
+        return aggregator.add(event, timestamp)
+
+    def drop_rule(self, rule_id: str) -> None:
+        self.aggregators.pop(rule_id, None)
+
+    def expire(self) -> int:
+        return sum(aggregator.expire() for aggregator in self.aggregators.values())
+
+    def memory_bytes(self) -> int:
+        return sum(aggregator.memory_bytes for aggregator in self.aggregators.values())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {rule_id: aggregator.stats() for rule_id, aggregator in self.aggregators.items()}
@@ -0,0 +1,250 @@
+# PyGuardian v3 - Alert Suppression
+# Deduplication and per-rule rate limiting between rule firing and alert creation
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from detection.units import parse_duration
+
+EMIT = 'emit'
+DUPLICATE = 'duplicate'
+RATE_LIMITED = 'rate_limited'
+
+DEFAULT_DEDUP_WINDOW = 300.0
+DEFAULT_MAX_ALERTS_PER_RULE_PER_HOUR = 100
+DEFAULT_MAX_OPEN_ALERTS = 1_000_000
+
+
+def group_key_of(group: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    """Hashable key for an aggregation group such as {'source_ip': ..., 'dest_ip': ...}"""
+    return tuple(sorted(group.items()))
+
+
+@dataclass
+class OpenAlert:
+    """
+    An emitted alert inside its deduplication window
+
+    Later firings for the same rule and group roll up into `duplicates`;
+    firings of other groups dropped by the rule's rate limit roll up into
+    `rate_limited` on the rule's most recent alert.
+    """
+    rule_id: str
+    group_key: Hashable
+    first_seen: float
+    last_seen: float
+    payload: Any = None
+    duplicates: int = 0
+    rate_limited: int = 0
+    events: int = 1
+
+
+@dataclass
+class SuppressionDecision:
+    action: str
+    alert: Optional[OpenAlert]
+
+    @property
+    def emit(self) -> bool:
+        return self.action == EMIT
+
+
+class _TokenBucket:
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+@dataclass
+class _RuleState:
+    bucket: _TokenBucket
+    last_alert: Optional[OpenAlert] = None
+    emitted: int = 0
+    duplicates: int = 0
+    rate_limited: int = 0
+
+
+class AlertSuppressor:
+    """
+    Decides whether a rule firing becomes a new alert
+
+    A firing for a (rule_id, group key) that already produced an alert within
+    `dedup_window` seconds is a duplicate. Otherwise the rule's token bucket
+    (max_alerts_per_rule_per_hour, refilled continuously) decides whether a
+    new alert may be created. Both checks are dictionary lookups. Open alerts
+    are kept in creation order and dropped once their window has passed, and
+    at most `max_open_alerts` are retained.
+
+    Times are event times in epoch seconds when given, so replays and live
+    traffic suppress identically.
+    """
+
+    def __init__(self, dedup_window: float = DEFAULT_DEDUP_WINDOW,
+                 max_alerts_per_rule_per_hour: Optional[int] = DEFAULT_MAX_ALERTS_PER_RULE_PER_HOUR,
+                 max_open_alerts: int = DEFAULT_MAX_OPEN_ALERTS):
+        self.dedup_window = dedup_window
+        self.max_alerts_per_rule_per_hour = max_alerts_per_rule_per_hour
+        self.max_open_alerts = max_open_alerts
+
+        self._open: 'OrderedDict[Tuple[str, Hashable], OpenAlert]' = OrderedDict()
+        self._rules: Dict[str, _RuleState] = {}
+        self._updated: Dict[Tuple[str, Hashable], OpenAlert] = {}  # subset of _open
+
+    @classmethod
+    def from_engine_config(cls, engine_config: Dict[str, Any]) -> 'AlertSuppressor':
+        """Build from the `alerting` block of engine_config in the rules file"""
+        alerting = engine_config.get('alerting') or {}
+        return cls(
+            dedup_window=parse_duration(alerting.get('alert_deduplication_window', DEFAULT_DEDUP_WINDOW)),
+            max_alerts_per_rule_per_hour=alerting.get('max_alerts_per_rule_per_hour',
+                                                      DEFAULT_MAX_ALERTS_PER_RULE_PER_HOUR)
+        )
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def submit(self, rule_id: str, group_key: Hashable, timestamp: Optional[float] = None,
+               payload: Any = None, events: int = 1) -> SuppressionDecision:
+        """
+        Register a rule firing
+
+        Args:
+            rule_id: Rule that fired
+            group_key: Aggregation group (see group_key_of) or any hashable key
+            timestamp: Firing time in epoch seconds (default: now)
+            payload: Alert data kept on the open alert when emitted
+            events: Events covered by this firing
+
+        Returns:
+            SuppressionDecision: EMIT with the new OpenAlert, DUPLICATE with the
+            alert it was rolled into, or RATE_LIMITED with the rule's latest
+            alert (None if the rule has none open)
+        """
+        now = time.time() if timestamp is None else timestamp
+        self.expire(now)
+        rule = self._rule(rule_id, now)
+
+        key = (rule_id, group_key)
+        alert = self._open.get(key)
+        if alert is not None:
+            alert.duplicates += 1
+            alert.events += events
+            alert.last_seen = max(alert.last_seen, now)
+            rule.duplicates += 1
+            self._updated[key] = alert
+            return SuppressionDecision(DUPLICATE, alert)
+
+        if not rule.bucket.take(now):
+            rule.rate_limited += 1
+            latest = rule.last_alert
+            if latest is not None and self._open.get((rule_id, latest.group_key)) is latest:
+                latest.rate_limited += 1
+                self._updated[(rule_id, latest.group_key)] = latest
+            else:
+                latest = None
+            return SuppressionDecision(RATE_LIMITED, latest)
+
+        alert = OpenAlert(rule_id, group_key, first_seen=now, last_seen=now, payload=payload, events=events)
+        self._open[key] = alert
+        rule.last_alert = alert
+        rule.emitted += 1
+        while len(self._open) > self.max_open_alerts:
+            self._updated.pop(self._open.popitem(last=False)[0], None)
+        return SuppressionDecision(EMIT, alert)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Close alerts whose deduplication window has passed; returns how many"""
+        now = time.time() if now is None else now
+        cutoff = now - self.dedup_window
+        expired = 0
+        while self._open:
+            alert = next(iter(self._open.values()))
+            if alert.first_seen > cutoff:
+                break
+            self._updated.pop(self._open.popitem(last=False)[0], None)
+            expired += 1
+        return expired
+
+    def drain_updates(self) -> List[OpenAlert]:
+        """
+        Alerts whose roll-up counters changed since the last call
+
+        Lets the caller write counter updates to the alert store in batches
+        instead of once per suppressed firing. Only open alerts are tracked,
+        so updates to an alert that expires or is evicted before the next
+        call are dropped with it.
+        """
+        updated = list(self._updated.values())
+        self._updated.clear()
+        return updated
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'open_alerts': len(self._open),
+            'rules': {
+                rule_id: {
+                    'emitted': rule.emitted,
+                    'duplicates': rule.duplicates,
+                    'rate_limited': rule.rate_limited,
+                    'tokens': rule.bucket.tokens
+                }
+                for rule_id, rule in self._rules.items()
+            }
+        }
+
+    def export_state(self) -> Dict[str, Any]:
+        """
+        Open alerts and per-rule counters as plain data, for snapshots
+
+        Payloads are included as-is and should be plain data (dicts, lists,
+        strings, numbers) for the snapshot to be encodable.
+        """
+        return {
+            'open': [(alert.rule_id, alert.group_key, alert.first_seen, alert.last_seen, alert.payload,
+                      alert.duplicates, alert.rate_limited, alert.events)
+                     for alert in self._open.values()],
+            'rules': {
+                rule_id: (rule.bucket.tokens, rule.bucket.updated, rule.emitted, rule.duplicates,
+                          rule.rate_limited, rule.last_alert.group_key if rule.last_alert else None)
+                for rule_id, rule in self._rules.items()
+            }
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Replace open alerts and rule counters with export_state() output"""
+        self._open.clear()
+        self._rules.clear()
+        self._updated.clear()
+        for rule_id, group_key, *fields in state.get('open', ()):
+            self._open[(rule_id, group_key)] = OpenAlert(rule_id, group_key, *fields)
+        for rule_id, (tokens, updated, emitted, duplicates, rate_limited, last_key) in state.get('rules', {}).items():
+            rule = self._rule(rule_id, updated)
+            rule.bucket.tokens = min(tokens, rule.bucket.capacity)
+            rule.emitted, rule.duplicates, rule.rate_limited = emitted, duplicates, rate_limited
+            rule.last_alert = self._open.get((rule_id, last_key)) if last_key is not None else None
+
+    def _rule(self, rule_id: str, now: float) -> _RuleState:
+        rule = self._rules.get(rule_id)
+        if rule is None:
+            limit = self.max_alerts_per_rule_per_hour
+            capacity = float('inf') if limit is None else float(limit)
+            rate = float('inf') if limit is None else limit / 3600.0
+            rule = self._rules[rule_id] = _RuleState(_TokenBucket(capacity, rate, now))
+        return rule
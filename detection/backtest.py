@@ -0,0 +1,376 @@
+# PyGuardian v3 - Rule Backtesting
+# Replays stored flows through a compiled rule and its windowed aggregation
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from detection.aggregation_store import AggregationSpec, WindowedAggregator, event_timestamp
+from detection.batch_evaluator import (
+    CATEGORICAL, NUMERIC, OBJECT, TAGS, BatchRuleEvaluator, Column, FlowColumns, numeric_column
+)
+from detection.rule_compiler import CompiledRule, compile_rule
+
+COLUMNAR_SUFFIX = '.npz'
+TAGS_SUFFIX = '#tags'
+
+DEFAULT_SHARD_BYTES = 64 * 2**20
+DEFAULT_SAMPLE_ALERTS = 10
+
+# Archive that API-submitted backtests may read from
+DEFAULT_FLOW_ARCHIVE = Path(os.environ.get('PYGUARDIAN_FLOW_ARCHIVE', 'data/flows'))
+# Most worker processes an API-submitted backtest may use
+MAX_API_WORKERS = int(os.environ.get('PYGUARDIAN_BACKTEST_MAX_WORKERS', os.cpu_count() or 1))
+
+PathLike = Union[str, Path]
+
+# (timestamp, event_id, group key, metric field value) of a matched event
+_Row = Tuple[float, Optional[str], Tuple[Any, ...], Any]
+
+
+@dataclass
+class BacktestShard:
+    """A time-contiguous slice of one input file: byte range (JSON lines) or all rows (columnar)"""
+    path: str
+    start: int
+    stop: int
+    columnar: bool
+
+
+@dataclass
+class _ShardScan:
+    events_scanned: int = 0
+    invalid_records: int = 0
+    rows: List[_Row] = field(default_factory=list)
+
+
+@dataclass
+class BacktestResult:
+    rule_id: str
+    events_scanned: int
+    events_matched: int
+    invalid_records: int
+    alerts: int
+    sample_alerts: List[Dict[str, Any]]
+    elapsed_seconds: float
+    events_per_second: float
+    workers: int
+    shards: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def plan_shards(paths: Sequence[PathLike], shard_bytes: int = DEFAULT_SHARD_BYTES) -> List[BacktestShard]:
+    """
+    Split input files into shards, in path order
+
+    Files are expected to be time ordered (e.g. one file per hour), so each
+    shard covers a contiguous time range. A columnar file is a single shard:
+    its columns are zip members that are read whole, so splitting it would
+    make every shard read the entire file.
+    """
+    shards = []
+    for path in sorted(str(path) for path in paths):
+        if path.endswith(COLUMNAR_SUFFIX):
+            rows = _npz_rows(path)
+            if rows:
+                shards.append(BacktestShard(path, 0, rows, True))
+            continue
+        size = os.path.getsize(path)
+        for start in range(0, size, shard_bytes):
+            shards.append(BacktestShard(path, start, min(size, start + shard_bytes), False))
+    return shards
+
+
+def _npz_rows(path: str) -> int:
+    """Row count of a columnar file, from the header of its timestamp column"""
+    with zipfile.ZipFile(path) as archive, archive.open('timestamp.npy') as member:
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            shape, _, _ = np.lib.format.read_array_header_1_0(member)
+        else:
+            shape, _, _ = np.lib.format.read_array_header_2_0(member)
+    return shape[0]
+
+
+def resolve_archive_paths(patterns: Sequence[str], root: PathLike = DEFAULT_FLOW_ARCHIVE) -> List[Path]:
+    """
+    Expand glob patterns relative to the flow archive
+
+    Raises:
+        ValueError: if a pattern reaches outside the archive or matches nothing
+    """
+    root = Path(root).resolve()
+    paths = []
+    for pattern in patterns:
+        if Path(pattern).is_absolute():
+            raise ValueError(f"Backtest paths must be relative to the flow archive: {pattern}")
+        matched = sorted(root.glob(pattern))
+        if not matched:
+            raise ValueError(f"No flow files match {pattern!r}")
+        for path in matched:
+            resolved = path.resolve()
+            if root not in resolved.parents:
+                raise ValueError(f"Backtest path escapes the flow archive: {pattern}")
+            paths.append(resolved)
+    return paths
+
+
+def _aggregator(rule: CompiledRule) -> Optional[WindowedAggregator]:
+    return WindowedAggregator(AggregationSpec.from_rule(rule.aggregation)) if rule.aggregation else None
+
+
+def _scan_events(rule: CompiledRule, events: Iterable[Dict[str, Any]], scan: _ShardScan) -> None:
+    aggregator = _aggregator(rule)
+    matches = rule.matches
+    rows = scan.rows
+    for event in events:
+        scan.events_scanned += 1
+        if not matches(event):
+            continue
+        if aggregator is None:
+            key, value = (), None
+        else:
+            key, value = aggregator.group_key(event), aggregator.metric_value(event)
+        try:
+            timestamp = event_timestamp(event)
+        except (TypeError, ValueError):
+            scan.invalid_records += 1
+            continue
+        rows.append((timestamp, event.get('event_id'), key, value))
+
+
+def _read_json_lines(shard: BacktestShard, scan: _ShardScan) -> Iterable[Dict[str, Any]]:
+    """Events of the lines that start inside the shard's byte range"""
+    decode = json.JSONDecoder().decode
+    with open(shard.path, 'rb') as handle:
+        position = shard.start
+        if position:
+            handle.seek(position - 1)
+            position += len(handle.readline()) - 1  # finish the line owned by the previous shard
+        for line in handle:
+            if position >= shard.stop:
+                break
+            position += len(line)
+            if line.isspace():
+                continue
+            try:
+                event = decode(line.decode('utf-8'))
+            except ValueError:  # includes UnicodeDecodeError
+                scan.invalid_records += 1
+                continue
+            if isinstance(event, dict):
+                yield event
+            else:
+                scan.invalid_records += 1
+
+
+def _npz_column(data: Any, path: str, size: int) -> Column:
+    if path not in data.files:
+        return numeric_column(np.full(size, np.nan))
+
+    values = data[path]
+    if path + TAGS_SUFFIX in data.files:
+        vocabulary = {tag: bit for bit, tag in enumerate(data[path + TAGS_SUFFIX].tolist())}
+        return Column(TAGS, values.astype(np.uint64), vocabulary=vocabulary)
+
+    if values.dtype.kind == 'U':
+        labels, codes = np.unique(values, return_inverse=True)
+        codes = codes.astype(np.int32)
+        vocabulary = {label: code for code, label in enumerate(labels.tolist())}
+        missing = vocabulary.pop('', None)
+        if missing is not None:
+            codes[codes == missing] = -1
+        return Column(CATEGORICAL, codes, vocabulary=vocabulary)
+
+    return numeric_column(values)
+
+
+def _decode(column: Column, positions: np.ndarray) -> List[Any]:
+    """Python values of a column at the given positions, as they appear in JSON events"""
+    if column.kind == CATEGORICAL:
+        labels = {code: label for label, code in column.vocabulary.items()}
+        labels[-1] = None
+        return [labels[code] for code in column.values[positions].tolist()]
+
+    if column.kind == NUMERIC:
+        values = column.values[positions].tolist()
+        valid = column.valid[positions].tolist()
+        return [(int(value) if value.is_integer() else value) if present else None
+                for value, present in zip(values, valid)]
+
+    raise ValueError(f"Cannot decode a {column.kind} column")
+
+
+def _scan_columnar(rule: CompiledRule, shard: BacktestShard, scan: _ShardScan) -> None:
+    evaluator = BatchRuleEvaluator([rule])
+    aggregator = _aggregator(rule)
+    key_paths = list(aggregator.spec.group_by) if aggregator is not None else []
+    value_path = aggregator.spec.field if aggregator is not None else None
+    paths = set(evaluator.paths) | set(key_paths) | ({value_path} if value_path else set())
+
+    with np.load(shard.path, allow_pickle=False) as data:
+        columns = {path: _npz_column(data, path, shard.stop) for path in paths}
+        timestamps = data['timestamp']
+        event_ids = data['event_id'] if 'event_id' in data.files else None
+
+    batch = FlowColumns.from_columns(columns, size=len(timestamps))
+    positions = np.flatnonzero(evaluator.rule_mask(rule, batch))
+    scan.events_scanned += batch.size
+
+    keys = list(zip(*(_decode(columns[path], positions) for path in key_paths))) or [()] * len(positions)
+    values = _decode(columns[value_path], positions) if value_path else [None] * len(positions)
+    ids = event_ids[positions].tolist() if event_ids is not None else [None] * len(positions)
+    scan.rows.extend(zip(timestamps[positions].tolist(), ids, keys, values))
+
+
+def _scan_shard(definition: Dict[str, Any], shard: BacktestShard) -> _ShardScan:
+    rule = compile_rule(definition)
+    scan = _ShardScan()
+    if shard.columnar:
+        _scan_columnar(rule, shard, scan)
+    else:
+        _scan_events(rule, _read_json_lines(shard, scan), scan)
+    return scan
+
+
+def _replay(rule: CompiledRule, rows: List[_Row], sample_size: int) -> Tuple[int, List[Dict[str, Any]]]:
+    """Run matched events through the rule's window in time order; returns (alerts, samples)"""
+    rows.sort(key=itemgetter(0))
+    aggregator = _aggregator(rule)
+    active = set()
+    alerts = 0
+    samples = []
+
+    for timestamp, event_id, key, value in rows:
+        if aggregator is None:
+            result = None
+        else:
+            result = aggregator.add_value(key, value, timestamp)
+            if result is None:
+                active.discard(key)
+                continue
+            if key in active:
+                continue  # still above threshold; the open alert covers it
+            active.add(key)
+
+        alerts += 1
+        if len(samples) < sample_size:
+            sample = {
+                'rule_id': rule.rule_id,
+                'rule_name': rule.name,
+                'severity': rule.severity,
+                'timestamp': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+                'event_id': event_id
+            }
+            if result is not None:
+                sample.update(group=result.group, metric=result.metric, value=result.value,
+                              threshold=result.threshold, event_count=result.event_count)
+            samples.append(sample)
+    return alerts, samples
+
+
+def _result(rule: CompiledRule, scans: List[_ShardScan], started: float, workers: int,
+            shards: int, sample_size: int) -> BacktestResult:
+    rows = [row for scan in scans for row in scan.rows]
+    alerts, samples = _replay(rule, rows, sample_size)
+    elapsed = time.perf_counter() - started
+    scanned = sum(scan.events_scanned for scan in scans)
+    return BacktestResult(
+        rule_id=rule.rule_id,
+        events_scanned=scanned,
+        events_matched=len(rows),
+        invalid_records=sum(scan.invalid_records for scan in scans),
+        alerts=alerts,
+        sample_alerts=samples,
+        elapsed_seconds=elapsed,
+        events_per_second=scanned / elapsed if elapsed else 0.0,
+        workers=workers,
+        shards=shards
+    )
+
+
+def backtest_rule(definition: Dict[str, Any], paths: Sequence[PathLike],
+                  max_workers: Optional[int] = None, shard_bytes: int = DEFAULT_SHARD_BYTES,
+                  sample_alerts: int = DEFAULT_SAMPLE_ALERTS) -> BacktestResult:
+    """
+    Replay stored flows through a rule
+
+    Shards are scanned in parallel: each worker parses its slice and keeps
+    only the events matching the rule's conditions. The matches are then
+    merged in time order and run through the rule's windowed aggregation,
+    so thresholds spanning shard boundaries are counted exactly.
+
+    Args:
+        definition: Rule definition as in example_rules.yaml
+        paths: JSON-lines files of enriched events, or columnar .npz files
+               written by `write_columnar`
+        max_workers: Worker processes (default: CPU count); 1 runs inline
+        shard_bytes: JSON-lines shard size; columnar files are one shard each
+        sample_alerts: Number of alerts to return in full
+
+    Returns:
+        BacktestResult with match and alert counts, sample alerts and throughput
+    """
+    started = time.perf_counter()
+    rule = compile_rule(definition)
+    shards = plan_shards(paths, shard_bytes)
+    workers = min(max_workers or os.cpu_count() or 1, max(1, len(shards)))
+
+    if workers == 1:
+        scans = [_scan_shard(definition, shard) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            scans = list(executor.map(_scan_shard, [definition] * len(shards), shards))
+
+    return _result(rule, scans, started, workers, len(shards), sample_alerts)
+
+
+def backtest_events(definition: Dict[str, Any], events: Iterable[Dict[str, Any]],
+                    sample_alerts: int = DEFAULT_SAMPLE_ALERTS) -> BacktestResult:
+    """Backtest a rule against in-memory events, in the calling process"""
+    started = time.perf_counter()
+    rule = compile_rule(definition)
+    scan = _ShardScan()
+    _scan_events(rule, events, scan)
+    return _result(rule, [scan], started, 1, 1, sample_alerts)
+
+
+def write_columnar(path: PathLike, events: Sequence[Dict[str, Any]], paths: Iterable[str]) -> None:
+    """
+    Write events as a columnar .npz file for backtesting
+
+    Numeric fields are stored as float64 with NaN for missing values, string
+    fields as unicode arrays with '' for missing, and tag lists as uint64
+    bitmasks plus a `<field>#tags` vocabulary. `timestamp` (epoch seconds)
+    and `event_id` are always included.
+    """
+    batch = FlowColumns(events, paths)
+    arrays: Dict[str, np.ndarray] = {
+        'timestamp': np.array([event_timestamp(event) for event in events], dtype=np.float64),
+        'event_id': np.array([event.get('event_id') or '' for event in events], dtype=str),
+    }
+    for field_path, column in batch.columns.items():
+        if column.kind == NUMERIC:
+            arrays[field_path] = np.where(column.valid, column.values, np.nan)
+        elif column.kind == CATEGORICAL:
+            labels = np.array(list(column.vocabulary) + [''], dtype=str)
+            arrays[field_path] = labels[column.values]  # code -1 picks the trailing ''
+        elif column.kind == TAGS:
+            arrays[field_path] = column.values
+            arrays[field_path + TAGS_SUFFIX] = np.array(list(column.vocabulary), dtype=str)
+        elif column.kind == OBJECT:
+            raise ValueError(f"Field {field_path!r} has mixed value types and cannot be stored as a column")
+    np.savez(path, **arrays)
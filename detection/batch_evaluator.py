@@ -0,0 +1,363 @@
+# PyGuardian v3 - Batch Rule Evaluator
+# Evaluates compiled rules over columnar flow batches as NumPy boolean masks
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from itertools import repeat
+from operator import ge, gt, le, lt
+from time import thread_time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from detection.rule_compiler import CompiledCondition, CompiledRule
+
+if TYPE_CHECKING:
+    from detection.rule_costs import RuleCostTracker
+
+# Column kinds
+NUMERIC = 'numeric'
+CATEGORICAL = 'categorical'
+TAGS = 'tags'
+OBJECT = 'object'
+
+# Tag vocabularies up to this size are packed into uint64 bitmasks
+MAX_TAG_BITS = 64
+
+_COMPARISONS = {
+    'less_than': lt,
+    'less_than_or_equal': le,
+    'greater_than': gt,
+    'greater_than_or_equal': ge,
+}
+
+Mask = np.ndarray
+_EMPTY: Dict[str, Any] = {}
+MaskFunction = Callable[['FlowColumns'], Mask]
+
+
+@dataclass
+class Column:
+    """
+    One event field as an array
+
+    numeric: `values` is float64 and `valid` marks present values.
+    categorical: `values` holds int32 codes into `vocabulary`, -1 if missing.
+    tags: `values` holds uint64 bitmasks over `vocabulary` (list-valued fields).
+    object: `values` is the raw Python values; conditions on it fall back to
+    the compiled per-event predicate.
+    """
+    kind: str
+    values: Any
+    valid: Optional[np.ndarray] = None
+    vocabulary: Dict[Any, int] = field(default_factory=dict)
+
+
+_NUMERIC_TYPES = frozenset({int, float, bool, type(None)})
+_STRING_TYPES = frozenset({str, type(None)})
+_TAG_TYPES = frozenset({list, tuple, type(None)})
+
+# float64 holds integers exactly up to 2**53
+_MAX_EXACT_INTEGER = 2.0 ** 53
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+
+def numeric_column(values: Any) -> Column:
+    """Numeric column from a sequence or array; None and NaN are missing"""
+    array = np.asarray(values, dtype=np.float64)
+    return Column(NUMERIC, array, ~np.isnan(array))
+
+
+def categorical_column(values: Sequence[Optional[str]]) -> Column:
+    """Code column from strings; None is missing"""
+    codes: Dict[Any, int] = {value: code for code, value in
+                             enumerate(value for value in dict.fromkeys(values) if value is not None)}
+    vocabulary = dict(codes)
+    codes[None] = -1
+    return Column(CATEGORICAL, np.fromiter(map(codes.__getitem__, values), dtype=np.int32, count=len(values)),
+                  vocabulary=vocabulary)
+
+
+def tags_column(values: Sequence[Optional[Sequence[str]]]) -> Optional[Column]:
+    """Bitmask column from tag lists; None if there are more than MAX_TAG_BITS distinct tags"""
+    vocabulary: Dict[Any, int] = {}
+    cache: Dict[Tuple[Any, ...], int] = {(): 0}
+    masks = []
+    for tags in values:
+        key = tuple(tags) if tags else ()
+        mask = cache.get(key)
+        if mask is None:
+            mask = 0
+            for tag in key:
+                mask |= 1 << vocabulary.setdefault(tag, len(vocabulary))
+            cache[key] = mask
+        masks.append(mask)
+    if len(vocabulary) > MAX_TAG_BITS:
+        return None
+    return Column(TAGS, np.array(masks, dtype=np.uint64), vocabulary=vocabulary)
+
+
+def _build_column(raw: List[Any]) -> Column:
+    types = set(map(type, raw))
+
+    if types <= _NUMERIC_TYPES:
+        column = numeric_column(raw)
+        if not column.valid.any() or np.abs(column.values[column.valid]).max() <= _MAX_EXACT_INTEGER:
+            return column
+
+    elif types <= _STRING_TYPES:
+        return categorical_column(raw)
+
+    elif types <= _TAG_TYPES:
+        try:
+            column = tags_column(raw)
+        except TypeError:  # unhashable tag
+            column = None
+        if column is not None:
+            return column
+
+    return Column(OBJECT, raw)
+
+
+class FlowColumns:
+    """
+    Columnar view of a batch of enriched event dicts
+
+    Only the field paths the rules reference are extracted, and each dotted
+    prefix is walked once per batch, so "enrichment.threat_intel..." fields
+    share the work of resolving their parents. Producers that already hold
+    columns (decoders, ingest) can skip the dicts with `from_columns`.
+    """
+
+    def __init__(self, events: Optional[Sequence[Dict[str, Any]]], paths: Iterable[str],
+                 columns: Optional[Dict[str, Column]] = None, size: Optional[int] = None):
+        self.events = events
+        self.size = len(events) if events is not None else size
+        self._raw: Dict[str, List[Any]] = {}
+        self.columns: Dict[str, Column] = dict(columns or {})
+        for path in sorted(set(paths) - set(self.columns)):
+            if events is None:
+                raise ValueError(f"No column for {path!r} and no events to extract it from")
+            self.columns[path] = _build_column(self._values(path))
+        self._raw.clear()
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Column], size: int,
+                     events: Optional[Sequence[Dict[str, Any]]] = None) -> 'FlowColumns':
+        """Wrap prebuilt columns; `events` is only needed for object-column fallbacks"""
+        return cls(events, (), columns=columns, size=size)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _values(self, path: str) -> List[Any]:
+        values = self._raw.get(path)
+        if values is None:
+            parent, _, key = path.rpartition('.')
+            objects = self._objects(parent) if parent else self.events
+            try:
+                values = list(map(dict.get, objects, repeat(key)))
+            except TypeError:  # not every event is a dict
+                values = [value.get(key) if value else None for value in objects]
+            self._raw[path] = values
+        return values
+
+    def _objects(self, path: str) -> List[Dict[str, Any]]:
+        """Values of an intermediate path, with {} in place of missing objects"""
+        key = '\0' + path
+        objects = self._raw.get(key)
+        if objects is None:
+            objects = self._values(path)
+            if set(map(type, objects)) != {dict}:
+                objects = [value if type(value) is dict else _EMPTY for value in objects]
+            self._raw[key] = objects
+        return objects
+
+
+def _fallback(condition: CompiledCondition) -> MaskFunction:
+    predicate = condition.predicate
+
+    def per_event(batch):
+        if batch.events is None:
+            raise ValueError(f"Condition on {condition.field!r} needs the event dicts")
+        return np.fromiter(map(predicate, batch.events), dtype=bool, count=batch.size)
+    return per_event
+
+
+def _numeric_mask(condition: CompiledCondition) -> MaskFunction:
+    operator, expected, path = condition.operator, condition.value, condition.field
+
+    if operator in ('equals', 'not_equals'):
+        negate = operator == 'not_equals'
+        if not _is_number(expected):
+            return lambda batch: np.full(batch.size, negate)
+
+        def equality(batch):
+            column = batch.columns[path]
+            matched = column.valid & (column.values == expected)
+            return ~matched if negate else matched
+        return equality
+
+    if operator in ('in', 'not_in'):
+        negate = operator == 'not_in'
+        numbers = np.array([value for value in expected if _is_number(value)], dtype=np.float64)
+
+        def membership(batch):
+            column = batch.columns[path]
+            matched = column.valid & np.isin(column.values, numbers)
+            return ~matched if negate else matched
+        return membership
+
+    compare = _COMPARISONS.get(operator)
+    if compare is not None:
+        if not _is_number(expected):
+            return lambda batch: np.zeros(batch.size, dtype=bool)
+
+        def comparison(batch):
+            column = batch.columns[path]
+            return column.valid & compare(column.values, expected)
+        return comparison
+
+    return _fallback(condition)
+
+
+def _categorical_mask(condition: CompiledCondition) -> MaskFunction:
+    operator, expected, path = condition.operator, condition.value, condition.field
+
+    if operator in ('equals', 'not_equals'):
+        negate = operator == 'not_equals'
+
+        def equality(batch):
+            column = batch.columns[path]
+            code = column.vocabulary.get(expected) if isinstance(expected, str) else None
+            if code is None:
+                return np.full(batch.size, negate)
+            matched = column.values == code
+            return ~matched if negate else matched
+        return equality
+
+    if operator in ('in', 'not_in'):
+        negate = operator == 'not_in'
+        strings = [value for value in expected if isinstance(value, str)]
+
+        def membership(batch):
+            column = batch.columns[path]
+            codes = [column.vocabulary[value] for value in strings if value in column.vocabulary]
+            matched = np.isin(column.values, codes)
+            return ~matched if negate else matched
+        return membership
+
+    return _fallback(condition)
+
+
+def _tags_mask(condition: CompiledCondition) -> MaskFunction:
+    if condition.operator != 'contains_any':
+        return _fallback(condition)
+    expected, path = condition.value, condition.field
+
+    def contains_any(batch):
+        column = batch.columns[path]
+        wanted = 0
+        for value in expected:
+            bit = column.vocabulary.get(value)
+            if bit is not None:
+                wanted |= 1 << bit
+        return (column.values & np.uint64(wanted)) != 0
+    return contains_any
+
+
+def _matches_missing(condition: CompiledCondition) -> bool:
+    """Conditions that can be true for a missing (None) field value"""
+    if condition.operator in ('equals', 'not_equals'):
+        return condition.value is None
+    if condition.operator in ('in', 'not_in'):
+        return any(value is None for value in condition.value)
+    return False
+
+
+_MASK_BUILDERS = {
+    NUMERIC: _numeric_mask,
+    CATEGORICAL: _categorical_mask,
+    TAGS: _tags_mask,
+}
+
+
+class BatchRuleEvaluator:
+    """
+    Evaluates rules over a whole batch at once
+
+    Each batch is converted to columns once for all rules; each condition then
+    becomes one NumPy comparison and a rule's match mask is the AND of its
+    condition masks. Conditions whose column could not be typed (mixed value
+    types, more than MAX_TAG_BITS tags) fall back to the compiled per-event
+    predicate for that condition only, so results always equal
+    `rule.matches(event)`.
+
+    With a RuleCostTracker, each rule's CPU time, events and matches are
+    accounted per batch, and rules the tracker throttled or disabled get an
+    all-false mask without being evaluated.
+    """
+
+    def __init__(self, rules: Iterable[CompiledRule], tracker: Optional['RuleCostTracker'] = None):
+        self.rules: List[CompiledRule] = list(rules)
+        self.tracker = tracker
+        self.paths = sorted({condition.field for rule in self.rules for condition in rule.conditions})
+        self._condition_masks: Dict[Tuple[int, str], MaskFunction] = {}
+
+    def columns(self, events: Sequence[Dict[str, Any]]) -> FlowColumns:
+        return FlowColumns(events, self.paths)
+
+    def evaluate_columns(self, batch: FlowColumns) -> Dict[str, Mask]:
+        """Evaluate every rule over an already columnar batch"""
+        tracker = self.tracker
+        if tracker is None:
+            return {rule.rule_id: self.rule_mask(rule, batch) for rule in self.rules}
+
+        masks = {}
+        for rule in self.rules:
+            if not tracker.allowed(rule.rule_id):
+                tracker.skip(rule.rule_id, batch.size)
+                masks[rule.rule_id] = np.zeros(batch.size, dtype=bool)
+                continue
+            started = thread_time()
+            mask = masks[rule.rule_id] = self.rule_mask(rule, batch)
+            tracker.record(rule.rule_id, thread_time() - started, batch.size, int(np.count_nonzero(mask)))
+        return masks
+
+    def _condition_mask(self, condition: CompiledCondition, batch: FlowColumns) -> Mask:
+        column = batch.columns[condition.field]
+        cache_key = (id(condition), column.kind)
+        mask_function = self._condition_masks.get(cache_key)
+        if mask_function is None:
+            builder = _MASK_BUILDERS.get(column.kind)
+            if builder is None or _matches_missing(condition):
+                mask_function = _fallback(condition)
+            else:
+                mask_function = builder(condition)
+            self._condition_masks[cache_key] = mask_function
+        return mask_function(batch)
+
+    def rule_mask(self, rule: CompiledRule, batch: FlowColumns) -> Mask:
+        mask = np.ones(batch.size, dtype=bool)
+        for condition in rule.conditions:
+            mask &= self._condition_mask(condition, batch)
+            if not mask.any():
+                break
+        return mask
+
+    def evaluate(self, events: Sequence[Dict[str, Any]]) -> Dict[str, Mask]:
+        """
+        Evaluate every rule over a batch of enriched event dicts
+
+        Returns:
+            Mapping of rule id to a boolean match mask aligned with `events`
+        """
+        return self.evaluate_columns(self.columns(events))
+
+    def matches(self, events: Sequence[Dict[str, Any]]) -> Dict[str, List[int]]:
+        """Positions of matching events per rule"""
+        return {rule_id: np.flatnonzero(mask).tolist() for rule_id, mask in self.evaluate(events).items()}
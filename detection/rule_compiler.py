@@ -0,0 +1,267 @@
+# PyGuardian v3 - Rule Compiler
+# Compiles YAML rule conditions into specialized predicates over enriched events
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from operator import ge, gt, le, lt
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent.parent / "rules" / "example_rules.yaml"
+
+Predicate = Callable[[Dict[str, Any]], bool]
+Accessor = Callable[[Dict[str, Any]], Any]
+
+# Rough share of events each operator lets through, used to order conditions
+# when no sample events are available
+_OPERATOR_SELECTIVITY = {
+    'equals': 0.05,
+    'in': 0.05,  # per listed value
+    'contains_any': 0.1,
+    'less_than': 0.3,
+    'less_than_or_equal': 0.3,
+    'greater_than': 0.3,
+    'greater_than_or_equal': 0.3,
+    'not_in': 0.9,
+    'not_equals': 0.9,
+}
+
+_COMPARISONS = {
+    'less_than': lt,
+    'less_than_or_equal': le,
+    'greater_than': gt,
+    'greater_than_or_equal': ge,
+}
+
+SUPPORTED_OPERATORS = frozenset(_OPERATOR_SELECTIVITY)
+
+
+class RuleCompilationError(ValueError):
+    """Raised when a rule definition cannot be compiled"""
+
+
+def make_accessor(path: str) -> Accessor:
+    """
+    Build a getter for a dotted field path, resolved once
+
+    Missing or null intermediate objects yield None instead of raising.
+    """
+    parts = tuple(path.split('.'))
+
+    if len(parts) == 1:
+        key = parts[0]
+
+        def get_field(event):
+            return event.get(key)
+    elif len(parts) == 2:
+        outer, inner = parts
+
+        def get_field(event):
+            value = event.get(outer)
+            return value.get(inner) if value else None
+    else:
+        def get_field(event):
+            value = event
+            for part in parts:
+                if not value:
+                    return None
+                value = value.get(part)
+            return value
+
+    get_field.__qualname__ = f"get[{path}]"
+    return get_field
+
+
+def _freeze(values: Any) -> frozenset:
+    if not isinstance(values, (list, tuple, set, frozenset)):
+        raise RuleCompilationError(f"Expected a list of values, got {values!r}")
+    return frozenset(values)
+
+
+def _make_predicate(operator: str, get_field: Accessor, expected: Any) -> Predicate:
+    """Specialize one condition into a closure for its operator"""
+    if operator == 'equals':
+        return lambda event: get_field(event) == expected
+
+    if operator == 'not_equals':
+        return lambda event: get_field(event) != expected
+
+    if operator in ('in', 'not_in'):
+        values = _freeze(expected)
+        negate = operator == 'not_in'
+
+        def membership(event):
+            actual = get_field(event)
+            try:
+                return (actual in values) != negate
+            except TypeError:  # unhashable field value
+                return negate
+        return membership
+
+    if operator == 'contains_any':
+        values = _freeze(expected)
+
+        def contains_any(event):
+            actual = get_field(event)
+            if not actual:
+                return False
+            return not values.isdisjoint(actual)
+        return contains_any
+
+    compare = _COMPARISONS.get(operator)
+    if compare is not None:
+        def comparison(event):
+            actual = get_field(event)
+            if actual is None:
+                return False
+            try:
+                return compare(actual, expected)
+            except TypeError:  # e.g. comparing a string with a number
+                return False
+        return comparison
+
+    raise RuleCompilationError(f"Unsupported operator: {operator}")
+
+
+@dataclass
+class CompiledCondition:
+    field: str
+    operator: str
+    value: Any
+    predicate: Predicate
+    selectivity: float
+
+    def __call__(self, event: Dict[str, Any]) -> bool:
+        return self.predicate(event)
+
+
+@dataclass
+class CompiledRule:
+    """A rule whose conditions are compiled into a single predicate"""
+    rule_id: str
+    name: str
+    severity: str
+    enabled: bool
+    conditions: List[CompiledCondition]
+    matches: Predicate
+    aggregation: Dict[str, Any] = field(default_factory=dict)
+    mitre_attack: Dict[str, List[str]] = field(default_factory=dict)
+    actions: List[Dict[str, Any]] = field(default_factory=list)
+    definition: Dict[str, Any] = field(default_factory=dict)
+
+
+def compile_condition(condition: Dict[str, Any]) -> CompiledCondition:
+    try:
+        path = condition['field']
+        operator = condition['operator']
+        expected = condition['value']
+    except KeyError as error:
+        raise RuleCompilationError(f"Condition is missing {error.args[0]!r}: {condition}") from None
+
+    if operator not in SUPPORTED_OPERATORS:
+        raise RuleCompilationError(f"Unsupported operator: {operator}")
+
+    predicate = _make_predicate(operator, make_accessor(path), expected)
+
+    selectivity = _OPERATOR_SELECTIVITY[operator]
+    if operator == 'in':
+        selectivity = min(0.9, selectivity * max(1, len(expected)))
+
+    return CompiledCondition(
+        field=path,
+        operator=operator,
+        value=expected,
+        predicate=predicate,
+        selectivity=selectivity
+    )
+
+
+def _measure_selectivity(conditions: List[CompiledCondition],
+                         sample_events: Sequence[Dict[str, Any]]) -> None:
+    """Replace estimated selectivities with pass rates observed on sample events"""
+    for condition in conditions:
+        passed = sum(1 for event in sample_events if condition.predicate(event))
+        condition.selectivity = passed / len(sample_events)
+
+
+def _combine(predicates: Tuple[Predicate, ...]) -> Predicate:
+    """AND predicates together, most selective first, short-circuiting"""
+    if not predicates:
+        return lambda event: True
+    if len(predicates) == 1:
+        return predicates[0]
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda event: first(event) and second(event)
+    if len(predicates) == 3:
+        first, second, third = predicates
+        return lambda event: first(event) and second(event) and third(event)
+
+    def match_all(event):
+        for predicate in predicates:
+            if not predicate(event):
+                return False
+        return True
+    return match_all
+
+
+def compile_rule(rule: Dict[str, Any],
+                 sample_events: Optional[Sequence[Dict[str, Any]]] = None) -> CompiledRule:
+    """
+    Compile a rule definition from example_rules.yaml
+
+    Args:
+        rule: Rule definition with id, conditions, aggregation, actions, ...
+        sample_events: Optional representative events; when given, conditions
+                       are ordered by their observed pass rate instead of
+                       per-operator estimates
+
+    Returns:
+        CompiledRule whose `matches` evaluates all conditions on an event dict
+    """
+    if 'id' not in rule:
+        raise RuleCompilationError(f"Rule is missing 'id': {rule.get('name')}")
+
+    conditions = [compile_condition(condition) for condition in rule.get('conditions') or []]
+    if sample_events:
+        _measure_selectivity(conditions, sample_events)
+
+    # Cheapest rejection first: most selective, then shallowest field path
+    conditions.sort(key=lambda condition: (condition.selectivity, condition.field.count('.')))
+
+    return CompiledRule(
+        rule_id=rule['id'],
+        name=rule.get('name', rule['id']),
+        severity=rule.get('severity', 'medium'),
+        enabled=rule.get('enabled', True),
+        conditions=conditions,
+        matches=_combine(tuple(condition.predicate for condition in conditions)),
+        aggregation=rule.get('aggregation') or {},
+        mitre_attack=rule.get('mitre_attack') or {},
+        actions=rule.get('actions') or [],
+        definition=rule
+    )
+
+
+def compile_rules(rules: Iterable[Dict[str, Any]],
+                  sample_events: Optional[Sequence[Dict[str, Any]]] = None,
+                  include_disabled: bool = False) -> List[CompiledRule]:
+    compiled = [compile_rule(rule, sample_events) for rule in rules]
+    if include_disabled:
+        return compiled
+    return [rule for rule in compiled if rule.enabled]
+
+
+def load_rule_file(path: Path = DEFAULT_RULES_PATH) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Read rule definitions and engine_config from a YAML rules file
+
+    Returns:
+        (rules, engine_config)
+    """
+    import yaml
+
+    with open(path, encoding="utf-8") as handle:
+        document = yaml.safe_load(handle) or {}
+    return document.get('rules') or [], document.get('engine_config') or {}
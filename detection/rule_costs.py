@@ -0,0 +1,188 @@
+# PyGuardian v3 - Rule Cost Accounting
+# Per-rule CPU, match and state-memory accounting with budgets from engine_config.performance
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from detection.aggregation_store import AggregationStore
+from detection.units import parse_duration, parse_size
+
+ACTIVE = 'active'
+THROTTLED = 'throttled'
+DISABLED = 'disabled'
+
+DEFAULT_THROTTLE_SECONDS = 60.0
+DEFAULT_MAX_VIOLATIONS = 3
+DEFAULT_VIOLATION_DECAY_SECONDS = 3600.0
+DEFAULT_PER_RULE_STATE_BUDGET = '64MB'
+
+
+@dataclass
+class RuleBudget:
+    """
+    Limits applied to every rule
+
+    cpu_seconds_per_batch comes from `rule_evaluation_timeout` and
+    state_bytes from `per_rule_state_budget` (default
+    DEFAULT_PER_RULE_STATE_BUDGET), capped at `memory_limit`.
+    """
+    cpu_seconds_per_batch: Optional[float] = None
+    state_bytes: Optional[int] = None
+    throttle_seconds: float = DEFAULT_THROTTLE_SECONDS
+    max_violations: int = DEFAULT_MAX_VIOLATIONS
+    violation_decay_seconds: float = DEFAULT_VIOLATION_DECAY_SECONDS
+
+    @classmethod
+    def from_engine_config(cls, engine_config: Dict[str, Any]) -> 'RuleBudget':
+        performance = engine_config.get('performance') or {}
+        timeout = performance.get('rule_evaluation_timeout')
+        memory_limit = performance.get('memory_limit')
+        state_bytes = parse_size(performance.get('per_rule_state_budget', DEFAULT_PER_RULE_STATE_BUDGET))
+        if memory_limit is not None:
+            state_bytes = min(state_bytes, parse_size(memory_limit))
+        return cls(
+            cpu_seconds_per_batch=parse_duration(timeout) if timeout is not None else None,
+            state_bytes=state_bytes
+        )
+
+
+@dataclass
+class RuleCost:
+    rule_id: str
+    status: str = ACTIVE
+    batches: int = 0
+    events_evaluated: int = 0
+    events_skipped: int = 0
+    matches: int = 0
+    cpu_seconds: float = 0.0
+    max_batch_cpu_seconds: float = 0.0
+    state_bytes: int = 0
+    evicted_keys: int = 0
+    violations: int = 0
+    last_violation: Optional[str] = None
+    last_violation_at: Optional[float] = None
+    throttled_until: Optional[float] = None
+
+    @property
+    def match_rate(self) -> float:
+        return self.matches / self.events_evaluated if self.events_evaluated else 0.0
+
+    @property
+    def cpu_microseconds_per_event(self) -> float:
+        return self.cpu_seconds * 1e6 / self.events_evaluated if self.events_evaluated else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats = asdict(self)
+        stats.update(match_rate=self.match_rate, cpu_microseconds_per_event=self.cpu_microseconds_per_event)
+        return stats
+
+
+class RuleCostTracker:
+    """
+    Accounts evaluation cost per rule and throttles or disables rules over budget
+
+    A rule that exceeds a budget is throttled (skipped) for `throttle_seconds`;
+    after `max_violations` violations without a quiet `violation_decay_seconds`
+    in between it is disabled until `reset()` is called. Aggregation state is
+    kept while a rule is throttled.
+    """
+
+    def __init__(self, budget: Optional[RuleBudget] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.budget = budget or RuleBudget()
+        self.clock = clock
+        self.costs: Dict[str, RuleCost] = {}
+
+    @classmethod
+    def from_engine_config(cls, engine_config: Dict[str, Any]) -> 'RuleCostTracker':
+        return cls(RuleBudget.from_engine_config(engine_config))
+
+    def cost(self, rule_id: str) -> RuleCost:
+        cost = self.costs.get(rule_id)
+        if cost is None:
+            cost = self.costs[rule_id] = RuleCost(rule_id)
+        return cost
+
+    def allowed(self, rule_id: str) -> bool:
+        """Whether the rule may be evaluated now; ends expired throttles"""
+        cost = self.costs.get(rule_id)
+        if cost is None or cost.status == ACTIVE:
+            return True
+        if cost.status == THROTTLED and self.clock() >= cost.throttled_until:
+            cost.status = ACTIVE
+            cost.throttled_until = None
+            return True
+        return False
+
+    def record(self, rule_id: str, cpu_seconds: float, events: int, matches: int) -> None:
+        """Account one batch evaluation of a rule"""
+        cost = self.cost(rule_id)
+        cost.batches += 1
+        cost.events_evaluated += events
+        cost.matches += matches
+        cost.cpu_seconds += cpu_seconds
+        if cpu_seconds > cost.max_batch_cpu_seconds:
+            cost.max_batch_cpu_seconds = cpu_seconds
+
+        limit = self.budget.cpu_seconds_per_batch
+        if limit is not None and cpu_seconds > limit:
+            self._violation(cost, f"batch took {cpu_seconds:.3f}s CPU, budget {limit:.3f}s")
+
+    def skip(self, rule_id: str, events: int) -> None:
+        self.cost(rule_id).events_skipped += events
+
+    def update_state(self, store: AggregationStore) -> None:
+        """
+        Refresh aggregation-state memory per rule and check it against the budget
+
+        The store should be created with memory_limit_per_rule set to the
+        budget, so it evicts keys at the cap; a rule whose aggregator had to
+        evict since the last update counts as a violation.
+        """
+        limit = self.budget.state_bytes
+        for rule_id, aggregator in store.aggregators.items():
+            cost = self.cost(rule_id)
+            cost.state_bytes = aggregator.memory_bytes
+            evicted = aggregator.evicted_keys - cost.evicted_keys
+            cost.evicted_keys = aggregator.evicted_keys
+            if limit is None:
+                continue
+            if evicted > 0 or aggregator.memory_bytes > limit:
+                self._violation(cost, f"aggregation state {aggregator.memory_bytes} bytes "
+                                      f"({evicted} keys evicted), budget {limit} bytes")
+
+    def reset(self, rule_id: str) -> None:
+        """Re-enable a rule and clear its violations (counters are kept)"""
+        cost = self.cost(rule_id)
+        cost.status = ACTIVE
+        cost.violations = 0
+        cost.throttled_until = None
+
+    def forget(self, rule_ids: Iterable[str]) -> None:
+        """Drop accounting of removed or changed rules"""
+        for rule_id in rule_ids:
+            self.costs.pop(rule_id, None)
+
+    def stats(self, rule_id: Optional[str] = None) -> Dict[str, Any]:
+        if rule_id is not None:
+            cost = self.costs.get(rule_id)
+            return cost.to_dict() if cost is not None else RuleCost(rule_id).to_dict()
+        return {rule_id: cost.to_dict() for rule_id, cost in self.costs.items()}
+
+    def _violation(self, cost: RuleCost, reason: str) -> None:
+        now = self.clock()
+        if cost.last_violation_at is not None and now - cost.last_violation_at > self.budget.violation_decay_seconds:
+            cost.violations = 0
+        cost.violations += 1
+        cost.last_violation = reason
+        cost.last_violation_at = now
+
+        if cost.violations >= self.budget.max_violations:
+            cost.status = DISABLED
+            cost.throttled_until = None
+        elif cost.status != DISABLED:
+            cost.status = THROTTLED
+            cost.throttled_until = now + self.budget.throttle_seconds
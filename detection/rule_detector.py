@@ -0,0 +1,88 @@
+# PyGuardian v3 - Rule Detector
+# Runs the current rule set over event batches: match, aggregate and account per-rule cost
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from detection.aggregation_store import AggregationResult, AggregationStore, event_timestamp
+from detection.batch_evaluator import BatchRuleEvaluator
+from detection.rule_compiler import CompiledRule
+from detection.rule_costs import RuleCostTracker
+from detection.rule_set import RuleRegistry, RuleSet, RuleSetSubscription
+
+
+@dataclass
+class RuleFiring:
+    """An event that satisfied a rule: its conditions, and its threshold when the rule aggregates"""
+    rule: CompiledRule
+    event: Dict[str, Any]
+    timestamp: float
+    aggregation: Optional[AggregationResult] = None
+
+
+class RuleDetector:
+    """
+    Evaluation path from enriched events to rule firings
+
+    Each batch picks up the registry's current RuleSet, evaluates it with a
+    BatchRuleEvaluator that accounts CPU time, events and matches to the
+    RuleCostTracker, folds matches into the AggregationStore, and then
+    refreshes the tracker's per-rule state memory. Rules the tracker
+    throttled or disabled are skipped until it lets them run again.
+    """
+
+    def __init__(self, registry: RuleRegistry, tracker: Optional[RuleCostTracker] = None,
+                 store: Optional[AggregationStore] = None):
+        """
+        Args:
+            registry: Source of versioned rule sets
+            tracker: Cost tracker; built from the registry's engine_config if omitted
+            store: Aggregation state; by default its per-rule memory limit
+                is the tracker's state budget
+        """
+        self.tracker = tracker or RuleCostTracker.from_engine_config(registry.current.engine_config)
+        self.store = store or AggregationStore(memory_limit_per_rule=self.tracker.budget.state_bytes)
+        self.subscription = RuleSetSubscription(registry, self.store)
+        self._evaluator: Optional[BatchRuleEvaluator] = None
+
+    @property
+    def rule_set(self) -> Optional[RuleSet]:
+        return self.subscription.rule_set
+
+    def process(self, events: Sequence[Dict[str, Any]]) -> List[RuleFiring]:
+        """
+        Evaluate one batch of enriched events
+
+        Returns:
+            Firings in rule order, then event order
+        """
+        previous = self.subscription.rule_set
+        rule_set = self.subscription.refresh()
+        if rule_set is not previous or self._evaluator is None:
+            self.tracker.forget(rule_set.retired_since(previous))
+            self._evaluator = BatchRuleEvaluator(rule_set.rules, self.tracker)
+
+        firings = []
+        if events:
+            masks = self._evaluator.evaluate(events)
+            for rule in rule_set.rules:
+                for position in np.flatnonzero(masks[rule.rule_id]).tolist():
+                    event = events[position]
+                    try:
+                        timestamp = event_timestamp(event)
+                    except (TypeError, ValueError):
+                        continue
+                    if not rule.aggregation:
+                        firings.append(RuleFiring(rule, event, timestamp))
+                        continue
+                    result = self.store.update(rule, event, timestamp)
+                    if result is not None:
+                        firings.append(RuleFiring(rule, event, timestamp, result))
+
+        self.store.expire()
+        self.tracker.update_state(self.store)
+        return firings
@@ -0,0 +1,117 @@
+# PyGuardian v3 - Rule Dispatch Index
+# Discrimination index so each event is only checked against rules that could match
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from detection.rule_compiler import Accessor, CompiledCondition, CompiledRule, make_accessor
+
+# Low-cardinality fields that rules commonly pin with equals/in
+DEFAULT_INDEXED_FIELDS = (
+    'protocol',
+    'dest_port',
+    'source_port',
+    'enrichment.source_asset.criticality',
+    'enrichment.dest_asset.criticality',
+)
+
+_INDEXABLE_OPERATORS = ('equals', 'in')
+
+
+def _discriminating_condition(rule: CompiledRule,
+                              indexed_fields: Sequence[str]) -> Optional[CompiledCondition]:
+    """Most selective equals/in condition of the rule on an indexed field"""
+    best = None
+    for condition in rule.conditions:
+        if condition.operator not in _INDEXABLE_OPERATORS or condition.field not in indexed_fields:
+            continue
+        if best is None or condition.selectivity < best.selectivity:
+            best = condition
+    return best
+
+
+class RuleIndex:
+    """
+    Maps (field, value) to the rules that require that value
+
+    Each rule is filed under its single most selective equals/in condition
+    on an indexed field; rules without one are checked for every event.
+    Looking up candidates costs one dictionary probe per indexed field in
+    use, independent of the number of rules.
+    """
+
+    def __init__(self, rules: Iterable[CompiledRule],
+                 indexed_fields: Sequence[str] = DEFAULT_INDEXED_FIELDS):
+        buckets: Dict[str, Dict[Any, List[CompiledRule]]] = defaultdict(lambda: defaultdict(list))
+        unindexed: List[CompiledRule] = []
+        self.rules: List[CompiledRule] = []
+
+        for rule in rules:
+            self.rules.append(rule)
+            condition = _discriminating_condition(rule, indexed_fields)
+            if condition is None:
+                unindexed.append(rule)
+                continue
+            # repeated values (e.g. [6, 6, 17]) must not file the rule twice in one bucket
+            values = dict.fromkeys(condition.value) if condition.operator == 'in' else [condition.value]
+            for value in values:
+                buckets[condition.field][value].append(rule)
+
+        self.unindexed: Tuple[CompiledRule, ...] = tuple(unindexed)
+        self._fields: List[Tuple[str, Accessor, Dict[Any, Tuple[CompiledRule, ...]]]] = [
+            (path, make_accessor(path), {value: tuple(rules) for value, rules in by_value.items()})
+            for path, by_value in buckets.items()
+        ]
+
+        self.events_evaluated = 0
+        self.candidates_checked = 0
+        self.max_candidates = 0
+
+    def candidates(self, event: Dict[str, Any]) -> Tuple[CompiledRule, ...]:
+        """Rules that could match the event; no rule appears twice"""
+        candidates = self.unindexed
+        for _, get_field, by_value in self._fields:
+            try:
+                matched = by_value.get(get_field(event))
+            except TypeError:  # unhashable field value
+                continue
+            if matched:
+                candidates = candidates + matched
+        return candidates
+
+    def match(self, event: Dict[str, Any]) -> List[CompiledRule]:
+        """
+        Evaluate the event against its candidate rules
+
+        Returns:
+            Matching rules, in candidate order
+        """
+        candidates = self.candidates(event)
+
+        candidate_count = len(candidates)
+        self.events_evaluated += 1
+        self.candidates_checked += candidate_count
+        if candidate_count > self.max_candidates:
+            self.max_candidates = candidate_count
+
+        return [rule for rule in candidates if rule.matches(event)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Index shape and candidate counts per evaluated event"""
+        return {
+            'rules': len(self.rules),
+            'unindexed_rules': len(self.unindexed),
+            'indexed_fields': [path for path, _, _ in self._fields],
+            'events_evaluated': self.events_evaluated,
+            'candidates_checked': self.candidates_checked,
+            'mean_candidates': (self.candidates_checked / self.events_evaluated
+                                if self.events_evaluated else 0.0),
+            'max_candidates': self.max_candidates
+        }
+
+    def reset_stats(self) -> None:
+        self.events_evaluated = 0
+        self.candidates_checked = 0
+        self.max_candidates = 0
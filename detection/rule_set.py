@@ -0,0 +1,273 @@
+# PyGuardian v3 - Versioned Rule Sets
+# Compiled rule sets swapped atomically on rule changes, recompiling only what changed
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from detection.aggregation_store import AggregationSpec, AggregationStore
+from detection.rule_compiler import (
+    DEFAULT_RULES_PATH, CompiledRule, RuleCompilationError, compile_rule, load_rule_file
+)
+from detection.rule_index import RuleIndex
+
+
+def rule_fingerprint(definition: Dict[str, Any]) -> str:
+    """Stable digest of a rule definition; equal definitions compile to equal rules"""
+    canonical = json.dumps(definition, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def state_fingerprint(definition: Dict[str, Any]) -> str:
+    """Digest of the parts that determine a rule's aggregation state"""
+    return rule_fingerprint({'conditions': definition.get('conditions'),
+                             'aggregation': definition.get('aggregation'),
+                             'enabled': definition.get('enabled', True)})
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """
+    One immutable version of the compiled rules
+
+    Detectors read `RuleRegistry.current` once per batch and use that set
+    for the whole batch; publishing a new version is a single reference
+    assignment.
+    """
+    version: int
+    rules: Tuple[CompiledRule, ...]
+    index: RuleIndex
+    fingerprints: Dict[str, str]
+    state_fingerprints: Dict[str, str]
+    engine_config: Dict[str, Any] = field(default_factory=dict)
+    by_id: Dict[str, CompiledRule] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def get(self, rule_id: str) -> Optional[CompiledRule]:
+        return self.by_id.get(rule_id)
+
+    def retired_since(self, previous: Optional['RuleSet']) -> Set[str]:
+        """
+        Ids of rules in `previous` whose aggregation state is invalid in this set
+
+        That is, rules that were removed, disabled, or whose conditions or
+        aggregation changed; edits to severity, actions or metadata keep
+        their state.
+        """
+        if previous is None:
+            return set()
+        return {rule_id for rule_id, fingerprint in previous.state_fingerprints.items()
+                if self.state_fingerprints.get(rule_id) != fingerprint}
+
+
+@dataclass
+class ReloadResult:
+    version: int
+    added: List[str]
+    modified: List[str]
+    removed: List[str]
+    unchanged: int
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+
+class RuleRegistry:
+    """
+    Owns the rule definitions and publishes compiled, versioned RuleSets
+
+    Changes (create/update/delete, or re-reading the rules file) build a new
+    RuleSet off the detection path: unchanged rules reuse their compiled
+    objects, only added or modified rules are compiled, and the RuleIndex is
+    rebuilt from the result. Writers are serialized by a lock; readers never
+    block.
+
+    Rules created, updated or deleted through the API are kept in memory
+    only and are not written back to the rules file. They survive reloads:
+    `replace()` and `reload_file()` apply them on top of the new definitions,
+    so an API change to a rule wins over the file until the process restarts.
+    """
+
+    def __init__(self, definitions: Iterable[Dict[str, Any]] = (),
+                 engine_config: Optional[Dict[str, Any]] = None,
+                 path: Optional[Path] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._definitions: Dict[str, Dict[str, Any]] = {}
+        self._compiled: Dict[str, CompiledRule] = {}  # includes disabled rules
+        self._created_at: Dict[str, datetime] = {}
+        self._updated_at: Dict[str, datetime] = {}
+        self._file_mtime: Optional[float] = None
+        self._api_changes: Dict[str, Optional[Dict[str, Any]]] = {}  # None marks an API delete
+        self.current = RuleSet(0, (), RuleIndex(()), {}, {}, dict(engine_config or {}))
+        self.replace(definitions, engine_config)
+
+    @classmethod
+    def from_file(cls, path: Path = DEFAULT_RULES_PATH) -> 'RuleRegistry':
+        registry = cls(path=Path(path))
+        registry.reload_file(force=True)
+        return registry
+
+    def definitions(self) -> List[Dict[str, Any]]:
+        return list(self._definitions.values())
+
+    def definition(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        return self._definitions.get(rule_id)
+
+    def timestamps(self, rule_id: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """(created_at, updated_at) of a rule in this registry"""
+        return self._created_at.get(rule_id), self._updated_at.get(rule_id)
+
+    def replace(self, definitions: Iterable[Dict[str, Any]],
+                engine_config: Optional[Dict[str, Any]] = None) -> ReloadResult:
+        """Publish a new version with these rule definitions plus the API changes"""
+        with self._lock:
+            new_definitions = {}
+            for definition in definitions:
+                if 'id' not in definition:
+                    raise RuleCompilationError(f"Rule is missing 'id': {definition.get('name')}")
+                if definition['id'] in new_definitions:
+                    raise RuleCompilationError(f"Duplicate rule id: {definition['id']}")
+                new_definitions[definition['id']] = definition
+            for rule_id, definition in self._api_changes.items():
+                if definition is None:
+                    new_definitions.pop(rule_id, None)
+                else:
+                    new_definitions[rule_id] = definition
+            return self._publish(new_definitions, engine_config)
+
+    def reload_file(self, force: bool = False) -> Optional[ReloadResult]:
+        """
+        Re-read the rules file if it changed since the last load
+
+        Returns:
+            ReloadResult, or None if the file is unchanged
+        """
+        if self.path is None:
+            raise ValueError("Registry has no rules file")
+        mtime = os.stat(self.path).st_mtime
+        if not force and mtime == self._file_mtime:
+            return None
+        definitions, engine_config = load_rule_file(self.path)
+        result = self.replace(definitions, engine_config)
+        self._file_mtime = mtime
+        return result
+
+    def create_rule(self, definition: Dict[str, Any]) -> ReloadResult:
+        with self._lock:
+            rule_id = definition.get('id')
+            if not rule_id:
+                raise RuleCompilationError("Rule is missing 'id'")
+            if rule_id in self._definitions:
+                raise KeyError(f"Rule {rule_id} already exists")
+            result = self._publish({**self._definitions, rule_id: definition})
+            self._api_changes[rule_id] = definition
+            return result
+
+    def update_rule(self, rule_id: str, updates: Dict[str, Any]) -> ReloadResult:
+        """Apply a partial update; the rule id cannot be changed"""
+        with self._lock:
+            if rule_id not in self._definitions:
+                raise KeyError(f"Rule {rule_id} not found")
+            definition = {**self._definitions[rule_id], **updates, 'id': rule_id}
+            result = self._publish({**self._definitions, rule_id: definition})
+            self._api_changes[rule_id] = definition
+            return result
+
+    def delete_rule(self, rule_id: str) -> ReloadResult:
+        with self._lock:
+            if rule_id not in self._definitions:
+                raise KeyError(f"Rule {rule_id} not found")
+            definitions = dict(self._definitions)
+            del definitions[rule_id]
+            result = self._publish(definitions)
+            self._api_changes[rule_id] = None
+            return result
+
+    def _publish(self, definitions: Dict[str, Dict[str, Any]],
+                 engine_config: Optional[Dict[str, Any]] = None) -> ReloadResult:
+        """Compile what changed and swap in the new set; caller holds the lock"""
+        previous = self.current
+
+        fingerprints = {}
+        state_fingerprints = {}
+        compiled = {}
+        rules = []
+        added, modified = [], []
+        for rule_id, definition in definitions.items():
+            old_fingerprint = previous.fingerprints.get(rule_id)
+            if definition is self._definitions.get(rule_id):  # definitions are never mutated in place
+                fingerprints[rule_id] = old_fingerprint
+                state_fingerprints[rule_id] = previous.state_fingerprints[rule_id]
+                rule = self._compiled[rule_id]
+            else:
+                fingerprints[rule_id] = rule_fingerprint(definition)
+                state_fingerprints[rule_id] = state_fingerprint(definition)
+                if old_fingerprint == fingerprints[rule_id]:
+                    rule = self._compiled[rule_id]
+                else:
+                    rule = compile_rule(definition)  # raises before anything is published
+                    if rule.aggregation:
+                        AggregationSpec.from_rule(rule.aggregation)
+                    (modified if old_fingerprint else added).append(rule_id)
+            compiled[rule_id] = rule
+            if rule.enabled:
+                rules.append(rule)
+
+        removed = [rule_id for rule_id in previous.fingerprints if rule_id not in definitions]
+        now = datetime.now(timezone.utc)
+        for rule_id in added:
+            self._created_at[rule_id] = self._updated_at[rule_id] = now
+        for rule_id in modified:
+            self._updated_at[rule_id] = now
+        for rule_id in removed:
+            self._created_at.pop(rule_id, None)
+            self._updated_at.pop(rule_id, None)
+
+        self._definitions = definitions
+        self._compiled = compiled
+        self.current = RuleSet(
+            version=previous.version + 1,
+            rules=tuple(rules),
+            index=RuleIndex(rules),
+            fingerprints=fingerprints,
+            state_fingerprints=state_fingerprints,
+            engine_config=previous.engine_config if engine_config is None else dict(engine_config),
+            by_id={rule.rule_id: rule for rule in rules}
+        )
+        return ReloadResult(self.current.version, added, modified, removed,
+                            unchanged=len(definitions) - len(added) - len(modified))
+
+
+class RuleSetSubscription:
+    """
+    A detector's view of the registry
+
+    Call `refresh()` between batches: it picks up the latest RuleSet and
+    drops aggregation state of rules that were removed or changed since the
+    detector's previous set, keeping state for every unchanged rule.
+    """
+
+    def __init__(self, registry: RuleRegistry, store: Optional[AggregationStore] = None):
+        self.registry = registry
+        self.store = store
+        self.rule_set: Optional[RuleSet] = None
+
+    def refresh(self) -> RuleSet:
+        current = self.registry.current
+        if current is not self.rule_set:
+            if self.store is not None:
+                for rule_id in current.retired_since(self.rule_set):
+                    self.store.drop_rule(rule_id)
+            self.rule_set = current
+        return current
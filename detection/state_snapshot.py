@@ -0,0 +1,416 @@
+# PyGuardian v3 - Detector State Snapshots
+# Incremental binary snapshots of aggregation and deduplication state for fast restarts
+
+from __future__ import annotations
+
+import io
+import os
+import pickle
+import re
+import struct
+import threading
+import time
+import zlib
+from dataclasses import astuple
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from detection.aggregation_store import AggregationStore, WindowedAggregator
+from detection.alert_suppression import AlertSuppressor
+from detection.rule_compiler import CompiledRule
+
+# Directory detectors keep their snapshots in
+DEFAULT_SNAPSHOT_DIR = Path(os.environ.get('PYGUARDIAN_SNAPSHOT_DIR', 'data/snapshots'))
+
+DEFAULT_SNAPSHOT_INTERVAL = 60.0
+DEFAULT_COMPACT_EVERY = 10
+
+SNAPSHOT_MAGIC = b'PGSS'
+SNAPSHOT_FORMAT = 2
+# Fixed so files written by one Python version load in another
+PICKLE_PROTOCOL = 4
+
+BASE = 0
+DELTA = 1
+
+# magic, format, kind, sequence, created (epoch seconds), CRC-32 of the body
+_HEADER = struct.Struct('<4sBBxxQdI')
+_FILE_PATTERN = re.compile(r'^(base|delta)-(\d{12})\.snap$')
+_KIND_NAMES = {BASE: 'base', DELTA: 'delta'}
+
+PathLike = Union[str, Path]
+
+
+class SnapshotError(Exception):
+    """Raised for unreadable or inconsistent snapshot files"""
+
+
+class _PayloadUnpickler(pickle.Unpickler):
+    """Loads plain containers and scalars only; payloads never reference classes or functions"""
+
+    def find_class(self, module: str, name: str) -> Any:
+        raise SnapshotError(f"Snapshot references {module}.{name}")
+
+
+def aggregator_config(aggregator: WindowedAggregator) -> Tuple[Any, ...]:
+    """Everything that must match for saved state to be valid for an aggregator"""
+    return (*astuple(aggregator.spec), aggregator.bucket_count, aggregator.distinct_mode,
+            aggregator.hll_precision)
+
+
+def encode_snapshot(kind: int, sequence: int, payload: Dict[str, Any]) -> bytes:
+    body = zlib.compress(pickle.dumps(payload, protocol=PICKLE_PROTOCOL), 1)
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, kind, sequence, time.time(),
+                        zlib.crc32(body)) + body
+
+
+def decode_snapshot(data: bytes) -> Tuple[int, int, Dict[str, Any]]:
+    """
+    Returns:
+        (kind, sequence, payload) of an encoded snapshot file
+
+    Raises:
+        SnapshotError: Wrong magic or format, or a damaged body
+    """
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated")
+    magic, version, kind, sequence, _, checksum = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a snapshot file")
+    if version != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Snapshot {sequence} has format {version}, expected {SNAPSHOT_FORMAT}")
+    body = memoryview(data)[_HEADER.size:]
+    if zlib.crc32(body) != checksum:
+        raise SnapshotError(f"Snapshot {sequence} failed its checksum")
+    try:
+        return kind, sequence, _PayloadUnpickler(io.BytesIO(zlib.decompress(body))).load()
+    except pickle.UnpicklingError as error:
+        raise SnapshotError(f"Snapshot {sequence} is damaged: {error}") from None
+
+
+def merge_snapshots(base: Optional[Dict[str, Any]], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a delta payload to a full payload (None: empty state)
+
+    Rule entries of a delta either replace the rule's state entirely
+    (`reset`) or carry its removed keys and its updated keys in update order.
+    Offsets and deduplication state are always taken from the delta.
+    """
+    merged = {'offsets': delta.get('offsets'), 'suppressor': delta.get('suppressor'),
+              'aggregators': dict(base['aggregators']) if base else {}}
+    aggregators = merged['aggregators']
+    for rule_id in delta.get('dropped', ()):
+        aggregators.pop(rule_id, None)
+
+    for rule_id, entry in delta['aggregators'].items():
+        previous = aggregators.get(rule_id)
+        if entry['reset'] or previous is None or previous['config'] != entry['config']:
+            states = {}
+        else:
+            states = dict(previous['states'])
+            for key in entry['removed']:
+                states.pop(key, None)
+        for key, buckets in entry['states']:
+            states.pop(key, None)
+            states[key] = buckets
+        aggregators[rule_id] = {'config': entry['config'], 'current_index': entry['current_index'],
+                                'reset': True, 'removed': [], 'states': list(states.items())}
+    return merged
+
+
+class StateSnapshotter:
+    """
+    Periodic, incremental snapshots of an AggregationStore and AlertSuppressor
+
+    `snapshot()` is called by the detector between batches with the input
+    offsets (e.g. Kafka partition -> next offset) the state reflects. On the
+    detector thread it only copies the group keys updated since the previous
+    snapshot; encoding, compression, fsync and the atomic rename happen on a
+    background writer thread. If the writer is still busy, the call returns
+    immediately and the changes carry over to the next snapshot. Only the
+    first snapshot of a new chain (no state was restored) copies every key.
+
+    Files form a chain in `directory`: `base-N.snap` holds the full state at
+    sequence N and `delta-M.snap` the changes since M-1. Every
+    `compact_every` deltas the writer folds the chain into a new base, off
+    the detector thread. Deduplication state is bounded by the dedup window
+    and is written in full each time.
+
+    At startup, `restore()` loads the chain into fresh stores and returns
+    the offsets to resume consuming from.
+    """
+
+    def __init__(self, directory: PathLike = DEFAULT_SNAPSHOT_DIR,
+                 store: Optional[AggregationStore] = None,
+                 suppressor: Optional[AlertSuppressor] = None,
+                 interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+                 compact_every: int = DEFAULT_COMPACT_EVERY,
+                 clock: Callable[[], float] = time.monotonic):
+        self.directory = Path(directory)
+        self.store = store if store is not None else AggregationStore()
+        self.suppressor = suppressor
+        self.interval = interval
+        self.compact_every = compact_every
+        self.clock = clock
+
+        self._tracked: Dict[str, WindowedAggregator] = {}
+        self._sequence: Optional[int] = None  # last sequence in the chain; None: start a new chain
+        self._base_sequence = 0
+        self._need_base = True
+        self._dropped: List[str] = []
+        self._last_snapshot: Optional[float] = None
+        self._idle = threading.Event()
+        self._idle.set()
+        self._writer: Optional[threading.Thread] = None
+
+        self.snapshots = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.last_capture_seconds = 0.0
+        self.last_write_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def restore(self, rules: Iterable[CompiledRule]) -> Optional[Dict[Any, Any]]:
+        """
+        Load the latest snapshot chain into the store and suppressor
+
+        State is only restored for rules whose aggregation is unchanged; the
+        chain is applied up to the first missing or damaged delta, and files
+        after it are deleted so new snapshots continue a consistent chain.
+
+        Args:
+            rules: Current compiled rules (e.g. RuleRegistry.current.rules)
+
+        Returns:
+            Offsets recorded with the restored state, or None if there was
+            no snapshot (consume from the beginning of retention)
+        """
+        payload, base_sequence, sequence, files = self._load_chain()
+        for path in files:
+            path.unlink()
+        if payload is None:
+            return None
+
+        saved = payload['aggregators']
+        restored = {}
+        for rule in rules:
+            entry = saved.get(rule.rule_id)
+            aggregator = self.store.aggregator_for(rule) if entry is not None else None
+            if aggregator is None or aggregator_config(aggregator) != entry['config']:
+                continue
+            aggregator.clear()
+            aggregator.current_index = entry['current_index']
+            for key, buckets in entry['states']:
+                aggregator.load_state(key, buckets)
+            aggregator.expire()
+            aggregator.track_changes()
+            aggregator.drain_changes()
+            restored[rule.rule_id] = aggregator
+        if self.suppressor is not None and payload.get('suppressor') is not None:
+            self.suppressor.load_state(payload['suppressor'])
+
+        # Continue the chain: the next snapshot is a delta against the restored state
+        self._sequence = sequence
+        self._base_sequence = base_sequence
+        self._need_base = False
+        self._tracked = restored
+        self._dropped = [rule_id for rule_id in saved if rule_id not in restored]
+        return payload['offsets']
+
+    def maybe_snapshot(self, offsets: Dict[Any, Any]) -> bool:
+        """snapshot() if `interval` seconds passed since the last one"""
+        now = self.clock()
+        if self._last_snapshot is not None and now - self._last_snapshot < self.interval:
+            return False
+        return self.snapshot(offsets)
+
+    def snapshot(self, offsets: Dict[Any, Any]) -> bool:
+        """
+        Capture changes since the previous snapshot and hand them to the writer
+
+        Args:
+            offsets: Input position the state reflects; every event before it
+                has been applied
+
+        Returns:
+            False if the previous snapshot is still being written
+        """
+        if not self._idle.is_set():
+            self.skipped += 1
+            return False
+        started = time.perf_counter()
+        if self._sequence is None:
+            self._start_chain()
+        kind = BASE if self._need_base else DELTA
+        payload = self._capture(offsets)
+        self._need_base = False
+        self._sequence += 1
+        self.last_capture_seconds = time.perf_counter() - started
+        self._last_snapshot = self.clock()
+
+        self._idle.clear()
+        self._writer = threading.Thread(target=self._write, args=(kind, self._sequence, payload),
+                                        name='state-snapshot', daemon=True)
+        self._writer.start()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the pending snapshot write; returns whether it finished"""
+        return self._idle.wait(timeout)
+
+    def close(self, offsets: Optional[Dict[Any, Any]] = None) -> None:
+        """Write a final snapshot at `offsets` (if given) and wait for it"""
+        self.wait()
+        if offsets is not None:
+            self.snapshot(offsets)
+            self.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'sequence': self._sequence,
+            'base_sequence': self._base_sequence,
+            'snapshots': self.snapshots,
+            'skipped': self.skipped,
+            'bytes_written': self.bytes_written,
+            'last_capture_ms': self.last_capture_seconds * 1e3,
+            'last_write_ms': self.last_write_seconds * 1e3,
+            'last_error': self.last_error,
+        }
+
+    def _start_chain(self) -> None:
+        """Begin a new chain after any existing files; the first snapshot is a full base"""
+        existing = [sequence for _, sequence, _ in self._files()]
+        self._sequence = max(existing, default=0)
+        self._need_base = True
+        self._tracked.clear()
+        self._dropped = []
+
+    def _capture(self, offsets: Dict[Any, Any]) -> Dict[str, Any]:
+        aggregators = self.store.aggregators
+        dropped = [rule_id for rule_id, aggregator in self._tracked.items()
+                   if aggregators.get(rule_id) is not aggregator]
+        for rule_id in dropped:
+            del self._tracked[rule_id]
+        dropped.extend(self._dropped)
+        self._dropped = []
+
+        entries = {}
+        for rule_id, aggregator in aggregators.items():
+            reset = self._tracked.get(rule_id) is not aggregator
+            if reset:
+                aggregator.track_changes()
+                self._tracked[rule_id] = aggregator
+            changed, removed = aggregator.drain_changes()
+            if not (reset or changed or removed):
+                continue
+            entries[rule_id] = {
+                'config': aggregator_config(aggregator),
+                'current_index': aggregator.current_index,
+                'reset': reset,
+                'removed': removed,
+                'states': [(key, aggregator.export_state(key)) for key in changed]
+            }
+        return {
+            'offsets': offsets,
+            'dropped': dropped,
+            'aggregators': entries,
+            'suppressor': self.suppressor.export_state() if self.suppressor is not None else None
+        }
+
+    def _write(self, kind: int, sequence: int, payload: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.bytes_written += self._write_file(kind, sequence, payload)
+            self.snapshots += 1
+            if kind == BASE:
+                self._base_sequence = sequence
+                self._remove_before(sequence)
+            elif sequence - self._base_sequence >= self.compact_every:
+                self._compact()
+            self.last_error = None
+        except Exception as exc:
+            # The chain may now have a gap; start over with a full base next time
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            self._sequence = None
+        finally:
+            self.last_write_seconds = time.perf_counter() - started
+            self._idle.set()
+
+    def _write_file(self, kind: int, sequence: int, payload: Dict[str, Any]) -> int:
+        data = encode_snapshot(kind, sequence, payload)
+        path = self.directory / f"{_KIND_NAMES[kind]}-{sequence:012d}.snap"
+        temporary = path.with_suffix('.tmp')
+        with open(temporary, 'wb') as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+        return len(data)
+
+    def _compact(self) -> None:
+        """Fold the base and its deltas into a new base (writer thread)"""
+        payload, _, sequence, _ = self._load_chain()
+        if payload is None:
+            return
+        self.bytes_written += self._write_file(BASE, sequence, payload)
+        self._base_sequence = sequence
+        self._remove_before(sequence)
+
+    def _remove_before(self, sequence: int) -> None:
+        for kind, file_sequence, path in self._files():
+            if file_sequence < sequence or (file_sequence == sequence and kind == DELTA):
+                path.unlink()
+
+    def _files(self) -> List[Tuple[int, int, Path]]:
+        """(kind, sequence, path) of snapshot files, in chain order"""
+        if not self.directory.is_dir():
+            return []
+        files = []
+        for path in self.directory.iterdir():
+            match = _FILE_PATTERN.match(path.name)
+            if match:
+                files.append((BASE if match.group(1) == 'base' else DELTA, int(match.group(2)), path))
+        return sorted(files, key=lambda item: (item[1], item[0]))
+
+    def _load_chain(self) -> Tuple[Optional[Dict[str, Any]], int, int, List[Path]]:
+        """
+        Merge the newest readable base with the consecutive deltas after it
+
+        Returns:
+            (payload, base sequence, last applied sequence, files that are not
+            part of the chain)
+        """
+        files = self._files()
+        payload = None
+        base_sequence = sequence = 0
+        unused = []
+        for kind, _, path in reversed(files):
+            if kind != BASE:
+                continue
+            try:
+                _, base_sequence, payload = decode_snapshot(path.read_bytes())
+                sequence = base_sequence
+                break
+            except (OSError, SnapshotError, ValueError, EOFError, zlib.error):
+                unused.append(path)
+        if payload is None:
+            return None, 0, 0, [path for _, _, path in files]
+
+        broken = False
+        for kind, file_sequence, path in files:
+            if path in unused or file_sequence <= sequence:
+                continue
+            if broken or kind != DELTA or file_sequence != sequence + 1:
+                broken = True
+                unused.append(path)
+                continue
+            try:
+                _, _, delta = decode_snapshot(path.read_bytes())
+            except (OSError, SnapshotError, ValueError, EOFError, zlib.error):
+                broken = True
+                unused.append(path)
+                continue
+            payload = merge_snapshots(payload, delta)
+            sequence = file_sequence
+        return payload, base_sequence, sequence, unused
@@ -0,0 +1,59 @@
+# PyGuardian v3 - Config Units
+# Parsing of duration and size strings used in rules and engine_config
+
+from __future__ import annotations
+
+import re
+from typing import Union
+
+_DURATION_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h|d)?\s*$')
+
+_DURATION_SECONDS = {
+    'ms': 0.001,
+    's': 1.0,
+    'm': 60.0,
+    'h': 3600.0,
+    'd': 86400.0,
+}
+
+
+def parse_duration(value: Union[str, int, float]) -> float:
+    """
+    Convert a duration such as "30s", "5m", "1h" or "250ms" to seconds
+
+    Bare numbers are taken as seconds.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    match = _DURATION_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid duration: {value!r}")
+    amount, unit = match.groups()
+    return float(amount) * _DURATION_SECONDS[unit or 's']
+
+
+_SIZE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*((?:[KMGT]i?)?B?)\s*$', re.IGNORECASE)
+
+_SIZE_BYTES = {
+    'K': 2**10,
+    'M': 2**20,
+    'G': 2**30,
+    'T': 2**40,
+}
+
+
+def parse_size(value: Union[str, int, float]) -> int:
+    """
+    Convert a size such as "512MB" or "2GB" to bytes (binary multiples)
+
+    Bare numbers are taken as bytes.
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    match = _SIZE_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    amount, unit = match.groups()
+    return int(float(amount) * _SIZE_BYTES.get(unit[:1].upper(), 1))
@@ -0,0 +1,245 @@
+# PyGuardian v3 - Flow Pre-Aggregation
+# Merges repeated 5-tuple flows per interval in a bounded table, scaling counters by sampling rate
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline.flow_batch import IP_BYTES, FlowBatch
+
+DEFAULT_INTERVAL = 60.0
+DEFAULT_MAX_FLOWS = 100_000
+
+FLOW_KEY = ('source_ip', 'dest_ip', 'source_port', 'dest_port', 'protocol')
+# Counters summed per merged flow, after scaling by raw_data.sampling_rate
+SUMMED_FIELDS = ('bytes_sent', 'bytes_received', 'packets_sent', 'packets_received')
+# Fields a merged flow takes from the first flow of its group
+FIRST_FIELDS = ('tos', 'raw_data.netflow_version', 'raw_data.input_interface', 'raw_data.output_interface')
+
+# 5-tuple plus interval index, packed into one fixed-width key per flow
+_KEY_BYTES = 2 * IP_BYTES + 2 + 2 + 1 + 8
+_MAX_DURATION = np.iinfo(np.uint32).max
+
+
+@dataclass
+class AggregatedFlows:
+    """Merged flows, plus how many input flows each row stands for"""
+    flows: FlowBatch
+    flow_counts: np.ndarray  # uint32 per row
+
+    def __len__(self) -> int:
+        return len(self.flows)
+
+
+@dataclass
+class PreAggregationStats:
+    flows_in: int = 0
+    flows_out: int = 0
+    flushes_on_time: int = 0
+    flushes_on_size: int = 0
+    pending: int = 0
+
+    @property
+    def reduction_ratio(self) -> float:
+        """Input flows per emitted flow (1.0 before anything was emitted)"""
+        return self.flows_in / self.flows_out if self.flows_out else 1.0
+
+
+def flow_keys(batch: FlowBatch, interval: float) -> np.ndarray:
+    """
+    One fixed-width key per flow of a batch: its 5-tuple and interval index
+
+    Intervals are aligned to multiples of `interval` in flow time, so flows
+    only merge with flows of the same interval.
+    """
+    size = batch.size
+    columns = batch.columns()
+    packed = np.empty((size, _KEY_BYTES), dtype=np.uint8)
+    packed[:, :IP_BYTES] = columns['source_ip']
+    packed[:, IP_BYTES:2 * IP_BYTES] = columns['dest_ip']
+    offset = 2 * IP_BYTES
+    for name, width in (('source_port', 2), ('dest_port', 2), ('protocol', 1)):
+        packed[:, offset:offset + width] = columns[name].reshape(size, 1).view(np.uint8)
+        offset += width
+    slots = np.floor(columns['timestamp'] / interval).astype(np.int64)
+    packed[:, offset:] = slots.reshape(size, 1).view(np.uint8)
+    return packed.view(f'V{_KEY_BYTES}').ravel()
+
+
+class FlowPreAggregator:
+    """
+    Optional stage between ingest and enrichment that merges repeated flows
+
+    Flows with the same (source_ip, dest_ip, source_port, dest_port,
+    protocol) in the same `interval` of flow time become one flow: byte and
+    packet counters are scaled by each flow's raw_data.sampling_rate and
+    summed, tcp_flags are OR-ed, the timestamp is the earliest start and the
+    duration reaches the latest end; other fields come from the first flow.
+    Emitted flows carry sampling_rate 1 since their counters are already
+    scaled, and `flow_counts` says how many input flows each stands for.
+
+    Each batch is reduced in NumPy (sort by key, then reduceat per column)
+    and its groups are merged into a table of at most `max_flows` rows that
+    lives in one preallocated FlowBatch; a dict maps keys to rows. The
+    table is emitted when full and when `interval` seconds have passed since
+    its first flow arrived (checked on add() and poll()).
+
+    Per-key sums are exact, so total_bytes thresholds see the same values
+    as with unmerged (scaled) flows as long as `interval` divides the rules'
+    bucket width; count thresholds stay exact when `flow_counts` is passed
+    as WindowedAggregator.add_value(count=...).
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, max_flows: int = DEFAULT_MAX_FLOWS,
+                 collector_id: Optional[str] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            interval: Seconds of flow time merged together, and the longest
+                a flow waits in the table
+            max_flows: Table rows; a full table is emitted
+            collector_id: Stored on emitted FlowBatches
+            clock: Monotonic clock for time-based flushes
+        """
+        if interval <= 0 or max_flows <= 0:
+            raise ValueError("interval and max_flows must be positive")
+        self.interval = interval
+        self.max_flows = max_flows
+        self.collector_id = collector_id
+        self.clock = clock
+        self.stats = PreAggregationStats()
+
+        self._table = FlowBatch(max_flows, collector_id)
+        self._ends = np.zeros(max_flows, dtype=np.float64)
+        self._counts = np.zeros(max_flows, dtype=np.uint32)
+        self._rows: Dict[bytes, int] = {}
+        self._opened: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, batch: FlowBatch) -> List[AggregatedFlows]:
+        """
+        Merge a batch into the table
+
+        Returns:
+            Tables emitted while merging (on time or size), oldest first
+        """
+        emitted = self.poll()
+        emitted = [emitted] if emitted is not None else []
+        if not batch.size:
+            return emitted
+        if self._opened is None:
+            self._opened = self.clock()
+        self.stats.flows_in += batch.size
+
+        keys, groups = self._reduce(batch)
+        start = 0
+        while start < len(keys):
+            free = self.max_flows - len(self._rows)
+            rows = list(map(self._rows.get, keys[start:].tolist()))
+            new = [index for index, row in enumerate(rows) if row is None]
+            if len(new) > free:
+                # take existing keys and as many new ones as fit, then emit the full table
+                stop = start + new[free]
+                self._merge(keys[start:stop], rows[:stop - start], groups, start)
+                self.stats.flushes_on_size += 1
+                emitted.append(self.flush())
+                self._opened = self.clock()
+                start = stop
+                continue
+            self._merge(keys[start:], rows, groups, start)
+            break
+        self.stats.pending = len(self._rows)
+        return emitted
+
+    def poll(self) -> Optional[AggregatedFlows]:
+        """Emit the table if `interval` seconds passed since its first flow; call when input is idle"""
+        if self._opened is None or self.clock() - self._opened < self.interval:
+            return None
+        self.stats.flushes_on_time += 1
+        return self.flush()
+
+    def flush(self) -> Optional[AggregatedFlows]:
+        """Emit every merged flow and clear the table (None if empty)"""
+        size = len(self._rows)
+        self._opened = None
+        if not size:
+            return None
+        flows = FlowBatch(size, self.collector_id)
+        for name, values in flows.arrays.items():
+            values[:] = self._table.arrays[name][:size]
+        durations = np.ceil(self._ends[:size] - flows.arrays['timestamp'])
+        flows.arrays['duration'][:] = np.clip(durations, 0, _MAX_DURATION)
+        flows.arrays['raw_data.sampling_rate'][:] = 1
+        flows.size = size
+        counts = self._counts[:size].copy()
+
+        self._rows.clear()
+        self._table.size = 0
+        self.stats.flows_out += size
+        self.stats.pending = 0
+        return AggregatedFlows(flows, counts)
+
+    def _reduce(self, batch: FlowBatch) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Group a batch by key: (sorted unique keys, per-group values of each merged column)"""
+        columns = batch.columns()
+        keys, first, inverse, counts = np.unique(flow_keys(batch, self.interval), return_index=True,
+                                                 return_inverse=True, return_counts=True)
+        order = np.argsort(inverse, kind='stable')
+        starts = np.zeros(len(keys), dtype=np.intp)
+        np.cumsum(counts[:-1], out=starts[1:])
+
+        sampling = columns['raw_data.sampling_rate'].astype(np.uint64)
+        sampling[sampling == 0] = 1
+        sampling = sampling[order]
+        groups = {
+            name: np.add.reduceat(columns[name][order].astype(np.uint64) * sampling, starts)
+            for name in SUMMED_FIELDS
+        }
+        timestamps = columns['timestamp'][order]
+        groups['tcp_flags'] = np.bitwise_or.reduceat(columns['tcp_flags'][order], starts)
+        # Timestamps are flow starts (see FLOW_FIELDS), so each flow ends at timestamp + duration
+        groups['timestamp'] = np.minimum.reduceat(timestamps, starts)
+        groups['end'] = np.maximum.reduceat(timestamps + columns['duration'][order], starts)
+        groups['count'] = counts.astype(np.uint32)
+        groups['first'] = first
+        groups['batch'] = columns
+        return keys, groups
+
+    def _merge(self, keys: np.ndarray, rows: List[Optional[int]], groups: Dict[str, Any], offset: int) -> None:
+        """Fold groups offset..offset+len(keys) into their rows, appending rows for new keys"""
+        if not len(keys):
+            return
+        table, ends, counts = self._table.arrays, self._ends, self._counts
+        found = np.fromiter((row is not None for row in rows), dtype=bool, count=len(rows))
+
+        if found.any():
+            existing = np.flatnonzero(found)
+            at = np.array([rows[index] for index in existing.tolist()], dtype=np.intp)
+            source = existing + offset
+            for name in SUMMED_FIELDS:
+                table[name][at] += groups[name][source]
+            table['tcp_flags'][at] |= groups['tcp_flags'][source]
+            table['timestamp'][at] = np.minimum(table['timestamp'][at], groups['timestamp'][source])
+            ends[at] = np.maximum(ends[at], groups['end'][source])
+            counts[at] += groups['count'][source]
+
+        if not found.all():
+            added = np.flatnonzero(~found)
+            source = added + offset
+            base = self._table.size
+            at = np.arange(base, base + len(added))
+            firsts = groups['first'][source]
+            batch = groups['batch']
+            for name in FLOW_KEY + FIRST_FIELDS:
+                table[name][at] = batch[name][firsts]
+            for name in SUMMED_FIELDS + ('tcp_flags', 'timestamp'):
+                table[name][at] = groups[name][source]
+            ends[at] = groups['end'][source]
+            counts[at] = groups['count'][source]
+            self._rows.update(zip(keys[added].tolist(), at.tolist()))
+            self._table.size = base + len(added)
@@ -0,0 +1,144 @@
+# PyGuardian v3 - Flow Batches
+# Preallocated columnar arrays holding raw_flow_event fields for collectors and ingest
+
+from __future__ import annotations
+
+import ipaddress
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from detection.batch_evaluator import Column, FlowColumns, categorical_column, numeric_column
+
+IP_BYTES = 16
+
+# raw_flow_event field -> (dtype, per-row shape); IPs are 16-byte IPv6 or IPv4-mapped addresses.
+# `timestamp` is when the flow started and `duration` the whole seconds it lasted,
+# so a flow ends at timestamp + duration; every producer and consumer relies on this.
+FLOW_FIELDS = {
+    'timestamp': (np.float64, ()),  # flow start, epoch seconds
+    'source_ip': (np.uint8, (IP_BYTES,)),
+    'dest_ip': (np.uint8, (IP_BYTES,)),
+    'source_port': (np.uint16, ()),
+    'dest_port': (np.uint16, ()),
+    'protocol': (np.uint8, ()),
+    'bytes_sent': (np.uint64, ()),
+    'bytes_received': (np.uint64, ()),
+    'packets_sent': (np.uint64, ()),
+    'packets_received': (np.uint64, ()),
+    'duration': (np.uint32, ()),
+    'tcp_flags': (np.uint16, ()),
+    'tos': (np.uint8, ()),
+    'raw_data.netflow_version': (np.uint8, ()),
+    'raw_data.sampling_rate': (np.uint32, ()),
+    'raw_data.input_interface': (np.uint32, ()),
+    'raw_data.output_interface': (np.uint32, ()),
+}
+
+IP_FIELDS = ('source_ip', 'dest_ip')
+
+_IPV4_PREFIX = np.array([0] * 10 + [0xff, 0xff], dtype=np.uint8)
+
+
+def ip_to_bytes(address: str) -> bytes:
+    """16-byte form of an address; IPv4 becomes ::ffff:a.b.c.d"""
+    ip = ipaddress.ip_address(address)
+    return (ip if ip.version == 6 else ipaddress.IPv6Address(b'\0' * 10 + b'\xff\xff' + ip.packed)).packed
+
+
+def ip_from_bytes(packed: bytes) -> str:
+    ip = ipaddress.IPv6Address(bytes(packed))
+    return str(ip.ipv4_mapped or ip)
+
+
+def format_ips(column: np.ndarray) -> List[str]:
+    """Address strings of a (n, 16) IP column; each distinct address is formatted once"""
+    if not len(column):
+        return []
+    unique, inverse = np.unique(column.view(f'V{IP_BYTES}').ravel(), return_inverse=True)
+    labels = [ip_from_bytes(value.tobytes()) for value in unique]
+    return [labels[code] for code in inverse.tolist()]
+
+
+def set_ipv4(column: np.ndarray, octets: np.ndarray) -> None:
+    """Write (n, 4) IPv4 octets into rows of an IP column as IPv4-mapped addresses"""
+    column[:, :12] = _IPV4_PREFIX
+    column[:, 12:] = octets
+
+
+class FlowBatch:
+    """
+    A fixed-capacity batch of flows stored as one array per raw_flow_event field
+
+    Arrays are allocated once at the batch capacity and zero-filled; producers
+    write slices in place and advance `size`. `columns()` returns views of the
+    filled rows. Field names are the dotted paths rules use, so a batch feeds
+    BatchRuleEvaluator without building event dicts (`flow_columns()`);
+    `to_events()` builds raw_flow_event dicts for code that needs them.
+    The timestamp column holds flow start times (see FLOW_FIELDS).
+    """
+
+    def __init__(self, capacity: int, collector_id: Optional[str] = None):
+        self.capacity = capacity
+        self.collector_id = collector_id
+        self.size = 0
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.zeros((capacity, *shape), dtype=dtype) for name, (dtype, shape) in FLOW_FIELDS.items()
+        }
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def remaining(self) -> int:
+        return self.capacity - self.size
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Views of the filled rows of every field"""
+        size = self.size
+        return {name: array[:size] for name, array in self.arrays.items()}
+
+    def flow_columns(self, paths: Optional[Sequence[str]] = None) -> FlowColumns:
+        """
+        Detection columns for BatchRuleEvaluator.evaluate_columns
+
+        Args:
+            paths: Fields to convert (default: all); IPs become categorical
+                columns of address strings, everything else numeric
+        """
+        columns = self.columns()
+        converted: Dict[str, Column] = {}
+        for path in paths if paths is not None else columns:
+            values = columns.get(path)
+            if values is None:
+                continue
+            converted[path] = categorical_column(format_ips(values)) if path in IP_FIELDS \
+                else numeric_column(values)
+        return FlowColumns.from_columns(converted, self.size)
+
+    def to_events(self) -> List[Dict[str, Any]]:
+        """raw_flow_event dicts of the filled rows (slow path; new event ids)"""
+        columns = self.columns()
+        ips = {name: format_ips(columns[name]) for name in IP_FIELDS}
+        plain = {name: values.tolist() for name, values in columns.items()
+                 if name not in IP_FIELDS and name != 'timestamp' and not name.startswith('raw_data.')}
+        raw_data = {name.split('.', 1)[1]: values.tolist() for name, values in columns.items()
+                    if name.startswith('raw_data.')}
+
+        events = []
+        for row, timestamp in enumerate(columns['timestamp'].tolist()):
+            event = {
+                'event_id': str(uuid.uuid4()),
+                'timestamp': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(
+                    timespec='milliseconds').replace('+00:00', 'Z'),
+                'collector_id': self.collector_id,
+            }
+            for name in IP_FIELDS:
+                event[name] = ips[name][row]
+            for name, values in plain.items():
+                event[name] = values[row]
+            event['raw_data'] = {name: values[row] for name, values in raw_data.items()}
+            events.append(event)
+        return events
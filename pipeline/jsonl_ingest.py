@@ -0,0 +1,538 @@
+# PyGuardian v3 - JSON-Lines Ingest
+# Chunked, schema-validated reading of raw_flow_event / enriched_event lines into typed flow columns
+
+from __future__ import annotations
+
+import gc
+import json
+import re
+import socket
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import repeat
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from pipeline.flow_batch import FLOW_FIELDS, IP_BYTES, IP_FIELDS, FlowBatch
+
+DEFAULT_SCHEMA_PATH = Path(__file__).resolve().parent.parent / "schemas" / "events.json"
+DEFAULT_CHUNK_BYTES = 4 * 2**20
+DEFAULT_BATCH_SIZE = 65_536
+
+PathLike = Union[str, Path]
+Check = Callable[[Any], bool]
+
+_UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+_RANGE_PATTERN = re.compile(r'\(\s*(-?\d+(?:\.\d+)?)\s+to\s+(-?\d+(?:\.\d+)?)\s*\)')
+_IPV4_MAPPED = b'\0' * 10 + b'\xff\xff'
+_NO_OBJECT: Dict[str, Any] = {}
+
+
+class SchemaError(ValueError):
+    """Raised when a schema descriptor cannot be compiled"""
+
+
+def load_schema(name: str = 'raw_flow_event', path: PathLike = DEFAULT_SCHEMA_PATH) -> Dict[str, Any]:
+    """The `schema` block of an event type in schemas/events.json"""
+    with open(path, 'r', encoding='utf-8') as handle:
+        schemas = json.load(handle)
+    if name not in schemas:
+        raise SchemaError(f"Unknown event type: {name}")
+    return schemas[name]['schema']
+
+
+def _is_int(value: Any) -> bool:
+    return type(value) is int
+
+
+def _is_number(value: Any) -> bool:
+    return type(value) in (int, float)
+
+
+def _is_str(value: Any) -> bool:
+    return type(value) is str
+
+
+def compile_type(descriptor: Any) -> Check:
+    """
+    Compile one schema descriptor into a check of a non-null value
+
+    Descriptors are the strings of schemas/events.json ("integer",
+    "string (UUID)", "number (-100 to 100)", "object (...)"), nested objects,
+    or one-element lists for arrays. Numeric ranges and UUIDs are checked;
+    other hints such as "(IPv4/IPv6)" or "(ISO 8601)" are checked where the
+    ingest converts the value, and value lists like "(low/medium/high)" are
+    documentation only (enrichment reports "unknown" outside them).
+    """
+    if isinstance(descriptor, dict):
+        return compile_object(descriptor)
+    if isinstance(descriptor, list):
+        if len(descriptor) != 1:
+            raise SchemaError(f"Array descriptor needs one element type: {descriptor!r}")
+        item = compile_type(descriptor[0])
+        return lambda value: type(value) is list and all(map(item, value))
+    if not isinstance(descriptor, str):
+        raise SchemaError(f"Unsupported descriptor: {descriptor!r}")
+
+    kind = descriptor.split('(', 1)[0].strip()
+    if kind == 'integer':
+        base = _is_int
+    elif kind == 'number':
+        base = _is_number
+    elif kind == 'string':
+        if 'UUID' in descriptor:
+            matches = _UUID_PATTERN.fullmatch
+            return lambda value: type(value) is str and matches(value) is not None
+        return _is_str
+    elif kind == 'object':
+        return lambda value: type(value) is dict
+    else:
+        raise SchemaError(f"Unsupported descriptor: {descriptor!r}")
+
+    bounds = _RANGE_PATTERN.search(descriptor)
+    if bounds is None:
+        return base
+    low, high = float(bounds.group(1)), float(bounds.group(2))
+    return lambda value: base(value) and low <= value <= high
+
+
+# plain type checks of optional fields, as the set of types (None included) they accept
+_NULLABLE_TYPES = {
+    _is_int: frozenset((int, type(None))),
+    _is_number: frozenset((int, float, type(None))),
+    _is_str: frozenset((str, type(None))),
+}
+
+
+def compile_object(schema: Dict[str, Any]) -> Check:
+    """
+    Check of a nested object: every listed field is optional and may be null
+
+    Fields with a plain type are tested together, one type-set inclusion per
+    type; ranges, UUIDs, arrays and nested objects are checked per field.
+    """
+    grouped: Dict[Check, List[str]] = {}
+    checks = []
+    for key, descriptor in schema.items():
+        field_check = compile_type(descriptor)
+        if field_check in _NULLABLE_TYPES:
+            grouped.setdefault(field_check, []).append(key)
+        else:
+            checks.append((key, field_check))
+    groups = [(tuple(keys), _NULLABLE_TYPES[field_check]) for field_check, keys in grouped.items()]
+
+    def check(value):
+        if type(value) is not dict:
+            return False
+        get = value.get
+        for keys, allowed in groups:
+            if not set(map(type, map(get, keys))) <= allowed:
+                return False
+        for key, field_check in checks:
+            item = get(key)
+            if item is not None and not field_check(item):
+                return False
+        return True
+    return check
+
+
+class RecordValidator:
+    """
+    Validator compiled once from an event schema
+
+    Top-level scalar fields are required and non-null; object and array
+    fields (enrichment, raw_data) are optional but checked when present.
+    The common case runs as a few C-level operations: a key-set inclusion
+    test and one type-set test per group of integer or string fields.
+    `explain()` names the first failing field for the dead-letter file.
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema = schema
+        self.fields: List[Tuple[str, Check, bool]] = []
+        integers, strings = [], []
+        self._other: List[Tuple[str, Check, bool]] = []
+        for key, descriptor in schema.items():
+            required = isinstance(descriptor, str) and not descriptor.startswith('object')
+            check = compile_type(descriptor)
+            self.fields.append((key, check, required))
+            if required and check is _is_int:
+                integers.append(key)
+            elif required and check is _is_str:
+                strings.append(key)
+            else:
+                self._other.append((key, check, required))
+        self.required = frozenset(key for key, _, required in self.fields if required)
+        self._integers = self._getter(integers)
+        self._strings = self._getter(strings)
+
+    @staticmethod
+    def _getter(keys: List[str]) -> Optional[Callable[[Dict[str, Any]], Tuple[Any, ...]]]:
+        if not keys:
+            return None
+        if len(keys) == 1:
+            key = keys[0]
+            return lambda record: (record[key],)
+        return itemgetter(*keys)
+
+    def __call__(self, record: Any) -> bool:
+        if type(record) is not dict or not self.required <= record.keys():
+            return False
+        if self._integers is not None and not set(map(type, self._integers(record))) <= {int}:
+            return False
+        if self._strings is not None and not set(map(type, self._strings(record))) <= {str}:
+            return False
+        for key, check, required in self._other:
+            value = record.get(key)
+            if value is None:
+                if required:
+                    return False
+            elif not check(value):
+                return False
+        return True
+
+    def explain(self, record: Any) -> Optional[str]:
+        """Why a record fails validation (None if it passes)"""
+        if type(record) is not dict:
+            return f"record: expected an object, got {type(record).__name__}"
+        for key, check, required in self.fields:
+            value = record.get(key)
+            if value is None:
+                if required:
+                    return f"{key}: missing"
+            elif not check(value):
+                return f"{key}: expected {self.schema[key] if isinstance(self.schema[key], str) else 'object'}"
+        return None
+
+
+def parse_timestamps(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Epoch seconds of ISO-8601 strings
+
+    "Z" and naive times are read as UTC in one vectorized pass; strings
+    with an explicit offset fall back to datetime parsing.
+
+    Returns:
+        (float64 seconds, bool mask of values that could not be parsed)
+    """
+    count = len(values)
+    seconds = np.zeros(count, dtype=np.float64)
+    invalid = np.zeros(count, dtype=bool)
+    offset_rows = []
+    if sum(map(str.endswith, values, repeat('Z'))) == count:
+        stripped = [value[:-1] for value in values]
+    else:
+        stripped = []
+        for row, value in enumerate(values):
+            if value[-1:] == 'Z':
+                value = value[:-1]
+            elif len(value) > 19 and ('+' in value[19:] or '-' in value[19:]):
+                offset_rows.append(row)
+                value = 'NaT'
+            stripped.append(value)
+
+    try:
+        parsed = np.array(stripped, dtype='datetime64[us]')
+    except ValueError:
+        parsed = np.empty(count, dtype='datetime64[us]')
+        for row, value in enumerate(stripped):
+            try:
+                parsed[row] = np.datetime64(value, 'us')
+            except ValueError:
+                parsed[row] = np.datetime64('NaT')
+                invalid[row] = True
+    seconds[:] = parsed.astype(np.int64) / 1e6
+    invalid |= np.isnat(parsed)
+
+    for row in offset_rows:
+        try:
+            seconds[row] = datetime.fromisoformat(values[row]).timestamp()
+            invalid[row] = False
+        except ValueError:
+            invalid[row] = True
+    return seconds, invalid
+
+
+def pack_ips(values: List[str], cache: Optional[Dict[str, bytes]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    16-byte IP column from address strings (IPv4 as IPv4-mapped IPv6)
+
+    Returns:
+        ((n, 16) uint8 array, bool mask of invalid addresses)
+    """
+    cache = {} if cache is None else cache
+    count = len(values)
+    addresses: Dict[str, bytes] = {}
+    bad = set()
+    for value in dict.fromkeys(values):
+        address = cache.get(value)
+        if address is None:
+            try:
+                address = _IPV4_MAPPED + socket.inet_pton(socket.AF_INET, value)
+            except OSError:
+                try:
+                    address = socket.inet_pton(socket.AF_INET6, value)
+                except OSError:
+                    address = bytes(IP_BYTES)
+                    bad.add(value)
+            if value not in bad:
+                cache[value] = address
+        addresses[value] = address
+
+    array = np.frombuffer(b''.join(map(addresses.__getitem__, values)), dtype=np.uint8).reshape(count, IP_BYTES)
+    invalid = np.fromiter(map(bad.__contains__, values), dtype=bool, count=count) if bad \
+        else np.zeros(count, dtype=bool)
+    return array, invalid
+
+
+def integer_column(values: Union[List[int], np.ndarray], dtype: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Column of `dtype` from Python ints (or an int64 array of them)
+
+    Returns:
+        (array, bool mask of values outside the dtype's range; those become 0)
+    """
+    limits = np.iinfo(dtype)
+    try:
+        array = np.asarray(values, dtype=np.int64)
+    except OverflowError:
+        # beyond int64, which only uint64 columns can hold
+        low, high = int(limits.min), int(limits.max)
+        invalid = np.fromiter((not low <= value <= high for value in values), dtype=bool, count=len(values))
+        return np.array([0 if bad else value for value, bad in zip(values, invalid.tolist())], dtype=dtype), invalid
+    invalid = (array < limits.min) | (array > limits.max)
+    if invalid.any():
+        array = np.where(invalid, 0, array)
+    return array.astype(dtype), invalid
+
+
+@contextmanager
+def _collector_paused() -> Iterator[None]:
+    """
+    Pause cyclic garbage collection
+
+    Decoded JSON holds no reference cycles, but the containers it allocates
+    keep triggering collections that rescan every record waiting in the
+    batch, which costs as much as decoding them.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+
+@dataclass
+class IngestBatch:
+    """Valid records of one batch as typed flow columns, plus the parsed records in the same order"""
+    flows: FlowBatch
+    records: List[Dict[str, Any]]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+@dataclass
+class IngestStats:
+    lines: int = 0
+    bytes: int = 0
+    valid: int = 0
+    invalid: int = 0
+    batches: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+
+
+class JsonLinesIngest:
+    """
+    Streaming ingest of newline-delimited flow JSON
+
+    Input is read in `chunk_bytes` chunks, split on newlines and decoded
+    once per chunk. Every record is checked by a RecordValidator compiled from
+    the schema; timestamps, IPs and integer fields are then converted per
+    batch into FlowBatch columns, with range checks against each column's
+    dtype done as array operations. Records that fail any step are written
+    to the dead-letter file as {"line", "error", "record"} lines.
+    """
+
+    def __init__(self, schema: Union[str, Dict[str, Any]] = 'raw_flow_event',
+                 batch_size: int = DEFAULT_BATCH_SIZE, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                 dead_letter: Optional[PathLike] = None, collector_id: Optional[str] = None):
+        """
+        Args:
+            schema: Event type in schemas/events.json, or a schema block
+            batch_size: Valid records per IngestBatch
+            chunk_bytes: Read size
+            dead_letter: JSON-lines file invalid records are appended to
+                (None: count them only)
+            collector_id: Stored on the produced FlowBatches
+        """
+        self.validator = RecordValidator(load_schema(schema) if isinstance(schema, str) else schema)
+        self.batch_size = batch_size
+        self.chunk_bytes = chunk_bytes
+        self.dead_letter = Path(dead_letter) if dead_letter is not None else None
+        self.collector_id = collector_id
+        self.stats = IngestStats()
+        integers = [name for name in FLOW_FIELDS if name not in IP_FIELDS and name != 'timestamp']
+        self._required_integers = [name for name in integers if name in self.validator.required]
+        self._optional_integers = [name for name in integers if name not in self.validator.required]
+        self._ip_cache: Dict[str, bytes] = {}
+
+    def read(self, source: Union[PathLike, BinaryIO]) -> Iterator[IngestBatch]:
+        """Yield batches of valid records from a file path or binary stream"""
+        if isinstance(source, (str, Path)):
+            with open(source, 'rb') as handle:
+                yield from self.read(handle)
+            return
+
+        dead_letter = open(self.dead_letter, 'a', encoding='utf-8') if self.dead_letter is not None else None
+        try:
+            records: List[Dict[str, Any]] = []
+            lines: List[int] = []
+            for record, line in self._records(source, dead_letter):
+                records.append(record)
+                lines.append(line)
+                if len(records) == self.batch_size:
+                    yield self._batch(records, lines, dead_letter)
+                    records, lines = [], []
+            if records:
+                yield self._batch(records, lines, dead_letter)
+        finally:
+            if dead_letter is not None:
+                dead_letter.close()
+
+    def _records(self, source: BinaryIO, dead_letter: Any) -> Iterator[Tuple[Dict[str, Any], int]]:
+        decode = json.JSONDecoder().decode
+        validate = self.validator
+        stats = self.stats
+        line_number = 0
+        tail = b''
+        while True:
+            chunk = source.read(self.chunk_bytes)
+            if not chunk:
+                if not tail:
+                    break
+                complete, tail = tail, b''
+            else:
+                stats.bytes += len(chunk)
+                complete, newline, tail = (tail + chunk).rpartition(b'\n')
+                if not newline:
+                    tail = complete + tail if complete else tail
+                    continue
+            try:
+                texts = complete.decode('utf-8').split('\n')
+            except UnicodeDecodeError:
+                texts = [line.decode('utf-8', 'replace') for line in complete.split(b'\n')]
+
+            valid = []
+            with _collector_paused():
+                for text in texts:
+                    line_number += 1
+                    if not text or text.isspace():
+                        continue
+                    stats.lines += 1
+                    try:
+                        record = decode(text)
+                    except ValueError as error:
+                        self._reject(dead_letter, line_number, f"json: {getattr(error, 'msg', error)}", text, raw=True)
+                        continue
+                    if validate(record):
+                        valid.append((record, line_number))
+                    else:
+                        self._reject(dead_letter, line_number, validate.explain(record) or "record: invalid", record)
+            yield from valid
+
+    def _batch(self, records: List[Dict[str, Any]], lines: List[int], dead_letter: Any) -> IngestBatch:
+        with _collector_paused():
+            return self._convert(records, lines, dead_letter)
+
+    def _convert(self, records: List[Dict[str, Any]], lines: List[int], dead_letter: Any) -> IngestBatch:
+        count = len(records)
+        invalid = np.zeros(count, dtype=bool)
+        reasons: Dict[int, str] = {}
+        columns: Dict[str, np.ndarray] = {}
+
+        def flag(mask: np.ndarray, reason: str) -> None:
+            for row in np.flatnonzero(mask & ~invalid).tolist():
+                reasons[row] = reason
+            invalid[...] |= mask
+
+        columns['timestamp'], bad = parse_timestamps(list(map(itemgetter('timestamp'), records)))
+        flag(bad, "timestamp: not ISO 8601")
+        for name in IP_FIELDS:
+            columns[name], bad = pack_ips(list(map(itemgetter(name), records)), self._ip_cache)
+            flag(bad, f"{name}: not an IP address")
+
+        # required integers (already type-checked) come out of every record in one pass
+        required = self._required_integers
+        table = None
+        if len(required) > 1:
+            try:
+                table = np.array(list(map(itemgetter(*required), records)), dtype=np.int64)
+                table = table.reshape(count, len(required))
+            except OverflowError:
+                pass  # a value beyond int64; convert column by column
+        for index, name in enumerate(required):
+            values = table[:, index] if table is not None else list(map(itemgetter(name), records))
+            self._integer_column(columns, flag, name, values)
+
+        # optional ones (raw_data.*) default to 0 when absent or not an integer
+        parents: Dict[str, List[Dict[str, Any]]] = {}
+        for name in self._optional_integers:
+            parent, _, key = name.rpartition('.')
+            if parent:
+                if parent not in parents:
+                    parents[parent] = [value if type(value) is dict else _NO_OBJECT
+                                       for value in map(dict.get, records, repeat(parent))]
+                values = list(map(dict.get, parents[parent], repeat(key)))
+            else:
+                values = list(map(dict.get, records, repeat(key)))
+            kinds = set(map(type, values))
+            if kinds == {type(None)}:
+                columns[name] = np.zeros(count, dtype=FLOW_FIELDS[name][0])
+                continue
+            if not kinds <= {int}:
+                values = [value if type(value) is int else 0 for value in values]
+            self._integer_column(columns, flag, name, values)
+
+        keep = ~invalid
+        kept = int(keep.sum())
+        if kept < count:
+            for row, reason in sorted(reasons.items()):
+                self._reject(dead_letter, lines[row], reason, records[row])
+            records = [record for record, valid in zip(records, keep.tolist()) if valid]
+            columns = {name: values[keep] for name, values in columns.items()}
+
+        batch = FlowBatch(kept, self.collector_id)
+        for name, values in columns.items():
+            batch.arrays[name][:] = values
+        batch.size = kept
+        sampling = batch.arrays['raw_data.sampling_rate']
+        sampling[sampling == 0] = 1  # unsampled unless the collector says otherwise
+
+        self.stats.valid += kept
+        self.stats.batches += 1
+        return IngestBatch(batch, records)
+
+    @staticmethod
+    def _integer_column(columns: Dict[str, np.ndarray], flag: Callable[[np.ndarray, str], None],
+                        name: str, values: Union[List[int], np.ndarray]) -> None:
+        dtype = FLOW_FIELDS[name][0]
+        columns[name], invalid = integer_column(values, dtype)
+        flag(invalid, f"{name}: out of range for {np.dtype(dtype).name}")
+
+    def _reject(self, dead_letter: Any, line: int, reason: str, record: Any, raw: bool = False) -> None:
+        """Count a bad record by its field (or "json") and append it to the dead-letter file"""
+        stats = self.stats
+        stats.invalid += 1
+        kind = reason.split(':', 1)[0]
+        stats.errors[kind] = stats.errors.get(kind, 0) + 1
+        if dead_letter is not None:
+            entry = {'line': line, 'error': reason, 'raw' if raw else 'record': record}
+            dead_letter.write(json.dumps(entry, default=str))
+            dead_letter.write('\n')
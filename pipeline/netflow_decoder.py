@@ -0,0 +1,450 @@
+# PyGuardian v3 - NetFlow v9 / IPFIX Decoder
+# Template-cached decoding of export datagrams straight into columnar FlowBatches
+
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline.flow_batch import FlowBatch, set_ipv4
+
+NETFLOW_V9 = 9
+IPFIX = 10
+
+DEFAULT_BATCH_SIZE = 65_536
+
+_V9_HEADER = struct.Struct('!HHIIII')  # version, count, sys_uptime, unix_secs, sequence, source_id
+_IPFIX_HEADER = struct.Struct('!HHIII')  # version, length, export_time, sequence, observation_domain
+_SET_HEADER = struct.Struct('!HH')  # set id, length
+_TEMPLATE_HEADER = struct.Struct('!HH')  # template id, field count
+_V9_OPTIONS_HEADER = struct.Struct('!HHH')  # template id, scope length, option length
+_IPFIX_OPTIONS_HEADER = struct.Struct('!HHH')  # template id, field count, scope field count
+_FIELD = struct.Struct('!HH')  # type, length
+_ENTERPRISE = struct.Struct('!I')
+
+_V9_TEMPLATE_SET = 0
+_V9_OPTIONS_SET = 1
+_IPFIX_TEMPLATE_SET = 2
+_IPFIX_OPTIONS_SET = 3
+_FIRST_DATA_SET = 256
+
+VARIABLE_LENGTH = 65535
+
+# How a decoded field is written to the batch
+_INTEGER = 'integer'
+_IPV4 = 'ipv4'
+_IPV6 = 'ipv6'
+_TIME = 'time'
+_WIDE = 'wide'  # integer of an odd byte length
+_WIDE_TIME = 'wide_time'
+
+# Information element id -> (batch field or time role, kind); ids are shared by v9 and IPFIX
+FIELD_MAP = {
+    1: ('bytes_sent', _INTEGER),  # IN_BYTES / octetDeltaCount
+    2: ('packets_sent', _INTEGER),  # IN_PKTS / packetDeltaCount
+    4: ('protocol', _INTEGER),
+    5: ('tos', _INTEGER),
+    6: ('tcp_flags', _INTEGER),
+    7: ('source_port', _INTEGER),
+    8: ('source_ip', _IPV4),
+    10: ('raw_data.input_interface', _INTEGER),
+    11: ('dest_port', _INTEGER),
+    12: ('dest_ip', _IPV4),
+    14: ('raw_data.output_interface', _INTEGER),
+    21: ('end_uptime', _TIME),  # LAST_SWITCHED, ms of exporter uptime
+    22: ('start_uptime', _TIME),  # FIRST_SWITCHED
+    23: ('bytes_received', _INTEGER),  # OUT_BYTES
+    24: ('packets_received', _INTEGER),  # OUT_PKTS
+    27: ('source_ip', _IPV6),
+    28: ('dest_ip', _IPV6),
+    34: ('raw_data.sampling_rate', _INTEGER),  # SAMPLING_INTERVAL
+    150: ('start_seconds', _TIME),
+    151: ('end_seconds', _TIME),
+    152: ('start_milliseconds', _TIME),
+    153: ('end_milliseconds', _TIME),
+    231: ('bytes_sent', _INTEGER),  # initiatorOctets
+    232: ('bytes_received', _INTEGER),  # responderOctets
+    298: ('packets_sent', _INTEGER),  # initiatorPackets
+    299: ('packets_received', _INTEGER),  # responderPackets
+    305: ('raw_data.sampling_rate', _INTEGER),  # samplingPacketInterval
+}
+
+# Option fields that set an exporter's sampling rate (v9 SAMPLING_INTERVAL, sampler random interval, IPFIX)
+_SAMPLING_FIELDS = frozenset({34, 50, 305})
+
+_UPTIME_MODULUS = 2 ** 32
+
+
+class DecodeError(ValueError):
+    """Raised for datagrams that are not well-formed NetFlow v9 or IPFIX"""
+
+
+@dataclass
+class CompiledTemplate:
+    """
+    A data template compiled to a NumPy record dtype
+
+    Records of fixed-length templates are read with np.frombuffer directly
+    from the datagram; templates with variable-length IPFIX fields list the
+    field lengths so records can be packed to the fixed layout first.
+    """
+    template_id: int
+    record_length: int  # 0 for variable-length templates
+    dtype: np.dtype
+    columns: Tuple[Tuple[str, str, str], ...]  # (batch field or time role, dtype field, kind)
+    lengths: Tuple[int, ...] = ()  # every field's length in order, for variable-length templates
+    options: bool = False
+    fields: Tuple[Tuple[int, int], ...] = ()
+    has_sampling_rate: bool = False
+
+    @property
+    def variable(self) -> bool:
+        return self.record_length == 0
+
+
+def compile_template(template_id: int, fields: List[Tuple[int, int]], options: bool = False) -> CompiledTemplate:
+    """
+    Build the record dtype of a template from its (element id, length) fields
+
+    Unknown and enterprise-specific fields are skipped by offset. Integer
+    fields of 1, 2, 4 or 8 bytes are read as big-endian integers, other
+    lengths as byte arrays that are combined after reading.
+    """
+    names, formats, offsets, columns = [], [], [], []
+    offset = 0
+    variable = any(length == VARIABLE_LENGTH for _, length in fields)
+    seen = set()
+    for position, (element, length) in enumerate(fields):
+        if length == VARIABLE_LENGTH:
+            continue
+        target = FIELD_MAP.get(element)
+        wanted = element in _SAMPLING_FIELDS if options else target is not None
+        if wanted and (target is None or target[0] not in seen):
+            field, kind = target if target is not None else ('raw_data.sampling_rate', _INTEGER)
+            if kind == _IPV4 and length != 4 or kind == _IPV6 and length != 16:
+                raise DecodeError(f"Template {template_id}: element {element} has length {length}")
+            name = f'f{position}'
+            names.append(name)
+            offsets.append(offset)
+            if kind in (_IPV4, _IPV6):
+                formats.append((np.uint8, (length,)))
+            elif length in (1, 2, 4, 8):
+                formats.append(f'>u{length}')
+            else:
+                formats.append((np.uint8, (length,)))
+                kind = _WIDE if kind == _INTEGER else _WIDE_TIME
+            columns.append((field, name, kind))
+            seen.add(field)
+        offset += length
+
+    dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': offset})
+    return CompiledTemplate(
+        template_id=template_id,
+        record_length=0 if variable else offset,
+        dtype=dtype,
+        columns=tuple(columns),
+        lengths=tuple(length for _, length in fields) if variable else (),
+        options=options,
+        fields=tuple(fields),
+        has_sampling_rate='raw_data.sampling_rate' in seen
+    )
+
+
+def _combine_bytes(values: np.ndarray) -> np.ndarray:
+    """Big-endian unsigned integers from an (n, length) byte array"""
+    result = np.zeros(len(values), dtype=np.uint64)
+    for column in range(values.shape[1]):
+        result = (result << np.uint64(8)) | values[:, column]
+    return result
+
+
+def _epoch_seconds(clock: Dict[str, np.ndarray], prefix: str, export_time: float,
+                   sys_uptime: Optional[int]) -> Optional[np.ndarray]:
+    """Epoch seconds from a template's start_* or end_* clock, or None if it exports neither form"""
+    if f'{prefix}_milliseconds' in clock:
+        return clock[f'{prefix}_milliseconds'] / 1000.0
+    if f'{prefix}_seconds' in clock:
+        return clock[f'{prefix}_seconds'].astype(np.float64)
+    if f'{prefix}_uptime' in clock and sys_uptime is not None:
+        return export_time - ((sys_uptime - clock[f'{prefix}_uptime']) % _UPTIME_MODULUS) / 1000.0
+    return None
+
+
+@dataclass
+class DecoderStats:
+    datagrams: int = 0
+    flows: int = 0
+    templates: int = 0
+    missing_template_sets: int = 0
+    malformed: int = 0
+    batches: int = 0
+
+
+class _Exporter:
+    __slots__ = ('templates', 'sampling_rate')
+
+    def __init__(self, sampling_rate: int):
+        self.templates: Dict[int, CompiledTemplate] = {}
+        self.sampling_rate = sampling_rate
+
+
+class NetFlowDecoder:
+    """
+    Decodes NetFlow v9 and IPFIX datagrams into FlowBatches
+
+    Templates are cached per exporter and observation domain (v9 source id),
+    compiled once into a record dtype. Each data set is then decoded with one
+    np.frombuffer over the datagram's memoryview and a slice assignment per
+    field, so no per-flow objects are created. Data sets that arrive before
+    their template are counted and dropped. Options data is only read for
+    the exporter's sampling interval, which becomes `raw_data.sampling_rate`
+    of flows whose template does not carry one.
+
+    Full batches are queued and returned by `drain()`.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, collector_id: Optional[str] = None,
+                 default_sampling_rate: int = 1):
+        self.batch_size = batch_size
+        self.collector_id = collector_id
+        self.default_sampling_rate = default_sampling_rate
+        self.stats = DecoderStats()
+        self._exporters: Dict[Tuple[Hashable, int, int], _Exporter] = {}
+        self._batch = self._new_batch()
+        self._ready: List[FlowBatch] = []
+
+    def decode(self, datagram: bytes, exporter: Hashable = None) -> int:
+        """
+        Decode one export datagram
+
+        Args:
+            datagram: UDP payload
+            exporter: Exporter address; templates are scoped to it
+
+        Returns:
+            Number of flows decoded
+
+        Raises:
+            DecodeError: Unknown version or truncated headers
+        """
+        data = memoryview(datagram)
+        if len(data) < 2:
+            self.stats.malformed += 1
+            raise DecodeError("Datagram is too short")
+        version = int.from_bytes(data[:2], 'big')
+        self.stats.datagrams += 1
+        try:
+            if version == NETFLOW_V9:
+                _, _, sys_uptime, unix_secs, _, domain = _V9_HEADER.unpack_from(data)
+                start, end = _V9_HEADER.size, len(data)
+                times = (float(unix_secs), sys_uptime)
+            elif version == IPFIX:
+                _, length, export_time, _, domain = _IPFIX_HEADER.unpack_from(data)
+                if length > len(data):
+                    raise DecodeError(f"IPFIX message length {length} exceeds datagram ({len(data)} bytes)")
+                start, end = _IPFIX_HEADER.size, length
+                times = (float(export_time), None)
+            else:
+                raise DecodeError(f"Unsupported export version {version}")
+        except struct.error:
+            self.stats.malformed += 1
+            raise DecodeError("Truncated export header") from None
+        except DecodeError:
+            self.stats.malformed += 1
+            raise
+
+        state = self._exporter(exporter, version, domain)
+        flows = 0
+        offset = start
+        while offset + _SET_HEADER.size <= end:
+            set_id, set_length = _SET_HEADER.unpack_from(data, offset)
+            if set_length < _SET_HEADER.size or offset + set_length > end:
+                self.stats.malformed += 1
+                break
+            body = data[offset + _SET_HEADER.size:offset + set_length]
+            if set_id >= _FIRST_DATA_SET:
+                flows += self._data_set(state, set_id, body, version, times)
+            elif set_id in (_V9_TEMPLATE_SET, _IPFIX_TEMPLATE_SET):
+                self._templates(state, body, version == IPFIX)
+            elif set_id in (_V9_OPTIONS_SET, _IPFIX_OPTIONS_SET):
+                self._options_templates(state, body, version == IPFIX)
+            offset += set_length
+        self.stats.flows += flows
+        return flows
+
+    def drain(self, partial: bool = True) -> List[FlowBatch]:
+        """
+        Take the filled batches
+
+        Args:
+            partial: Also take the batch currently being filled
+        """
+        if partial and self._batch.size:
+            self._ready.append(self._batch)
+            self._batch = self._new_batch()
+        ready, self._ready = self._ready, []
+        self.stats.batches += len(ready)
+        return ready
+
+    def templates(self, exporter: Hashable, version: int, domain: int) -> Dict[int, CompiledTemplate]:
+        state = self._exporters.get((exporter, version, domain))
+        return dict(state.templates) if state is not None else {}
+
+    def _new_batch(self) -> FlowBatch:
+        return FlowBatch(self.batch_size, self.collector_id)
+
+    def _exporter(self, exporter: Hashable, version: int, domain: int) -> _Exporter:
+        key = (exporter, version, domain)
+        state = self._exporters.get(key)
+        if state is None:
+            state = self._exporters[key] = _Exporter(self.default_sampling_rate)
+        return state
+
+    def _fields(self, body: memoryview, offset: int, count: int, ipfix: bool) -> Tuple[List[Tuple[int, int]], int]:
+        fields = []
+        for _ in range(count):
+            element, length = _FIELD.unpack_from(body, offset)
+            offset += _FIELD.size
+            if ipfix and element & 0x8000:
+                offset += _ENTERPRISE.size
+                element = -1  # enterprise-specific: skipped by length
+            fields.append((element, length))
+        return fields, offset
+
+    def _templates(self, state: _Exporter, body: memoryview, ipfix: bool) -> None:
+        offset = 0
+        try:
+            while offset + _TEMPLATE_HEADER.size <= len(body):
+                template_id, count = _TEMPLATE_HEADER.unpack_from(body, offset)
+                offset += _TEMPLATE_HEADER.size
+                if template_id < _FIRST_DATA_SET:
+                    break  # padding
+                if count == 0:  # IPFIX template withdrawal
+                    state.templates.pop(template_id, None)
+                    continue
+                fields, offset = self._fields(body, offset, count, ipfix)
+                self._install(state, template_id, fields, options=False)
+        except (struct.error, DecodeError):
+            self.stats.malformed += 1
+
+    def _install(self, state: _Exporter, template_id: int, fields: List[Tuple[int, int]], options: bool) -> None:
+        """Cache a template; exporters resend templates periodically, so unchanged ones are kept"""
+        current = state.templates.get(template_id)
+        if current is not None and current.fields == tuple(fields) and current.options == options:
+            return
+        state.templates[template_id] = compile_template(template_id, fields, options)
+        self.stats.templates += 1
+
+    def _options_templates(self, state: _Exporter, body: memoryview, ipfix: bool) -> None:
+        header = _IPFIX_OPTIONS_HEADER if ipfix else _V9_OPTIONS_HEADER
+        offset = 0
+        try:
+            while offset + header.size <= len(body):
+                template_id, first, second = header.unpack_from(body, offset)
+                offset += header.size
+                if template_id < _FIRST_DATA_SET:
+                    break
+                # IPFIX: field count includes scope fields; v9: byte lengths of scope and option fields
+                count = first if ipfix else (first + second) // _FIELD.size
+                fields, offset = self._fields(body, offset, count, ipfix)
+                self._install(state, template_id, fields, options=True)
+        except (struct.error, DecodeError):
+            self.stats.malformed += 1
+
+    def _records(self, template: CompiledTemplate, body: memoryview) -> np.ndarray:
+        if not template.variable:
+            count = len(body) // template.record_length if template.record_length else 0
+            return np.frombuffer(body, dtype=template.dtype, count=count)
+
+        packed = bytearray()
+        offset = 0
+        fixed = template.dtype.itemsize
+        while True:
+            record = bytearray()
+            try:
+                for length in template.lengths:
+                    if length == VARIABLE_LENGTH:
+                        length = body[offset]
+                        offset += 1
+                        if length == 255:
+                            length = int.from_bytes(body[offset:offset + 2], 'big')
+                            offset += 2
+                        offset += length
+                    else:
+                        record += body[offset:offset + length]
+                        offset += length
+            except IndexError:
+                break
+            if offset > len(body) or len(record) != fixed:
+                break  # padding or truncated record
+            packed += record
+        return np.frombuffer(bytes(packed), dtype=template.dtype)
+
+    def _data_set(self, state: _Exporter, template_id: int, body: memoryview, version: int,
+                  times: Tuple[float, Optional[int]]) -> int:
+        template = state.templates.get(template_id)
+        if template is None:
+            self.stats.missing_template_sets += 1
+            return 0
+        records = self._records(template, body)
+
+        if template.options:
+            for field, name, kind in template.columns:
+                if len(records):
+                    values = _combine_bytes(records[name]) if kind == _WIDE else records[name]
+                    state.sampling_rate = int(values[-1]) or state.sampling_rate
+            return 0
+
+        written = 0
+        while written < len(records):
+            batch = self._batch
+            count = min(batch.remaining, len(records) - written)
+            self._write(batch, template, records[written:written + count], version, times, state)
+            written += count
+            if not batch.remaining:
+                self._ready.append(batch)
+                self._batch = self._new_batch()
+        return written
+
+    def _write(self, batch: FlowBatch, template: CompiledTemplate, records: np.ndarray, version: int,
+               times: Tuple[float, Optional[int]], state: _Exporter) -> None:
+        arrays = batch.arrays
+        rows = slice(batch.size, batch.size + len(records))
+        export_time, sys_uptime = times
+        clock: Dict[str, np.ndarray] = {}
+
+        for field, name, kind in template.columns:
+            values = records[name]
+            if kind == _INTEGER or kind == _IPV6:
+                arrays[field][rows] = values
+            elif kind == _IPV4:
+                set_ipv4(arrays[field][rows], values)
+            elif kind == _WIDE:
+                arrays[field][rows] = _combine_bytes(values)
+            else:
+                clock[field] = (_combine_bytes(values) if kind == _WIDE_TIME else values).astype(np.int64)
+
+        arrays['raw_data.netflow_version'][rows] = version
+        if not template.has_sampling_rate:
+            arrays['raw_data.sampling_rate'][rows] = state.sampling_rate
+
+        # Duration from whichever pair of clocks the template exports
+        if 'start_milliseconds' in clock and 'end_milliseconds' in clock:
+            arrays['duration'][rows] = np.maximum(clock['end_milliseconds'] - clock['start_milliseconds'], 0) // 1000
+        elif 'start_seconds' in clock and 'end_seconds' in clock:
+            arrays['duration'][rows] = np.maximum(clock['end_seconds'] - clock['start_seconds'], 0)
+        elif 'start_uptime' in clock and 'end_uptime' in clock:
+            arrays['duration'][rows] = ((clock['end_uptime'] - clock['start_uptime']) % _UPTIME_MODULUS) // 1000
+
+        # FlowBatch.timestamp is the flow start: the start clock when exported,
+        # otherwise the end clock (or export time) less the duration
+        start = _epoch_seconds(clock, 'start', export_time, sys_uptime)
+        if start is None:
+            end = _epoch_seconds(clock, 'end', export_time, sys_uptime)
+            start = (export_time if end is None else end) - arrays['duration'][rows]
+        arrays['timestamp'][rows] = start
+
+        batch.size = rows.stop
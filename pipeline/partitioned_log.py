@@ -0,0 +1,784 @@
+# PyGuardian v3 - Embedded Partitioned Log
+# File-backed, partitioned append-only log with consumer offsets; a Kafka stand-in for single-node installs
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# Directory the log keeps topic partitions and consumer offsets in
+DEFAULT_LOG_DIR = Path(os.environ.get('PYGUARDIAN_LOG_DIR', 'data/log'))
+
+DEFAULT_PARTITIONS = 4
+DEFAULT_SEGMENT_BYTES = 64 * 2**20
+DEFAULT_FLUSH_INTERVAL = 0.005  # seconds between group-commit fsyncs
+DEFAULT_MAX_POLL_RECORDS = 500
+DEFAULT_AUTO_COMMIT_INTERVAL = 5.0
+
+EARLIEST = 'earliest'
+LATEST = 'latest'
+
+# body length, CRC-32 of the body, base offset, record count, append time (epoch ms)
+_BATCH_HEADER = struct.Struct('<IIQIq')
+# key length (-1: no key), value length
+_RECORD_HEADER = struct.Struct('<ii')
+_SEGMENT_PATTERN = re.compile(r'^(\d{20})\.log$')
+_PARTITION_PATTERN = re.compile(r'^(.+)-(\d+)$')
+_TOPIC_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+_OFFSETS_DIR = '__consumer_offsets'
+
+PathLike = Union[str, Path]
+TopicPartition = Tuple[str, int]
+
+
+class LogError(Exception):
+    """Raised for unknown topics or partitions and failed writes"""
+
+
+class OffsetOutOfRange(LogError):
+    """Raised when reading before the start (retention) or past the end of a partition"""
+
+
+@dataclass(slots=True, frozen=True)
+class LogRecord:
+    topic: str
+    partition: int
+    offset: int
+    timestamp: float  # append time, epoch seconds
+    key: Optional[bytes]
+    value: bytes
+
+
+def encode_records(values: Sequence[bytes], keys: Optional[Sequence[Optional[bytes]]] = None) -> bytes:
+    """Body of a batch: (key length, value length, key, value) per record"""
+    pack = _RECORD_HEADER.pack
+    parts = []
+    append = parts.append
+    if keys is None:
+        for value in values:
+            append(pack(-1, len(value)))
+            append(value)
+    else:
+        for key, value in zip(keys, values):
+            if key is None:
+                append(pack(-1, len(value)))
+            else:
+                append(pack(len(key), len(value)))
+                append(key)
+            append(value)
+    return b''.join(parts)
+
+
+def _fsync_directory(path: Path) -> None:
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class _Segment:
+    """One segment file, named by its first offset, with the offset and position of every batch"""
+
+    def __init__(self, path: Path, base_offset: int):
+        self.path = path
+        self.base_offset = base_offset
+        self.next_offset = base_offset
+        self.size = 0
+        self.modified = time.time()
+        self.positions: List[int] = []
+        self.offsets: List[int] = []  # base offset of each batch; appended after its position
+        self.descriptor: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def open_for_append(self) -> None:
+        self.descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def append(self, header: bytes, body: bytes, base: int, count: int) -> None:
+        written = os.writev(self.descriptor, (header, body))
+        if written != len(header) + len(body):
+            raise LogError(f"Short write to {self.path}: {written} of {len(header) + len(body)} bytes")
+        self.positions.append(self.size)
+        self.offsets.append(base)
+        self.size += written
+        self.next_offset = base + count
+        self.modified = time.time()
+
+    def view(self, limit: int) -> mmap.mmap:
+        """A read-only map covering at least `limit` bytes; the file is remapped as it grows"""
+        mapped = self._map
+        if mapped is None or len(mapped) < limit:
+            with open(self.path, 'rb') as handle:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self._map = mapped
+        return mapped
+
+    def recover(self, verify: bool) -> int:
+        """
+        Index the batches in the file
+
+        Scanning stops at the first batch that is cut short, out of sequence
+        or (with `verify`) fails its CRC; in the active segment that tail is
+        what a crash left unsynced, and it is truncated away.
+
+        Returns:
+            Bytes truncated
+        """
+        size = self.path.stat().st_size
+        self.modified = self.path.stat().st_mtime
+        if not size:
+            return 0
+        view = self.view(size)
+        header = _BATCH_HEADER.size
+        position, expected = 0, self.base_offset
+        while position + header <= size:
+            length, crc, base, count, _ = _BATCH_HEADER.unpack_from(view, position)
+            end = position + header + length
+            if end > size or base != expected or not count \
+                    or (verify and zlib.crc32(view[position + header:end]) != crc):
+                break
+            self.positions.append(position)
+            self.offsets.append(base)
+            position, expected = end, base + count
+        self.size, self.next_offset = position, expected
+        if not verify or position == size:
+            return 0
+        self._map = None
+        view.close()
+        os.truncate(self.path, position)
+        return size - position
+
+    def close(self) -> None:
+        if self.descriptor is not None:
+            os.close(self.descriptor)
+            self.descriptor = None
+        self._map = None
+
+
+class _Partition:
+    """
+    Segments of one topic partition
+
+    Appends hold `_lock` only for the write(2) of an encoded batch; `sync()`
+    fsyncs outside it, so producers keep appending during the fsync and the
+    next round covers them. Records become readable once synced (`durable`).
+    """
+
+    def __init__(self, directory: Path, topic: str, number: int, log: PartitionedLog):
+        self.directory = directory
+        self.topic = topic
+        self.number = number
+        self.log = log
+        self.segments: List[_Segment] = []
+        self.end = 0
+        self.durable = 0
+        self.dirty = False
+        self.truncated_bytes = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._retired: List[int] = []  # descriptors of rolled segments awaiting their last fsync
+        self._open()
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        bases = sorted(int(match.group(1)) for match in map(_SEGMENT_PATTERN.match, os.listdir(self.directory))
+                       if match)
+        for index, base in enumerate(bases):
+            segment = _Segment(self.directory / f"{base:020d}.log", base)
+            self.truncated_bytes += segment.recover(verify=index == len(bases) - 1)
+            self.segments.append(segment)
+        if not self.segments:
+            self.segments.append(_Segment(self.directory / f"{0:020d}.log", 0))
+        self.segments[-1].open_for_append()
+        self.end = self.durable = self.segments[-1].next_offset
+
+    @property
+    def start(self) -> int:
+        return self.segments[0].base_offset
+
+    def append(self, body: bytes, count: int, timestamp_ms: int) -> int:
+        """Write one batch of `count` encoded records; returns its base offset"""
+        crc = zlib.crc32(body)
+        with self._lock:
+            base = self.end
+            header = _BATCH_HEADER.pack(len(body), crc, base, count, timestamp_ms)
+            active = self.segments[-1]
+            if active.size and active.size + len(header) + len(body) > self.log.segment_bytes:
+                active = self._roll()
+            active.append(header, body, base, count)
+            self.end = base + count
+            self.dirty = True
+        return base
+
+    def _roll(self) -> _Segment:
+        old = self.segments[-1]
+        self._retired.append(old.descriptor)
+        old.descriptor = None
+        segment = _Segment(self.directory / f"{self.end:020d}.log", self.end)
+        segment.open_for_append()
+        self.segments.append(segment)
+        self._apply_retention()
+        return segment
+
+    def _apply_retention(self) -> None:
+        """Delete the oldest closed segments beyond the size or age limits"""
+        retention_bytes, retention_seconds = self.log.retention_bytes, self.log.retention_seconds
+        total = sum(segment.size for segment in self.segments)
+        now = time.time()
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            if not ((retention_bytes is not None and total > retention_bytes)
+                    or (retention_seconds is not None and now - oldest.modified > retention_seconds)):
+                break
+            self.segments.pop(0)
+            total -= oldest.size
+            oldest.close()
+            oldest.path.unlink(missing_ok=True)
+
+    def sync(self) -> bool:
+        """fsync appended batches and make them readable; returns whether there was anything to sync"""
+        with self._sync_lock:
+            with self._lock:
+                if not self.dirty and not self._retired:
+                    return False
+                retired, self._retired = self._retired, []
+                descriptor, end = self.segments[-1].descriptor, self.end
+                self.dirty = False
+            for old in retired:
+                os.fsync(old)
+                os.close(old)
+            if retired:
+                _fsync_directory(self.directory)
+            if descriptor is not None:
+                # a roll during this fsync only retires the descriptor; the next sync closes it
+                os.fsync(descriptor)
+            self.durable = end
+            return True
+
+    def read(self, offset: int, max_records: int) -> List[LogRecord]:
+        """Up to `max_records` durable records from `offset`"""
+        with self._lock:
+            segments = list(self.segments)
+        durable = self.durable
+        if offset < segments[0].base_offset or offset > durable:
+            raise OffsetOutOfRange(f"{self.topic}-{self.number}: offset {offset} outside "
+                                   f"[{segments[0].base_offset}, {durable}]")
+        records: List[LogRecord] = []
+        if offset == durable:
+            return records
+
+        topic, number = self.topic, self.number
+        header = _BATCH_HEADER.size
+        unpack_batch, unpack_record = _BATCH_HEADER.unpack_from, _RECORD_HEADER.unpack_from
+        limit = min(offset + max_records, durable)
+        index = max(bisect_right([segment.base_offset for segment in segments], offset) - 1, 0)
+        for segment in segments[index:]:
+            batch = max(bisect_right(segment.offsets, offset) - 1, 0)
+            view = None
+            while batch < len(segment.offsets) and segment.offsets[batch] < limit:
+                position = segment.positions[batch]
+                try:
+                    if view is None or len(view) < position + header:
+                        view = segment.view(position + header)
+                    length, _, base, count, timestamp_ms = unpack_batch(view, position)
+                    if len(view) < position + header + length:
+                        view = segment.view(position + header + length)
+                except FileNotFoundError:
+                    # retention deleted the segment after the list was copied; maps taken
+                    # before the delete stay readable, so records read so far are valid
+                    if records:
+                        return records
+                    raise OffsetOutOfRange(f"{self.topic}-{self.number}: offset {offset} was deleted "
+                                           f"by retention") from None
+                seconds = timestamp_ms / 1000
+                cursor = position + header
+                for record_offset in range(base, min(base + count, limit)):
+                    key_length, value_length = unpack_record(view, cursor)
+                    cursor += 8
+                    key = None
+                    if key_length >= 0:
+                        key = view[cursor:cursor + key_length]
+                        cursor += key_length
+                    if record_offset >= offset:
+                        records.append(LogRecord(topic, number, record_offset, seconds, key,
+                                                 view[cursor:cursor + value_length]))
+                    cursor += value_length
+                batch += 1
+            if records and records[-1].offset + 1 >= limit:
+                break
+        return records
+
+    def close(self) -> None:
+        self.sync()
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+
+
+class PartitionedLog:
+    """
+    Embedded, file-backed partitioned log for single-node deployments
+
+    Stands in for Kafka between collectors, enrichment, detectors and the
+    correlator when one box runs the whole pipeline. Each topic partition
+    is a directory of append-only segment files (`<topic>-<n>/<offset>.log`)
+    holding CRC-checked batches of (key, value) byte records; batches are
+    written whole, records are read through memory maps, and a background
+    flusher fsyncs all partitions every `flush_interval` seconds, so one
+    fsync commits every batch appended since the last (group commit).
+    Records become visible to consumers once synced, so nothing a consumer
+    has seen can be lost in a crash; on restart the torn tail of each
+    partition is truncated.
+
+    Keyed records go to the partition of the key's CRC-32, like Kafka's
+    default partitioner keeps a key's events in order; unkeyed batches go
+    to partitions in turn. Consumer groups keep committed offsets under
+    `__consumer_offsets/`.
+    """
+
+    def __init__(self, directory: PathLike = DEFAULT_LOG_DIR,
+                 partitions: int = DEFAULT_PARTITIONS,
+                 segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 retention_bytes: Optional[int] = None,
+                 retention_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            directory: Log directory (created if missing)
+            partitions: Partitions of topics created on first produce
+            segment_bytes: Size at which a partition starts a new segment file
+            flush_interval: Seconds between group-commit fsyncs; 0 fsyncs
+                inside every produce call instead
+            retention_bytes: Per-partition size beyond which the oldest
+                segments are deleted (None: unlimited)
+            retention_seconds: Age beyond which closed segments are deleted
+            clock: Source of record append times
+        """
+        self.directory = Path(directory)
+        self.default_partitions = partitions
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.clock = clock
+
+        self._topics: Dict[str, List[_Partition]] = {}
+        self._topics_lock = threading.Lock()
+        self._offsets_lock = threading.Lock()
+        self._next_partition: Dict[str, int] = {}
+        self._synced = threading.Condition()
+        self._sync_rounds = 0
+        self._flush_requested = threading.Event()
+        self._closed = False
+
+        self.produced = 0
+        self.batches = 0
+        self.fsync_rounds = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_topics()
+        self._flusher: Optional[threading.Thread] = None
+        if flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name='partitioned-log-flush', daemon=True)
+            self._flusher.start()
+
+    def __enter__(self) -> PartitionedLog:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _load_topics(self) -> None:
+        found: Dict[str, List[int]] = {}
+        for entry in os.listdir(self.directory):
+            match = _PARTITION_PATTERN.match(entry)
+            if match and (self.directory / entry).is_dir():
+                found.setdefault(match.group(1), []).append(int(match.group(2)))
+        for topic, numbers in found.items():
+            self._topics[topic] = [_Partition(self.directory / f"{topic}-{number}", topic, number, self)
+                                   for number in range(max(numbers) + 1)]
+
+    def create_topic(self, topic: str, partitions: Optional[int] = None) -> int:
+        """
+        Create a topic if it does not exist
+
+        Returns:
+            Its partition count (an existing topic keeps its own)
+        """
+        with self._topics_lock:
+            existing = self._topics.get(topic)
+            if existing is not None:
+                return len(existing)
+            if not _TOPIC_PATTERN.match(topic):
+                raise LogError(f"Invalid topic name: {topic!r}")
+            count = partitions or self.default_partitions
+            self._topics[topic] = [_Partition(self.directory / f"{topic}-{number}", topic, number, self)
+                                   for number in range(count)]
+            _fsync_directory(self.directory)
+            return count
+
+    def topics(self) -> Dict[str, int]:
+        """Topic -> partition count"""
+        return {topic: len(partitions) for topic, partitions in self._topics.items()}
+
+    def _partitions(self, topic: str, create: bool = False) -> List[_Partition]:
+        partitions = self._topics.get(topic)
+        if partitions is None:
+            if not create:
+                raise LogError(f"Unknown topic: {topic}")
+            self.create_topic(topic)
+            partitions = self._topics[topic]
+        return partitions
+
+    def _partition(self, topic: str, partition: int) -> _Partition:
+        partitions = self._partitions(topic)
+        if not 0 <= partition < len(partitions):
+            raise LogError(f"{topic} has no partition {partition}")
+        return partitions[partition]
+
+    def partition_for(self, topic: str, key: Optional[bytes]) -> int:
+        """Partition a record goes to: by key CRC-32, or the next partition in turn for unkeyed records"""
+        count = len(self._partitions(topic, create=True))
+        if key is not None:
+            return zlib.crc32(key) % count
+        turn = self._next_partition.get(topic, 0)
+        self._next_partition[topic] = turn + 1
+        return turn % count
+
+    def produce(self, topic: str, value: bytes, key: Optional[bytes] = None,
+                partition: Optional[int] = None, sync: bool = False) -> Tuple[int, int]:
+        """
+        Append one record
+
+        Args:
+            sync: Wait until the record is fsynced (shares the next group commit)
+
+        Returns:
+            (partition, offset)
+        """
+        ranges = self.produce_batch(topic, [value], None if key is None else [key], partition, sync)
+        (number, offsets), = ranges.items()
+        return number, offsets.start
+
+    def produce_batch(self, topic: str, values: Sequence[bytes],
+                      keys: Optional[Sequence[Optional[bytes]]] = None,
+                      partition: Optional[int] = None, sync: bool = False) -> Dict[int, range]:
+        """
+        Append records as one batch per partition
+
+        Without keys or `partition` the whole batch goes to the next
+        partition in turn; with keys each record goes to its key's partition.
+
+        Returns:
+            Partition -> offsets its records were written at
+        """
+        if self._closed:
+            raise LogError("Log is closed")
+        partitions = self._partitions(topic, create=True)
+        if not values:
+            return {}
+        if partition is None and keys is None:
+            partition = self.partition_for(topic, None)
+        if partition is not None:
+            groups = {partition: (values, keys)}
+        else:
+            count = len(partitions)
+            split: Dict[int, Tuple[List[bytes], List[Optional[bytes]]]] = {}
+            for key, value in zip(keys, values):
+                number = zlib.crc32(key) % count if key is not None else self.partition_for(topic, None)
+                group = split.get(number)
+                if group is None:
+                    group = split[number] = ([], [])
+                group[0].append(value)
+                group[1].append(key)
+            groups = split
+
+        timestamp_ms = int(self.clock() * 1000)
+        ranges = {}
+        for number, (group_values, group_keys) in groups.items():
+            target = self._partition(topic, number)
+            base = target.append(encode_records(group_values, group_keys), len(group_values), timestamp_ms)
+            ranges[number] = range(base, base + len(group_values))
+        self.produced += len(values)
+        self.batches += len(ranges)
+
+        if self._flusher is None:
+            self._sync_all()
+        elif sync:
+            self._wait_durable(topic, ranges)
+        return ranges
+
+    def _wait_durable(self, topic: str, ranges: Dict[int, range]) -> None:
+        targets = [(self._partition(topic, number), offsets.stop) for number, offsets in ranges.items()]
+        with self._synced:
+            while not all(target.durable >= stop for target, stop in targets):
+                self._flush_requested.set()
+                self._synced.wait(max(self.flush_interval, 0.001))
+
+    def flush(self) -> None:
+        """fsync everything appended so far and make it readable"""
+        self._sync_all()
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            self._sync_all()
+
+    def _sync_all(self) -> None:
+        synced = False
+        for partitions in list(self._topics.values()):
+            for target in partitions:
+                synced |= target.sync()
+        if synced:
+            with self._synced:
+                self._sync_rounds += 1
+                self.fsync_rounds += 1
+                self._synced.notify_all()
+
+    def start_offset(self, topic: str, partition: int) -> int:
+        """First offset still retained"""
+        return self._partition(topic, partition).start
+
+    def end_offset(self, topic: str, partition: int) -> int:
+        """Offset after the last readable (synced) record"""
+        return self._partition(topic, partition).durable
+
+    def read(self, topic: str, partition: int, offset: int,
+             max_records: int = DEFAULT_MAX_POLL_RECORDS) -> List[LogRecord]:
+        """
+        Up to `max_records` records of a partition from `offset`
+
+        Raises:
+            OffsetOutOfRange: `offset` was deleted by retention or is past the end
+        """
+        return self._partition(topic, partition).read(offset, max_records)
+
+    def wait_for_data(self, seen_round: int, timeout: float) -> int:
+        """Block until a sync round after `seen_round` (or timeout); returns the current round"""
+        with self._synced:
+            if self._sync_rounds == seen_round and timeout > 0:
+                self._synced.wait(timeout)
+            return self._sync_rounds
+
+    @property
+    def sync_round(self) -> int:
+        return self._sync_rounds
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def consumer(self, group: str, topics: Iterable[str], **options: Any) -> LogConsumer:
+        """A LogConsumer in `group` reading every partition of `topics` (see LogConsumer)"""
+        return LogConsumer(self, group, topics, **options)
+
+    def committed(self, group: str) -> Dict[TopicPartition, int]:
+        """Offsets committed by a consumer group"""
+        path = self.directory / _OFFSETS_DIR / f"{group}.json"
+        with self._offsets_lock:
+            if not path.exists():
+                return {}
+            with open(path, 'r', encoding='utf-8') as handle:
+                saved = json.load(handle)
+        return {(topic, int(number)): offset for topic, partitions in saved.items()
+                for number, offset in partitions.items()}
+
+    def commit(self, group: str, offsets: Dict[TopicPartition, int]) -> None:
+        """Merge `offsets` into a group's committed offsets (written atomically)"""
+        directory = self.directory / _OFFSETS_DIR
+        directory.mkdir(exist_ok=True)
+        path = directory / f"{group}.json"
+        with self._offsets_lock:
+            saved: Dict[str, Dict[str, int]] = {}
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as handle:
+                    saved = json.load(handle)
+            for (topic, number), offset in offsets.items():
+                saved.setdefault(topic, {})[str(number)] = offset
+            temporary = path.with_suffix('.tmp')
+            with open(temporary, 'w', encoding='utf-8') as handle:
+                json.dump(saved, handle)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temporary, path)
+
+    def close(self) -> None:
+        """Stop the flusher, fsync what is left and close every segment"""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_requested.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        for partitions in self._topics.values():
+            for target in partitions:
+                target.close()
+        with self._synced:
+            self._sync_rounds += 1
+            self._synced.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        partitions = [target for targets in self._topics.values() for target in targets]
+        return {
+            'topics': len(self._topics),
+            'partitions': len(partitions),
+            'produced': self.produced,
+            'batches': self.batches,
+            'fsync_rounds': self.fsync_rounds,
+            'records_per_fsync': self.produced / self.fsync_rounds if self.fsync_rounds else 0.0,
+            'segments': sum(len(target.segments) for target in partitions),
+            'bytes': sum(segment.size for target in partitions for segment in target.segments),
+            'truncated_bytes': sum(target.truncated_bytes for target in partitions),
+        }
+
+
+class LogConsumer:
+    """
+    Reads assigned topic partitions of a PartitionedLog from a group's committed offsets
+
+    Without explicit `partitions` a consumer takes every partition of its
+    topics; several consumers of one group split work by passing disjoint
+    `partitions`. `poll()` returns records in offset order per partition,
+    visiting partitions in turn. Positions are committed with `commit()`,
+    every `auto_commit_interval` seconds from `poll()`, and on `close()`;
+    `positions()` / `seek_to()` also let a detector store them with its
+    state snapshot instead.
+    """
+
+    def __init__(self, log: PartitionedLog, group: str, topics: Iterable[str],
+                 partitions: Optional[Iterable[TopicPartition]] = None,
+                 auto_offset_reset: str = EARLIEST,
+                 auto_commit_interval: Optional[float] = DEFAULT_AUTO_COMMIT_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            log: Log to read
+            group: Consumer group whose committed offsets are used
+            topics: Topics to read (created if missing)
+            partitions: Explicit (topic, partition) assignment
+            auto_offset_reset: Where to start without a committed offset,
+                or after falling out of retention: EARLIEST or LATEST
+            auto_commit_interval: Seconds between commits from poll()
+                (None: only explicit commits)
+            clock: Monotonic clock for auto-commit
+        """
+        if auto_offset_reset not in (EARLIEST, LATEST):
+            raise LogError(f"auto_offset_reset must be {EARLIEST!r} or {LATEST!r}")
+        self.log = log
+        self.group = group
+        self.auto_offset_reset = auto_offset_reset
+        self.auto_commit_interval = auto_commit_interval
+        self.clock = clock
+
+        topics = list(topics)
+        for topic in topics:
+            log.create_topic(topic)
+        if partitions is None:
+            partitions = [(topic, number) for topic in topics for number in range(log.topics()[topic])]
+        self._assignment: List[TopicPartition] = list(partitions)
+        committed = log.committed(group)
+        self._positions: Dict[TopicPartition, int] = {}
+        for topic, number in self._assignment:
+            position = committed.get((topic, number))
+            self._positions[(topic, number)] = position if position is not None else self._reset(topic, number)
+        self._committed = {key: committed.get(key) for key in self._assignment}
+        self._turn = 0
+        self._last_commit = clock()
+        self.resets = 0
+
+    def assignment(self) -> List[TopicPartition]:
+        return list(self._assignment)
+
+    def _reset(self, topic: str, number: int) -> int:
+        return self.log.start_offset(topic, number) if self.auto_offset_reset == EARLIEST \
+            else self.log.end_offset(topic, number)
+
+    def poll(self, max_records: int = DEFAULT_MAX_POLL_RECORDS, timeout: float = 0.0) -> List[LogRecord]:
+        """
+        Records after the current positions, advancing them
+
+        Args:
+            max_records: Upper bound on records returned
+            timeout: Seconds to wait for new records when none are available
+        """
+        deadline = None
+        while True:
+            seen = self.log.sync_round
+            records = self._fetch(max_records)
+            if records or timeout <= 0:
+                break
+            now = time.monotonic()
+            deadline = now + timeout if deadline is None else deadline
+            if now >= deadline or self.log.closed:
+                break
+            self.log.wait_for_data(seen, deadline - now)
+
+        if self.auto_commit_interval is not None and self.clock() - self._last_commit >= self.auto_commit_interval:
+            self.commit()
+        return records
+
+    def _fetch(self, max_records: int) -> List[LogRecord]:
+        records: List[LogRecord] = []
+        assignment = self._assignment
+        count = len(assignment)
+        for step in range(count):
+            if len(records) >= max_records:
+                break
+            topic, number = key = assignment[(self._turn + step) % count]
+            position = self._positions[key]
+            try:
+                fetched = self.log.read(topic, number, position, max_records - len(records))
+            except OffsetOutOfRange:
+                self.resets += 1
+                position = self._positions[key] = self._reset(topic, number)
+                fetched = self.log.read(topic, number, position, max_records - len(records))
+            if fetched:
+                records.extend(fetched)
+                self._positions[key] = fetched[-1].offset + 1
+        self._turn = (self._turn + 1) % max(count, 1)
+        return records
+
+    def positions(self) -> Dict[TopicPartition, int]:
+        """(topic, partition) -> next offset to read"""
+        return dict(self._positions)
+
+    def seek(self, topic: str, partition: int, offset: int) -> None:
+        if (topic, partition) not in self._positions:
+            raise LogError(f"{topic}-{partition} is not assigned to this consumer")
+        self._positions[(topic, partition)] = offset
+
+    def seek_to(self, offsets: Dict[TopicPartition, int]) -> None:
+        """Move to saved positions (e.g. offsets restored with a state snapshot)"""
+        for (topic, partition), offset in offsets.items():
+            if (topic, partition) in self._positions:
+                self.seek(topic, partition, offset)
+
+    def lag(self) -> Dict[TopicPartition, int]:
+        """Readable records not yet consumed, per partition"""
+        return {(topic, number): self.log.end_offset(topic, number) - position
+                for (topic, number), position in self._positions.items()}
+
+    def commit(self) -> None:
+        """Commit the current positions of the group"""
+        changed = {key: position for key, position in self._positions.items()
+                   if self._committed.get(key) != position}
+        if changed:
+            self.log.commit(self.group, changed)
+            self._committed.update(changed)
+        self._last_commit = self.clock()
+
+    def close(self) -> None:
+        if self.auto_commit_interval is not None:
+            self.commit()
@@ -0,0 +1,44 @@
+# PyGuardian v3 - Action Executor Tests
+# stop() returns even when a pool's queue is full
+
+from __future__ import annotations
+
+import threading
+import time
+
+from detection.action_executor import NOTIFY, ActionExecutor, PoolConfig
+
+
+def full_pool_executor(handler=lambda request: None) -> ActionExecutor:
+    executor = ActionExecutor({NOTIFY: handler}, pools={NOTIFY: PoolConfig(workers=1, queue_size=2)})
+    pool = executor._pools[NOTIFY]
+    for _ in range(2):
+        pool.queue.put_nowait(None)
+    return executor
+
+
+def test_stop_with_full_queue_and_dead_workers_returns():
+    executor = full_pool_executor()
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    executor._pools[NOTIFY].threads = [dead]
+
+    started = time.monotonic()
+    executor.stop()
+    assert time.monotonic() - started < 1.0
+
+
+def test_stop_with_full_queue_and_busy_worker_honours_timeout():
+    release = threading.Event()
+    executor = full_pool_executor()
+    pool = executor._pools[NOTIFY]
+    busy = threading.Thread(target=release.wait, daemon=True)
+    busy.start()
+    pool.threads = [busy]
+
+    started = time.monotonic()
+    executor.stop(timeout=0.3)
+    assert time.monotonic() - started < 1.5
+    assert pool.threads == [busy]
+    release.set()
@@ -0,0 +1,37 @@
+# PyGuardian v3 - Aggregation Store Tests
+# Regression tests for windowed aggregation change tracking and snapshot encoding
+
+from __future__ import annotations
+
+from detection.aggregation_store import AggregationSpec, WindowedAggregator
+from detection.state_snapshot import BASE, decode_snapshot, encode_snapshot
+
+
+def make_aggregator() -> WindowedAggregator:
+    spec = AggregationSpec.from_rule({'group_by': ['source_ip'], 'time_window': '60s',
+                                      'threshold': {'count': 100}})
+    return WindowedAggregator(spec, bucket_count=12)
+
+
+def test_drain_changes_reports_rolled_out_keys_as_removed():
+    aggregator = make_aggregator()
+    aggregator.track_changes()
+    aggregator.add_value(('X',), None, 50.0)
+    aggregator.drain_changes()
+
+    aggregator.add_value(('A',), None, 0.0)  # late, but still inside the window
+    aggregator.add_value(('Y',), None, 65.0)
+    aggregator.expire()  # stops at X, so A stays tracked
+    assert aggregator.value(('A',)) == 0  # rolls A's only bucket out
+
+    changed, removed = aggregator.drain_changes()
+    assert changed == [('Y',)]
+    assert removed == [('A',)]
+
+
+def test_snapshot_round_trip_keeps_tuple_keys():
+    payload = {'offsets': {('raw-flows', 0): 42}, 'aggregators': {},
+               'states': [(('10.0.0.1',), [(3, 1, 0, None)])]}
+    kind, sequence, decoded = decode_snapshot(encode_snapshot(BASE, 7, payload))
+    assert (kind, sequence) == (BASE, 7)
+    assert decoded == payload
@@ -0,0 +1,27 @@
+# PyGuardian v3 - Alert Suppression Tests
+# Pending roll-up updates stay bounded by the open alerts
+
+from __future__ import annotations
+
+from detection.alert_suppression import AlertSuppressor
+
+
+def test_updates_are_bounded_by_open_alerts_without_draining():
+    suppressor = AlertSuppressor(dedup_window=10, max_alerts_per_rule_per_hour=None, max_open_alerts=20)
+    for step in range(20_000):
+        suppressor.submit('rule', step % 30, timestamp=step / 100)
+        assert len(suppressor._updated) <= len(suppressor)
+
+
+def test_updates_of_expired_alerts_are_dropped():
+    suppressor = AlertSuppressor(dedup_window=10)
+    suppressor.submit('rule', 'a', timestamp=0)
+    suppressor.submit('rule', 'a', timestamp=1)
+    suppressor.submit('rule', 'b', timestamp=5)
+    suppressor.submit('rule', 'b', timestamp=6)
+    assert {alert.group_key for alert in suppressor.drain_updates()} == {'a', 'b'}
+
+    suppressor.submit('rule', 'a', timestamp=2)
+    suppressor.submit('rule', 'b', timestamp=7)
+    suppressor.expire(12)  # closes 'a' only
+    assert [alert.group_key for alert in suppressor.drain_updates()] == ['b']
@@ -0,0 +1,96 @@
+# PyGuardian v3 - Batch Evaluator Tests
+# BatchRuleEvaluator masks must match the per-event compiled predicates
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List
+
+import pytest
+
+from benchmarks.synthetic_flows import FlowProfile, SyntheticFlowGenerator
+from detection.batch_evaluator import BatchRuleEvaluator
+from detection.rule_compiler import DEFAULT_RULES_PATH, compile_rule, load_rule_file
+
+# Extra rules for operators and value shapes the example rules do not use
+EXTRA_RULES = [
+    {'id': 'in-ports', 'conditions': [
+        {'field': 'dest_port', 'operator': 'in', 'value': [22, 3389, 445]}]},
+    {'id': 'not-in-countries', 'conditions': [
+        {'field': 'enrichment.geolocation.dest.country', 'operator': 'not_in', 'value': ['Russia', 'China']}]},
+    {'id': 'contains-any-legitimate', 'conditions': [
+        {'field': 'enrichment.threat_intel.dest_reputation.categories', 'operator': 'contains_any',
+         'value': ['legitimate', 'c2']}]},
+    {'id': 'criticality-in', 'conditions': [
+        {'field': 'enrichment.dest_asset.criticality', 'operator': 'in', 'value': ['critical', 'high']},
+        {'field': 'bytes_received', 'operator': 'less_than_or_equal', 'value': 5000}]},
+    {'id': 'missing-equals', 'conditions': [
+        {'field': 'raw_data.dns_query', 'operator': 'equals', 'value': 'example.com'}]},
+    {'id': 'missing-not-equals', 'conditions': [
+        {'field': 'enrichment.geolocation.source.country', 'operator': 'not_equals', 'value': 'United States'}]},
+    {'id': 'score-bounds', 'conditions': [
+        {'field': 'enrichment.threat_intel.source_reputation.score', 'operator': 'greater_than_or_equal',
+         'value': 80}]},
+]
+
+
+def rules():
+    definitions, _ = load_rule_file(DEFAULT_RULES_PATH)
+    return [compile_rule(definition) for definition in definitions + EXTRA_RULES]
+
+
+def mixed_batch(count: int = 3000) -> List[Dict[str, Any]]:
+    """Synthetic flows with partial enrichment, plus hand-made edge cases"""
+    events = list(SyntheticFlowGenerator(FlowProfile(enrichment_coverage=0.6, malicious_ratio=0.3),
+                                         seed=11).records(count))
+    template = events[0]
+
+    def variant(**changes: Any) -> Dict[str, Any]:
+        event = copy.deepcopy(template)
+        for path, value in changes.items():
+            *parents, name = path.split('__')
+            target = event
+            for parent in parents:
+                target = target[parent]
+            if value is KeyError:
+                target.pop(name, None)
+            else:
+                target[name] = value
+        return event
+
+    events += [
+        variant(dest_port=KeyError),
+        variant(dest_port=None),
+        variant(dest_port='22'),
+        variant(protocol=6, dest_port=22),
+        variant(enrichment=KeyError),
+        variant(enrichment__threat_intel=None),
+        variant(enrichment__threat_intel__dest_reputation={'score': -80, 'categories': ['c2']}),
+        variant(enrichment__threat_intel__dest_reputation={'score': -80, 'categories': []}),
+        variant(enrichment__threat_intel__dest_reputation={'score': -80, 'categories': None}),
+        variant(enrichment__threat_intel__dest_reputation={'score': '-80', 'categories': 'c2'}),
+        variant(enrichment__geolocation__dest__country=None),
+        variant(enrichment__geolocation__dest__country='Russia'),
+        variant(enrichment__dest_asset__criticality='critical', bytes_received=5000),
+        variant(bytes_sent=float('nan')),
+        variant(raw_data__dns_query='example.com'),
+    ]
+    return events
+
+
+@pytest.mark.parametrize('span', [slice(None), slice(-15, None), slice(-1, None), slice(0, 0)],
+                         ids=['mixed', 'edge-cases', 'single', 'empty'])
+def test_masks_match_per_event_predicates(span):
+    compiled = rules()
+    events = mixed_batch()[span]
+    matches = BatchRuleEvaluator(compiled).matches(events)
+    for rule in compiled:
+        expected = [index for index, event in enumerate(events) if rule.matches(event)]
+        assert matches[rule.rule_id] == expected, rule.rule_id
+
+
+def test_mixed_batch_exercises_every_rule():
+    compiled = rules()
+    events = mixed_batch()
+    matched = {rule.rule_id for rule in compiled if any(rule.matches(event) for event in events)}
+    assert {'in-ports', 'contains-any-legitimate', 'missing-equals', 'criticality-in'} <= matched
@@ -0,0 +1,73 @@
+# PyGuardian v3 - Correlation Algorithm Tests
+# Linear group scoring and streaming correlation against their reference versions
+
+from __future__ import annotations
+
+import random
+from datetime import timedelta
+from typing import List
+
+import pytest
+
+from algorithms.correlation_algorithm import CorrelationEngine, CorrelationGroup, Event
+from benchmarks.synthetic_flows import FlowProfile, SyntheticFlowGenerator
+
+
+def make_events(count: int, seed: int = 3) -> List[Event]:
+    profile = FlowProfile(hosts=4, destinations=12, mean_gap_seconds=600.0, enrichment_coverage=0.5)
+    return SyntheticFlowGenerator(profile, seed=seed).events(count)
+
+
+def pairwise_score(engine: CorrelationEngine, events: List[Event]) -> float:
+    """The original quadratic group score: mean similarity over all event pairs"""
+    if len(events) < 2:
+        return 0.0
+    total = 0.0
+    comparisons = 0
+    for i in range(len(events)):
+        for j in range(i + 1, len(events)):
+            total += engine._calculate_event_similarity(events[i], events[j])
+            comparisons += 1
+    return total / comparisons
+
+
+def summary(groups: List[CorrelationGroup]):
+    return [([event.event_id for event in group.events], group.correlation_score) for group in groups]
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 17, 200])
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_group_score_equals_pairwise_mean(count, seed):
+    engine = CorrelationEngine()
+    events = make_events(count, seed)
+    assert engine._calculate_group_correlation_score(events) == pytest.approx(
+        pairwise_score(engine, events), rel=1e-12, abs=1e-15)
+
+
+def test_group_score_with_identical_and_distinct_events():
+    engine = CorrelationEngine()
+    event = make_events(1)[0]
+    assert engine._calculate_group_correlation_score([event] * 5) == pytest.approx(pairwise_score(engine, [event] * 5))
+    assert engine._calculate_group_correlation_score([event] * 5) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('time_window', [60, 600, 3600])
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_stream_matches_batch_on_sorted_input(time_window, seed):
+    engine = CorrelationEngine()
+    events = sorted(make_events(1500, seed), key=lambda event: event.timestamp)
+    batch = engine.correlate_events(events, time_window)
+    assert batch
+    assert summary(engine.correlate_events_stream(iter(events), time_window)) == summary(batch)
+
+
+def test_stream_reorders_events_within_allowed_lateness():
+    engine = CorrelationEngine()
+    events = sorted(make_events(1500), key=lambda event: event.timestamp)
+    rng = random.Random(5)
+    jittered = sorted(events, key=lambda event: event.timestamp + timedelta(seconds=rng.uniform(0, 30)))
+    late = []
+    streamed = engine.correlate_events_stream(jittered, 600, allowed_lateness=30, on_late_event=late.append)
+    assert not late
+    # ties keep arrival order in both, so compare with the batch over the jittered arrival order
+    assert summary(streamed) == summary(engine.correlate_events(jittered, 600))
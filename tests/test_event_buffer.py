@@ -0,0 +1,63 @@
+# PyGuardian v3 - Event Buffer Tests
+# TimeOrderedEventBuffer keeps the order of a stable sort under late inserts and eviction
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pytest
+
+from algorithms.event_buffer import TimeOrderedEventBuffer
+
+START = datetime(2024, 1, 15, 10, 0, 0)
+
+
+@dataclass
+class StubEvent:
+    timestamp: datetime
+    sequence: int
+
+
+def expected_window(events: List[StubEvent], max_age: Optional[float]) -> List[int]:
+    """Stable sort of the events, minus those older than max_age behind the newest"""
+    ordered = sorted(events, key=lambda event: event.timestamp)
+    if max_age is not None and ordered:
+        cutoff = ordered[-1].timestamp - timedelta(seconds=max_age)
+        ordered = [event for event in ordered if event.timestamp >= cutoff]
+    return [event.sequence for event in ordered]
+
+
+@pytest.mark.parametrize('max_age', [None, 40.0])
+@pytest.mark.parametrize('seed', range(20))
+def test_late_inserts_match_stable_sort(max_age, seed):
+    rng = random.Random(seed)
+    buffer = TimeOrderedEventBuffer(max_age=max_age)
+    added = []
+    for sequence in range(rng.randint(1, 400)):
+        # mostly in order, with late events and repeated timestamps
+        offset = sequence // 2 - rng.choice([0, 0, 0, 1, 5, 30, 60])
+        event = StubEvent(START + timedelta(seconds=offset), sequence)
+        buffer.add(event)
+        added.append(event)
+        if rng.random() < 0.05:
+            assert [event.sequence for event in buffer] == expected_window(added, max_age)
+
+    expected = expected_window(added, max_age)
+    assert [event.sequence for event in buffer] == expected
+    assert len(buffer) == len(expected)
+    assert buffer[0].sequence == expected[0] and buffer[-1].sequence == expected[-1]
+    assert [event.sequence for event in buffer[1:4]] == expected[1:4]
+    assert buffer.oldest == min(event.timestamp for event in buffer)
+
+
+def test_constructor_sorts_and_evict_before_drops_late_events():
+    events = [StubEvent(START + timedelta(seconds=seconds), index) for index, seconds in enumerate([5, 1, 3, 1])]
+    buffer = TimeOrderedEventBuffer(events)
+    assert [event.sequence for event in buffer] == [1, 3, 2, 0]
+
+    buffer.add(StubEvent(START + timedelta(seconds=2), 4))  # late, not merged yet
+    assert buffer.evict_before(START + timedelta(seconds=3)) == 3
+    assert [event.sequence for event in buffer] == [2, 0]
@@ -0,0 +1,65 @@
+# PyGuardian v3 - Flow Timestamp Tests
+# FlowBatch.timestamp is the flow start for the NetFlow decoder and the flow aggregator alike
+
+from __future__ import annotations
+
+import struct
+
+from pipeline.flow_aggregator import FlowPreAggregator
+from pipeline.netflow_decoder import IPFIX, NETFLOW_V9, NetFlowDecoder
+
+START = 1_705_312_200  # a multiple of the aggregation interval
+FLOWS = [(0, 10), (20, 25)]  # (start, end) seconds after START, same 5-tuple
+
+# src, dst, bytes, src port, dst port, protocol, then the time fields
+_KEY_FIELDS = [(8, 4), (12, 4), (1, 8), (7, 2), (11, 2), (4, 1)]
+_KEY = (bytes((10, 0, 0, 1)), bytes((203, 0, 113, 7)), 1500, 50000, 443, 6)
+
+
+def _datagram(version: int, template: list, set_id: int, times: list, header: bytes) -> bytes:
+    record = struct.Struct('!4s4sQHHB' + ''.join('I' if length == 4 else 'Q' for _, length in template[6:]))
+    fields = b''.join(struct.pack('!HH', element, length) for element, length in template)
+    body = struct.pack('!HH', 256, len(template)) + fields
+    records = b''.join(record.pack(*_KEY, *values) for values in times)
+    records += b'\0' * (-len(records) % 4)
+    sets = (struct.pack('!HH', set_id, 4 + len(body)) + body
+            + struct.pack('!HH', 256, 4 + len(records)) + records)
+    return header(sets) + sets
+
+
+def _ipfix_milliseconds() -> bytes:
+    times = [((START + start) * 1000, (START + end) * 1000) for start, end in FLOWS]
+    return _datagram(IPFIX, _KEY_FIELDS + [(152, 8), (153, 8)], 2, times,
+                     lambda sets: struct.pack('!HHIII', IPFIX, 16 + len(sets), START + 30, 0, 1))
+
+
+def _v9_uptime() -> bytes:
+    uptime, export_time = 3_600_000, START + 30
+    times = [(uptime - (30 - start) * 1000, uptime - (30 - end) * 1000) for start, end in FLOWS]
+    return _datagram(NETFLOW_V9, _KEY_FIELDS + [(22, 4), (21, 4)], 0, times,
+                     lambda sets: struct.pack('!HHIIII', NETFLOW_V9, len(FLOWS) + 1, uptime, export_time, 0, 1))
+
+
+def _decode(datagram: bytes):
+    decoder = NetFlowDecoder()
+    decoder.decode(datagram)
+    (batch,) = decoder.drain()
+    return batch
+
+
+def test_decoder_stores_flow_start():
+    for datagram in (_ipfix_milliseconds(), _v9_uptime()):
+        columns = _decode(datagram).columns()
+        assert columns['timestamp'].tolist() == [START + start for start, _ in FLOWS]
+        assert columns['duration'].tolist() == [end - start for start, end in FLOWS]
+
+
+def test_aggregated_decoder_flows_span_first_start_to_last_end():
+    for datagram in (_ipfix_milliseconds(), _v9_uptime()):
+        aggregator = FlowPreAggregator(interval=60)
+        aggregator.add(_decode(datagram))
+        merged = aggregator.flush()
+        columns = merged.flows.columns()
+        assert merged.flow_counts.tolist() == [len(FLOWS)]
+        assert columns['timestamp'].tolist() == [START + FLOWS[0][0]]
+        assert columns['duration'].tolist() == [FLOWS[-1][1] - FLOWS[0][0]]
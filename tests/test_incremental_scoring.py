@@ -0,0 +1,61 @@
+# PyGuardian v3 - Incremental Scoring Tests
+# IncrementalRiskScorer must track compute_risk_score with bounded state
+
+from __future__ import annotations
+
+import random
+from dataclasses import replace
+from datetime import timedelta
+
+import pytest
+
+from algorithms.correlation_algorithm import CorrelationEngine
+from algorithms.incremental_scoring import IncrementalRiskScorer
+from benchmarks.synthetic_flows import FlowProfile, SyntheticFlowGenerator
+
+
+def synthetic(count: int, seed: int):
+    generator = SyntheticFlowGenerator(FlowProfile(enrichment_coverage=0.7, mean_gap_seconds=120.0), seed=seed)
+    return generator.events(count), generator.alerts(4)
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_in_order_events_match_and_keep_one_timestamp(seed):
+    engine = CorrelationEngine()
+    events, alerts = synthetic(500, seed)
+    scorer = IncrementalRiskScorer(engine)
+    scorer.add_alerts(alerts)
+    for count, event in enumerate(events, 1):
+        scorer.add_event(event)
+        if count % 50 == 0:
+            assert scorer.score() == pytest.approx(engine.compute_risk_score(events[:count], alerts), abs=1e-9)
+    assert len(scorer._timestamps) == 1
+    assert scorer.inexact_events == 0
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_late_events_within_max_lateness_are_exact(seed):
+    engine = CorrelationEngine()
+    events, alerts = synthetic(500, seed)
+    rng = random.Random(seed)
+    shuffled = sorted(events, key=lambda event: event.timestamp + timedelta(seconds=rng.uniform(0, 600)))
+    scorer = IncrementalRiskScorer(engine, max_lateness=600)
+    scorer.add_alerts(alerts)
+    scorer.add_events(shuffled)
+    assert scorer.inexact_events == 0
+    assert scorer.score() == pytest.approx(engine.compute_risk_score(events, alerts), abs=1e-9)
+    newest = max(event.timestamp for event in events)
+    assert all(timestamp >= newest - timedelta(seconds=600) for timestamp in list(scorer._timestamps)[1:])
+
+
+def test_events_behind_the_window_are_counted_as_inexact():
+    engine = CorrelationEngine()
+    events, _ = synthetic(4, 1)
+    start = events[0].timestamp
+    scorer = IncrementalRiskScorer(engine, max_lateness=60)
+    for event, seconds in zip(events, (1000, 2000, 3000)):
+        scorer.add_event(replace(event, timestamp=start + timedelta(seconds=seconds)))
+    scorer.add_event(replace(events[3], timestamp=start))
+    assert scorer.inexact_events == 1
+    assert scorer.event_count == 4
+    assert len(scorer._timestamps) == 2
@@ -0,0 +1,16 @@
+# PyGuardian v3 - Rule Index Tests
+# Candidate lookup returns each rule at most once
+
+from __future__ import annotations
+
+from detection.rule_compiler import compile_rule
+from detection.rule_index import RuleIndex
+
+
+def test_repeated_in_values_file_a_rule_once():
+    rule = compile_rule({'id': 'tcp-or-udp', 'conditions': [
+        {'field': 'protocol', 'operator': 'in', 'value': [6, 6, 17]}]})
+    index = RuleIndex([rule])
+    assert index.candidates({'protocol': 6}) == (rule,)
+    assert index.candidates({'protocol': 17}) == (rule,)
+    assert index.candidates({'protocol': 1}) == ()
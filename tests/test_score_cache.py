@@ -0,0 +1,17 @@
+# PyGuardian v3 - Risk Score Cache Tests
+# ID-set fingerprints are order independent and do not collide structurally
+
+from __future__ import annotations
+
+from algorithms.score_cache import fingerprint_ids
+
+
+def test_fingerprint_ignores_order_and_repeats():
+    assert fingerprint_ids(['b', 'a', 'c']) == fingerprint_ids(['a', 'b', 'c', 'a'])
+
+
+def test_fingerprint_separates_sets_with_equal_hash_sums():
+    # equal count, sum and xor of hashes
+    assert fingerprint_ids([1, 2]) != fingerprint_ids([0, 3])
+    assert fingerprint_ids(['ab', 'c']) != fingerprint_ids(['a', 'bc'])
+    assert fingerprint_ids([]) != fingerprint_ids([''])
@@ -0,0 +1,45 @@
+# PyGuardian v3 - Vectorized Scoring Tests
+# compute_risk_score_batch must return exactly the per-object compute_risk_score
+
+from __future__ import annotations
+
+from dataclasses import replace
+from datetime import timedelta
+from typing import List
+
+import pytest
+
+from algorithms.correlation_algorithm import CorrelationEngine, Event
+from algorithms.vectorized_scoring import EventBatch
+from benchmarks.synthetic_flows import FlowProfile, SyntheticFlowGenerator
+
+MB = 1024 * 1024
+
+
+def scores(events: List[Event], generator: SyntheticFlowGenerator):
+    engine = CorrelationEngine()
+    alerts = generator.alerts()
+    return engine.compute_risk_score(events, alerts), engine.compute_risk_score_batch(
+        EventBatch.from_events(events), alerts)
+
+
+@pytest.mark.parametrize('coverage', [1.0, 0.5, 0.0])
+@pytest.mark.parametrize('count', [1, 2, 10, 11, 100, 101, 2000])
+def test_seeded_events_score_identically(coverage, count):
+    generator = SyntheticFlowGenerator(FlowProfile(enrichment_coverage=coverage), seed=count)
+    expected, actual = scores(generator.events(count), generator)
+    assert actual == expected
+
+
+@pytest.mark.parametrize('gap', [59, 60, 299, 300, 1799, 1800, 0.000001])
+@pytest.mark.parametrize('total_bytes', [MB, MB + 1, 10 * MB, 10 * MB + 1, 100 * MB, 100 * MB + 1])
+def test_bucket_boundaries_score_identically(gap, total_bytes):
+    generator = SyntheticFlowGenerator(FlowProfile(enrichment_coverage=0.5), seed=7)
+    base = generator.events(11)
+    events = []
+    for index, event in enumerate(base):
+        sent = total_bytes // len(base) + (total_bytes % len(base) if index == 0 else 0)
+        events.append(replace(event, timestamp=base[0].timestamp + timedelta(seconds=gap * index),
+                              bytes_sent=sent, bytes_received=0))
+    expected, actual = scores(events[::-1], generator)  # unsorted input
+    assert actual == expected